@@ -0,0 +1,132 @@
+#decodes whole directories of ff9.img without blender, one worker process per core, one .npz or .glb per model file
+#usage: python ff9Batch.py ff9.img output/ --directories 7 8 10
+#       python ff9Batch.py ff9.img output/ --models 7:0 7:3 10:2 --format glb
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ff9ModelImporter as importer
+import ff9Gltf
+
+#### output
+
+#every array of a decoded model file under a flat name, models, meshes and animations numbered in file order
+def flattenModelFile(data):
+    arrays = dict()
+    arrays["modelIdentifiers"] = np.array([model.identifier for model in data.models], np.int32)
+    for m, (model, textures, animations) in enumerate(zip(data.models, data.textures, data.animations)):
+        prefix = f'model{m}_'
+        arrays[prefix + "boneLengths"] = model.boneLengths
+        arrays[prefix + "boneParents"] = model.boneParents
+        for g, mesh in enumerate(model.meshes):
+            for name in mesh.__slots__:
+                arrays[f'{prefix}mesh{g}_{name}'] = getattr(mesh, name)
+        #textures as 8 bit RGBA, rows bottom to top like blender images
+        for t, texture in enumerate(textures or []):
+            arrays[f'{prefix}texture{t}'] = np.round(texture.decode() * 255).astype(np.uint8)
+        for a, animation in enumerate(animations or []):
+            arrays[f'{prefix}animation{a}_identifier'] = np.array(animation.identifier, np.int32)
+            arrays[f'{prefix}animation{a}_positions'] = animation.positions
+            arrays[f'{prefix}animation{a}_rotations'] = animation.rotations
+            arrays[f'{prefix}animation{a}_constantPositions'] = animation.constantPositions
+            arrays[f'{prefix}animation{a}_constantRotations'] = animation.constantRotations
+    return arrays
+
+def getOutputPath(outputDirectory, directory, modelIndex, outputFormat = "npz"):
+    return os.path.join(outputDirectory, f'dir{directory:02}', f'model{modelIndex:04}.{outputFormat}')
+
+#### workers
+
+#decodes and writes one model file, as arrays (npz) or binary glTF (glb).
+#failures are returned rather than raised so one bad model doesn't stop the batch
+def convertModel(archivePath, directory, modelIndex, outputDirectory, blockCache = 0, outputFormat = "npz"):
+    result = {"directory": directory, "model": modelIndex, "output": None, "error": None, "skippedAnimations": dict()}
+    then = time.perf_counter()
+    try:
+        report = importer.newReport()
+        with importer.openArchive(archivePath, blockCache) as reader:
+            data = importer.decodeModelFile(reader, directory, modelIndex, report)
+        outputPath = getOutputPath(outputDirectory, directory, modelIndex, outputFormat)
+        os.makedirs(os.path.dirname(outputPath), exist_ok=True)
+        if outputFormat == "glb":
+            ff9Gltf.writeGlb(outputPath, data)
+        else:
+            np.savez(outputPath, **flattenModelFile(data))
+        result["output"] = outputPath
+        result["skippedAnimations"] = report["skippedAnimations"]
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["seconds"] = time.perf_counter() - then
+    return result
+
+#### batch
+
+#(directory, model index) of every model file in the directories, reading the index cache once so workers only load it
+def listModels(archivePath, directories):
+    tasks = []
+    for directory in directories:
+        catalogue = importer.getCatalogue(archivePath, directory)
+        tasks += [(directory, entry.modelIndex) for entry in catalogue]
+    return tasks
+
+def parseModel(text):
+    directory, modelIndex = text.split(":")
+    return int(directory), int(modelIndex)
+
+def runBatch(archivePath, tasks, outputDirectory, workers = None, blockCache = 0, log = print, outputFormat = "npz"):
+    results = []
+    then = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convertModel, archivePath, directory, modelIndex, outputDirectory, blockCache, outputFormat)
+            for directory, modelIndex in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            status = "ok" if result["error"] is None else "FAILED " + result["error"].strip().splitlines()[-1]
+            log(f'[{done}/{len(tasks)}] directory {result["directory"]} model {result["model"]}: {status} ({result["seconds"]:.2f}s)')
+    wallSeconds = time.perf_counter() - then
+    results.sort(key=lambda result: (result["directory"], result["model"]))
+    return results, wallSeconds
+
+def formatSummary(results, wallSeconds):
+    failures = [result for result in results if result["error"] is not None]
+    seconds = [result["seconds"] for result in results]
+    lines = [f'{len(results) - len(failures)} of {len(results)} model files converted in {wallSeconds:.2f}s']
+    if len(seconds) > 0:
+        lines.append(f'per model: mean {statistics.mean(seconds):.3f}s, median {statistics.median(seconds):.3f}s, '
+            f'max {max(seconds):.3f}s, total {sum(seconds):.2f}s ({sum(seconds) / wallSeconds:.1f}x parallel)')
+        slowest = max(results, key=lambda result: result["seconds"])
+        lines.append(f'slowest: directory {slowest["directory"]} model {slowest["model"]}')
+    for result in failures:
+        lines.append(f'failed: directory {result["directory"]} model {result["model"]}')
+        lines.append(result["error"].rstrip())
+    return "\n".join(lines)
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description="Decode FF9 model files in parallel, one .npz or .glb per model file")
+    parser.add_argument("archive")
+    parser.add_argument("output")
+    parser.add_argument("--directories", type=int, nargs="+", default=[], help="convert every model file of these directories")
+    parser.add_argument("--models", type=parseModel, nargs="+", default=[], metavar="DIRECTORY:MODEL", help="convert these model files")
+    parser.add_argument("--workers", type=int, help="worker processes, defaults to the number of cores")
+    parser.add_argument("--block-cache", type=int, default=0, help="read through a cache of this many sectors instead of memory mapping")
+    parser.add_argument("--format", choices=("npz", "glb"), default="npz", help="numpy arrays, or binary glTF with textures and animations")
+    options = parser.parse_args(arguments)
+
+    tasks = listModels(options.archive, options.directories) + options.models
+    if len(tasks) == 0:
+        parser.error("nothing to convert, give --directories or --models")
+    results, wallSeconds = runBatch(options.archive, tasks, options.output, options.workers, options.block_cache, outputFormat=options.format)
+    print(formatSummary(results, wallSeconds))
+    return 0 if all(result["error"] is None for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
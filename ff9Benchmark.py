@@ -0,0 +1,239 @@
+#times and memory-profiles each stage of an import on its own, and flags regressions against a stored baseline
+#usage: python ff9Benchmark.py [--archive ff9.img | --preset medium] [--baseline baseline.json] [--save-baseline baseline.json]
+#inside blender, to include the scene building stage: blender -b -P ff9Benchmark.py -- [options]
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ff9ModelImporter as importer
+import ff9Synthetic
+
+DEFAULT_TOLERANCE = 0.25
+#differences below this are timer noise whatever the ratio
+MIN_REGRESSION = {"seconds": 0.001, "peakBytes": 64 * 1024}
+
+#### stages
+# each stage gets the reader and the directories to benchmark, setup isn't timed
+
+class Stage:
+    """A benchmarked stage: setup prepares the arguments of run, only run is timed."""
+    __slots__ = ("name", "setup", "run")
+
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+def getDirectoryTables(reader, directories):
+    index = importer.readIndex(reader)
+    return [importer.readDirectory(reader, index.directories[directory]) for directory in directories]
+
+#model files of every directory, with the blocks their other files are looked up in
+def getModelFiles(reader, directories):
+    modelFiles = []
+    for directory, tables in zip(directories, getDirectoryTables(reader, directories)):
+        for modelFile in importer.collectFiles(tables, tables.rootBlocks(), importer.FILETYPE_MODEL):
+            modelFiles.append((directory, tables, modelFile))
+    return modelFiles
+
+def runIndex(reader, directories):
+    return importer.readIndex(reader)
+
+def setupTreeWalk(reader, directories):
+    index = importer.readIndex(reader)
+    return [index.directories[directory] for directory in directories]
+
+def runTreeWalk(reader, entries):
+    return [importer.readDirectory(reader, entry) for entry in entries]
+
+def setupMeshDecode(reader, directories):
+    return [modelFile for directory, tables, modelFile in getModelFiles(reader, directories)]
+
+def runMeshDecode(reader, modelFiles):
+    models = []
+    for modelFile in modelFiles:
+        for pointer in importer.readFileHeader(modelFile, reader).objectPointers:
+            models.append(importer.readModel(reader, pointer))
+    return models
+
+#every TIM file of the directories, read and decoded to RGBA. field and overworld TIMs are decoded through
+#the materials of their model file, like an import does, as their color tables can be TIMs of their own
+def setupTextureDecode(reader, directories):
+    jobs = []
+    for directory, tables in zip(directories, getDirectoryTables(reader, directories)):
+        if directory not in (3, 4):
+            jobs += [(textureFile, None) for textureFile in importer.collectFiles(tables, tables.rootBlocks(), importer.FILETYPE_TIM_IMAGE)]
+            continue
+        for modelFile in importer.collectFiles(tables, tables.rootBlocks(), importer.FILETYPE_MODEL):
+            textureFiles = importer.collectFiles(tables, [importer.parentBlock(tables, modelFile.parent)], importer.FILETYPE_TIM_IMAGE)
+            materialFiles = importer.collectFiles(tables, [modelFile.parent], importer.FILETYPE_CLUT_AND_TPAGES_FOR_MODEL)
+            if len(textureFiles) > 0 and len(materialFiles) > 0:
+                jobs.append((textureFiles[0], materialFiles[0]))
+    return jobs
+
+def runTextureDecode(reader, jobs):
+    images = []
+    for textureFile, materialFile in jobs:
+        textureHeader = importer.readFileHeader(textureFile, reader)
+        if materialFile is None:
+            textures = importer.readTextures(textureHeader, reader)
+        else:
+            materials = importer.readMats(importer.readFileHeader(materialFile, reader), reader)[0]
+            textures = [texture for textures in importer.readTexturesEx(textureHeader, materials, reader).values() for texture in textures]
+        for texture in textures:
+            images.append(texture.decode())
+    return images
+
+#every model against the animation file of its block, like an import does
+def setupAnimationDecode(reader, directories):
+    jobs = []
+    for directory, tables, modelFile in getModelFiles(reader, directories):
+        animationFiles = importer.collectFiles(tables, [modelFile.parent], importer.FILETYPE_ANIM)
+        if len(animationFiles) == 0:
+            continue
+        for pointer in importer.readFileHeader(modelFile, reader).objectPointers:
+            jobs.append((animationFiles[0], importer.readModel(reader, pointer).boneCount))
+    return jobs
+
+def runAnimationDecode(reader, jobs):
+    skipped = dict()
+    animations = []
+    for animationFile, boneCount in jobs:
+        animations += importer.readAnimations(importer.readFileHeader(animationFile, reader), boneCount, reader, skipped)
+    return animations
+
+#scene building of the first model file of each directory, from already decoded data
+def setupBlenderBuild(reader, directories):
+    data = []
+    for directory in directories:
+        data.append(importer.decodeModelFile(reader, directory, 0, importer.newReport(), useIndexCache=False))
+    resetScene()
+    return data
+
+def runBlenderBuild(reader, data):
+    for modelFileData in data:
+        importer.buildModelFile(modelFileData)
+
+def resetScene():
+    importer.bpy.ops.wm.read_factory_settings(use_empty=True)
+    importer.TEXTURE_CACHE.clear()
+
+STAGES = [
+    Stage("index", lambda reader, directories: directories, runIndex),
+    Stage("tree walk", setupTreeWalk, runTreeWalk),
+    Stage("mesh decode", setupMeshDecode, runMeshDecode),
+    Stage("texture decode", setupTextureDecode, runTextureDecode),
+    Stage("animation decode", setupAnimationDecode, runAnimationDecode),
+    Stage("blender build", setupBlenderBuild, runBlenderBuild),
+]
+
+#### measuring
+
+#best and median time over repeat runs, then the peak traced allocation of one more run
+def measure(stage, reader, directories, repeat):
+    times = []
+    for i in range(repeat):
+        arguments = stage.setup(reader, directories)
+        then = time.perf_counter()
+        stage.run(reader, arguments)
+        times.append(time.perf_counter() - then)
+    arguments = stage.setup(reader, directories)
+    tracemalloc.start()
+    stage.run(reader, arguments)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(times), "medianSeconds": statistics.median(times), "peakBytes": peak}
+
+def runBenchmark(archivePath, directories, repeat = 5, log = print, blockCache = 0):
+    results = dict()
+    with importer.openArchive(archivePath, blockCache) as reader:
+        for stage in STAGES:
+            if stage.name == "blender build" and importer.bpy is None:
+                log(f'{stage.name}: skipped, blender not available')
+                continue
+            results[stage.name] = measure(stage, reader, directories, repeat)
+            log(formatResult(stage.name, results[stage.name]))
+    return results
+
+def formatResult(name, result):
+    return f'{name:>17}: {result["seconds"] * 1000:10.2f} ms (median {result["medianSeconds"] * 1000:.2f} ms), peak {result["peakBytes"] / 1024:10.1f} KiB'
+
+#### baselines
+
+#stages slower or hungrier than the baseline by more than tolerance, as (stage, measure, baseline, current)
+def findRegressions(results, baseline, tolerance = DEFAULT_TOLERANCE):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline["stages"].get(name)
+        if reference is None:
+            continue
+        for key in ("seconds", "peakBytes"):
+            if result[key] > reference[key] * (1 + tolerance) and result[key] - reference[key] > MIN_REGRESSION[key]:
+                regressions.append((name, key, reference[key], result[key]))
+    return regressions
+
+def loadBaseline(path):
+    with open(path) as file:
+        return json.load(file)
+
+def saveBaseline(path, results, description):
+    with open(path, "w") as file:
+        json.dump({"archive": description, "stages": results}, file, indent=2, sort_keys=True)
+
+#blender passes its own arguments before "--"
+def getArguments():
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return sys.argv[1:]
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description="Benchmark the FF9 importer stage by stage")
+    parser.add_argument("--archive", help="archive to read, a synthetic one is generated if not given")
+    parser.add_argument("--preset", choices=sorted(ff9Synthetic.PRESETS), default="medium", help="synthetic archive size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--directories", type=int, nargs="+", help="directories to benchmark, defaults to the preset's or 7")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--block-cache", type=int, default=0, help="read through a cache of this many sectors instead of memory mapping")
+    parser.add_argument("--baseline", help="baseline to compare against, exits with 1 on regressions")
+    parser.add_argument("--save-baseline", help="where to write the results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown or memory growth")
+    options = parser.parse_args(getArguments() if arguments is None else arguments)
+
+    with tempfile.TemporaryDirectory() as temporaryDirectory:
+        if options.archive is not None:
+            archivePath = options.archive
+            description = {"path": os.path.abspath(archivePath), "size": os.path.getsize(archivePath)}
+            directories = options.directories or [7]
+        else:
+            spec = ff9Synthetic.ArchiveSpec(seed=options.seed, **ff9Synthetic.PRESETS[options.preset])
+            archivePath = os.path.join(temporaryDirectory, "ff9.img")
+            size = ff9Synthetic.writeArchive(archivePath, spec)
+            description = {"preset": options.preset, "seed": options.seed, "size": size}
+            directories = options.directories or list(spec.directories)
+            print(f'synthetic {options.preset} archive, {size} bytes')
+        results = runBenchmark(archivePath, directories, options.repeat, blockCache=options.block_cache)
+
+    if options.save_baseline is not None:
+        saveBaseline(options.save_baseline, results, description)
+        print("baseline written to", options.save_baseline)
+    if options.baseline is not None:
+        baseline = loadBaseline(options.baseline)
+        if baseline.get("archive") != description:
+            print("warning: baseline was measured on a different archive", baseline.get("archive"))
+        regressions = findRegressions(results, baseline, options.tolerance)
+        for name, key, reference, current in regressions:
+            print(f'REGRESSION {name} {key}: {reference:.6g} -> {current:.6g} ({current / reference - 1:+.0%})')
+        if len(regressions) > 0:
+            return 1
+        print("no regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
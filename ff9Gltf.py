@@ -0,0 +1,250 @@
+#writes decoded model files as binary glTF (.glb) without blender: skeletons, skinned meshes, embedded PNG textures and animations
+#usage: python ff9Gltf.py ff9.img 7 0 model.glb
+#many model files at once: python ff9Batch.py ff9.img output/ --directories 7 --format glb
+
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ff9ModelImporter as importer
+
+#animations are keyed one frame apart from frame 1 in blender, at its default frame rate
+FRAME_RATE = 24
+
+#glTF enums
+COMPONENT_TYPES = {np.dtype(np.uint8): 5121, np.dtype(np.uint16): 5123, np.dtype(np.uint32): 5125, np.dtype(np.float32): 5126}
+ACCESSOR_TYPES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4", 16: "MAT4"}
+TARGET_ARRAY_BUFFER = 34962
+TARGET_ELEMENT_ARRAY_BUFFER = 34963
+FILTER_NEAREST = 9728
+GLB_MAGIC = 0x46546C67
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+
+#the skeleton's bones point along y, blender bones along z and gltf is y up, so the two turns cancel out.
+#what's left of the rest pose is the bind matrix every joint shares: blender's bone rest matrix, undone, and the meshes' scale
+BIND_MATRIX = np.array([
+    [1, 0, 0, 0],
+    [0, 0, 1, 0],
+    [0, -1, 0, 0],
+    [0, 0, 0, 1]], np.float32) @ np.diag([importer.SCALE_FACTOR] * 3 + [1]).astype(np.float32)
+
+#### glTF document
+
+class GltfBuilder:
+    """A glTF document being written, with every array appended to one binary buffer, each in its own buffer view."""
+
+    def __init__(self):
+        self.document = {"asset": {"version": "2.0", "generator": "ff9Gltf"}, "scene": 0, "scenes": [{"nodes": []}]}
+        self.chunks = []
+        self.length = 0
+
+    #appends item to the document's list of that kind, returns its index
+    def add(self, kind, item):
+        items = self.document.setdefault(kind, [])
+        items.append(item)
+        return len(items) - 1
+
+    def addBufferView(self, data, target = None):
+        padding = -self.length % 4
+        if padding > 0:
+            self.chunks.append(bytes(padding))
+            self.length += padding
+        view = {"buffer": 0, "byteOffset": self.length, "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        self.chunks.append(data)
+        self.length += len(data)
+        return self.add("bufferViews", view)
+
+    #array is (count,) or (count, components), bounds are required for positions and animation inputs
+    def addAccessor(self, array, target = None, bounds = False):
+        array = np.ascontiguousarray(array)
+        components = 1 if array.ndim == 1 else array.shape[1]
+        accessor = {"bufferView": self.addBufferView(array.tobytes(), target), "componentType": COMPONENT_TYPES[array.dtype],
+            "count": len(array), "type": ACCESSOR_TYPES[components]}
+        if bounds:
+            accessor["min"] = array.reshape(len(array), -1).min(axis=0).tolist()
+            accessor["max"] = array.reshape(len(array), -1).max(axis=0).tolist()
+        return self.add("accessors", accessor)
+
+    def toGlb(self):
+        self.document["buffers"] = [{"byteLength": self.length}]
+        text = json.dumps(self.document, separators=(",", ":")).encode("utf-8")
+        text += b" " * (-len(text) % 4)
+        binary = b"".join(self.chunks)
+        binary += bytes(-len(binary) % 4)
+        return b"".join((
+            struct.pack("<III", GLB_MAGIC, 2, 12 + 8 + len(text) + 8 + len(binary)),
+            struct.pack("<II", len(text), GLB_JSON_CHUNK), text,
+            struct.pack("<II", len(binary), GLB_BIN_CHUNK), binary))
+
+#### images
+
+#(height, width, 4) 8 bit RGBA as a PNG, first row on top
+def encodePng(pixels):
+    height, width = pixels.shape[:2]
+    rows = np.zeros((height, 1 + width * 4), np.uint8) #each row starts with filter type 0
+    rows[:, 1:] = pixels.reshape(height, -1)
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    return b"".join((b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)),
+        chunk(b"IEND", b"")))
+
+#a material per texture source, sharing images between models like the importer's texture cache.
+#returns the material indices and the (width, height) UVs are divided by
+def addMaterials(builder, textures, materialIndices):
+    materials = []
+    sizes = []
+    for texture in textures:
+        if texture.key not in materialIndices:
+            pixels = np.round(texture.decode() * 255).astype(np.uint8)
+            image = builder.add("images", {"name": texture.name, "mimeType": "image/png",
+                "bufferView": builder.addBufferView(encodePng(pixels))})
+            if "samplers" not in builder.document:
+                builder.add("samplers", {"magFilter": FILTER_NEAREST, "minFilter": FILTER_NEAREST})
+            textureIndex = builder.add("textures", {"source": image, "sampler": 0})
+            materialIndices[texture.key] = (builder.add("materials", {
+                "name": texture.name,
+                "pbrMetallicRoughness": {"baseColorTexture": {"index": textureIndex}, "metallicFactor": 0.0, "roughnessFactor": 1.0},
+                "alphaMode": "MASK",
+            }), (pixels.shape[1], pixels.shape[0]))
+        material, size = materialIndices[texture.key]
+        materials.append(material)
+        sizes.append(size)
+    return materials, np.array(sizes, np.float32).reshape(-1, 2)
+
+#### meshes
+
+#a mesh with one primitive per material, quads split in two triangles. None without faces
+#vertices are the distinct (vertex, UV) pairs of the loops, skinned to their bone with full weight
+def addMesh(builder, meshData, name, materials, textureSizes, uvOffset):
+    loopTotals = meshData.loopTotals.astype(np.int64)
+    loopStarts = np.zeros(len(loopTotals), np.int64)
+    np.cumsum(loopTotals[:-1], out=loopStarts[1:])
+    quads = loopTotals == 4
+    triangles = np.concatenate((
+        np.stack((loopStarts, loopStarts + 1, loopStarts + 2), axis=1),
+        np.stack((loopStarts[quads], loopStarts[quads] + 2, loopStarts[quads] + 3), axis=1)))
+    faces = np.concatenate((np.arange(len(loopTotals)), np.flatnonzero(quads)))
+
+    faceMaterials = np.zeros(len(loopTotals), np.int64)
+    if materials is not None and len(materials) > 0:
+        faceMaterials = np.minimum(meshData.materials, len(materials) - 1)
+    primitives = []
+    for material in np.unique(faceMaterials).tolist():
+        loops = triangles[faceMaterials[faces] == material].ravel()
+        pairs, indices = np.unique(np.stack((meshData.loopVertices[loops], meshData.loopUVs[loops]), axis=1), axis=0, return_inverse=True)
+        vertices = pairs[:, 0]
+        attributes = {
+            "POSITION": builder.addAccessor(meshData.positions[vertices].astype(np.float32), TARGET_ARRAY_BUFFER, bounds=True),
+            "JOINTS_0": builder.addAccessor(np.pad(meshData.boneIndices[vertices, None].astype(np.uint8), ((0, 0), (0, 3))), TARGET_ARRAY_BUFFER),
+            "WEIGHTS_0": builder.addAccessor(np.tile(np.array((1, 0, 0, 0), np.float32), (len(vertices), 1)), TARGET_ARRAY_BUFFER),
+        }
+        primitive = {"attributes": attributes, "indices": builder.addAccessor(indices.ravel().astype(np.uint32), TARGET_ELEMENT_ARRAY_BUFFER)}
+        if materials is not None and len(materials) > 0:
+            UVs = (meshData.UVs[pairs[:, 1]] - np.array((0, uvOffset), np.float32)) / textureSizes[material]
+            attributes["TEXCOORD_0"] = builder.addAccessor(UVs.astype(np.float32), TARGET_ARRAY_BUFFER)
+            primitive["material"] = materials[material]
+        primitives.append(primitive)
+    if len(primitives) == 0:
+        return None
+    return builder.add("meshes", {"name": name, "primitives": primitives})
+
+#### skeletons and animations
+
+#a node per bone under one node for the model, posed like the importer's armatures. returns the model node and the joint nodes
+def addSkeleton(builder, model, name):
+    joints = []
+    for boneIndex, length in enumerate(model.boneLengths.tolist()):
+        joints.append(builder.add("nodes", {"name": f'bone {boneIndex}', "translation": [0.0, length * importer.SCALE_FACTOR, 0.0]}))
+    for boneIndex, parentIndex in enumerate(model.boneParents[1:].tolist(), 1):
+        builder.document["nodes"][joints[parentIndex]].setdefault("children", []).append(joints[boneIndex])
+    modelNode = builder.add("nodes", {"name": name, "children": joints[:1]})
+    return modelNode, joints
+
+def addSkin(builder, joints):
+    bindMatrices = np.tile(BIND_MATRIX.T.ravel(), (len(joints), 1)) #column major
+    return builder.add("skins", {"joints": joints, "skeleton": joints[0], "inverseBindMatrices": builder.addAccessor(bindMatrices)})
+
+#keys every frame of the root position and bone rotations, channels the file stores as constants get a single key
+def addAnimation(builder, animation, joints, name, frameRate = FRAME_RATE):
+    times = builder.addAccessor(np.arange(animation.frameCount, dtype=np.float32) / frameRate, bounds=True)
+    firstTime = builder.addAccessor(np.zeros(1, np.float32), bounds=True)
+    samplers = []
+    channels = []
+    def addChannel(node, path, values, constant):
+        sampler = {"input": firstTime if constant else times, "output": builder.addAccessor(values[:1] if constant else values), "interpolation": "LINEAR"}
+        channels.append({"sampler": len(samplers), "target": {"node": node, "path": path}})
+        samplers.append(sampler)
+    addChannel(joints[0], "translation", animation.positions.astype(np.float32), animation.constantPositions.all())
+    rotations = animation.rotations[..., [1, 2, 3, 0]].astype(np.float32) #w x y z to x y z w
+    for boneIndex, joint in enumerate(joints):
+        addChannel(joint, "rotation", np.ascontiguousarray(rotations[:, boneIndex]), animation.constantRotations[boneIndex])
+    return builder.add("animations", {"name": name, "samplers": samplers, "channels": channels})
+
+#### model files
+
+#the glTF document of a decoded model file: each model a node with its skeleton, one skinned mesh node per group, and its animations
+def buildGltf(data, frameRate = FRAME_RATE):
+    builder = GltfBuilder()
+    materialIndices = dict() #textureKey: (material, image size)
+    uvOffset = importer.getUVOffset(data.directory)
+    for model, textures, animations in zip(data.models, data.textures, data.animations):
+        name = f'model {model.identifier}'
+        modelNode, joints = addSkeleton(builder, model, name)
+        builder.document["scenes"][0]["nodes"].append(modelNode)
+        skin = addSkin(builder, joints)
+        materials, textureSizes = addMaterials(builder, textures, materialIndices) if textures is not None else (None, None)
+        for i, meshData in enumerate(model.meshes):
+            mesh = addMesh(builder, meshData, f'{name} mesh {i}', materials, textureSizes, uvOffset)
+            if mesh is not None:
+                builder.document["nodes"][modelNode]["children"].append(builder.add("nodes", {"name": f'{name} mesh {i}', "mesh": mesh, "skin": skin}))
+        for animation in animations or []:
+            addAnimation(builder, animation, joints, importer.getActionName(model.identifier, animation.identifier), frameRate)
+    return builder
+
+#returns the glTF document written, without its binary chunk
+def writeGlb(path, data, frameRate = FRAME_RATE):
+    builder = buildGltf(data, frameRate)
+    with open(path, "wb") as file:
+        file.write(builder.toGlb())
+    return builder.document
+
+#what a .glb holds, and which animations decoding skipped
+def formatSummary(path, document, report):
+    counts = [(len(document.get("skins", [])), "models"), (len(document.get("meshes", [])), "meshes"),
+        (len(document.get("images", [])), "embedded images"), (len(document.get("animations", [])), "animations")]
+    text = f'Wrote {path}, {os.path.getsize(path) / 1024:.0f} KiB: ' + ", ".join(f'{count} {kind}' for count, kind in counts)
+    skipped = report["skippedAnimations"]
+    if len(skipped) > 0:
+        text += f', skipped {sum(skipped.values())} animations (' + ", ".join(f'{count} {reason}' for reason, count in skipped.items()) + ")"
+    return text
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description="Convert an FF9 model file to binary glTF")
+    parser.add_argument("archive")
+    parser.add_argument("directory", type=int)
+    parser.add_argument("model", type=int, help="index of the model file in the directory")
+    parser.add_argument("output")
+    parser.add_argument("--frame-rate", type=float, default=FRAME_RATE)
+    parser.add_argument("--block-cache", type=int, default=0, help="read through a cache of this many sectors instead of memory mapping")
+    options = parser.parse_args(arguments)
+
+    report = importer.newReport()
+    with importer.openArchive(options.archive, options.block_cache) as reader:
+        data = importer.decodeModelFile(reader, options.directory, options.model, report)
+    document = writeGlb(options.output, data, options.frame_rate)
+    print(formatSummary(options.output, document, report))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
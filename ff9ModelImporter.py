@@ -10,21 +10,35 @@ bl_info = {
     "category": "Import-Export"
 }
 
-import bpy
-from bpy_extras.io_utils import ImportHelper
-from bpy.props import StringProperty
-from mathutils import *
+#decoding only needs numpy, blender is only needed to build the scene
+try:
+    import bpy
+    from bpy_extras.io_utils import ImportHelper
+    from bpy.props import StringProperty
+    from mathutils import *
+
+    from bpy.props import CollectionProperty #for multiple files
+    from bpy.types import OperatorFileListElement
+except ImportError:
+    bpy = None
 import time
 import os # for path stuff
-import math 
-
-from bpy.props import CollectionProperty #for multiple files
-from bpy.types import OperatorFileListElement
-
-try: 
-    import struct
-except: 
-    struct = None
+import math
+
+import struct
+import mmap
+import hashlib
+import json
+import sys
+import logging
+import cProfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+
+log = logging.getLogger(__name__)
 
 ###
 
@@ -41,7 +55,7 @@ FILETYPE_MODEL = 0x02
 FILETYPE_ANIM = 0x03
 FILETYPE_TIM_IMAGE = 0x04
 FILETYPE_SCRIPT = 0x05
-FILETYPE_TEXT = 0x06 # 0x06 is text (for dialogs etc), one byte per char with one special char 
+FILETYPE_TEXT = 0x06 # 0x06 is text (for dialogs etc), one byte per char with one special char
 FILETYPE_SEQUENCER = 0x07 # 0x07 is sequencer data, in other words: music
 FILETYPE_AUDIO = 0x09
 FILETYPE_ENEMY_STATS = 0x010 #stats for enemies (ie. name, hp/mp, weaknesses, names of attacks etc)
@@ -73,75 +87,376 @@ RECT_HEIGHT = 3
 # https://docs.python.org/3/library/struct.html
 # < little endian, i integer. B would be unsigned char (ie ubyte in c#), ? would be C99 1-byte bool
 
-def readInt32(file_object):
-    return struct.unpack("<i", file_object.read(4))[0] 
-
-def readUInt32(file_object):
-    return struct.unpack("<I", file_object.read(4))[0]
-
-def readUByte(file_object):
-    return struct.unpack("<B", file_object.read(1))[0]
-    
-def readUInt16(file_object):
-    return struct.unpack("<H", file_object.read(2))[0]
-
-def readInt16(file_object):
-    return struct.unpack("<h", file_object.read(2))[0]
-
-def readUBytes(file_object, count):
-    xs = bytearray()
-    for i in range(count):
-        xs.append(readUByte(file_object))
-    return xs
-
-def readUInt24(file_object):
-    byte0 = readUByte(file_object)
-    byte1 = readUByte(file_object)
-    byte2 = readUByte(file_object)
-    return byte0 * 65536 + byte1 * 256 + byte2
-
+UINT16 = struct.Struct("<H")
+INT16 = struct.Struct("<h")
+UINT32 = struct.Struct("<I")
+INT32 = struct.Struct("<i")
+
+# record layouts, unpacked in one call at an absolute offset
+INDEX_HEADER = struct.Struct("<4sIII")          # header, unknown1, directoryCount, unknown2
+DIRECTORY_ENTRY = struct.Struct("<IIII")        # type, fileCount, startSector, sectorOfFirstFile
+DIRECTORY_FILE_POINTER = struct.Struct("<HHI")  # id, type, FirstSectorOfFile
+DATABLOCK_HEADER = struct.Struct("<BH")         # fileCount, zero (follows the DB marker)
+FILE_HEADER = struct.Struct("<BBH")             # DB mark, objectCount, zero
+MODEL_HEADER = struct.Struct("<HBBHhhhII")      # zeroes, boneCount, groupCount, dataSize, offsets, bonesPointer, groupsPointer
+GROUP_RECORD = struct.Struct("<7H3h5I")         # datasize, 6 polygon counts, offsets, 5 pointers
+MATERIAL_FILE_HEADER = struct.Struct("<BBH")    # tag, modelCount, padding
+MODEL_MATERIAL_RECORD = struct.Struct("<HHIHBB")
+ANIMATION_HEADER = struct.Struct("<HH4HII")     # zeroes, frameCount, X, Y, Z, mask, highAnglesPointer, lowAnglesPointer
+TIM_HEADER = struct.Struct("<BBxxI")            # tag, version, flags
+TIM_BLOCK = struct.Struct("<IHHHH")             # length, x, y, width, height
+
+class ArchiveReader:
+    """Read-only access to ff9.img through a memory map.
+
+    All reads take an absolute offset, so there is no seek/read round trip per field:
+    records are unpacked straight out of the map with precompiled structs and
+    byte ranges are handed out as memoryview slices without copying.
+    readCount and bytesRead count the reads, for the import report, under a lock as decode threads share a reader.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self.size = len(self.map)
+        self.bytesRead = 0
+        self.readCount = 0
+        self.lock = threading.Lock()
+
+    def close(self):
+        try:
+            self.view.release()
+            self.map.close()
+        except BufferError:
+            pass #slices are still alive somewhere, the map goes away with the last of them
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def counters(self):
+        return {"bytesRead": self.bytesRead, "readCount": self.readCount}
+
+    def count(self, size):
+        with self.lock:
+            self.readCount += 1
+            self.bytesRead += size
+
+    def unpack(self, record, offset):
+        self.count(record.size)
+        return record.unpack_from(self.view, offset)
+
+    def unpackArray(self, typeCode, offset, count):
+        record = struct.Struct(f"<{count}{typeCode}")
+        self.count(record.size)
+        return record.unpack_from(self.view, offset)
+
+    def readUByte(self, offset):
+        self.count(1)
+        return self.view[offset]
+
+    def readUInt16(self, offset):
+        return self.unpack(UINT16, offset)[0]
+
+    def readInt16(self, offset):
+        return self.unpack(INT16, offset)[0]
+
+    def readUInt32(self, offset):
+        return self.unpack(UINT32, offset)[0]
+
+    def readInt32(self, offset):
+        return self.unpack(INT32, offset)[0]
+
+    def readUBytes(self, offset, count):
+        if offset + count > self.size:
+            raise Exception("read past end of archive")
+        self.count(count)
+        return self.view[offset:offset + count]
+
+    #count records of a numpy dtype, viewed in place
+    def readArray(self, dtype, offset, count):
+        dtype = np.dtype(dtype)
+        if offset + count * dtype.itemsize > self.size:
+            raise Exception("read past end of archive")
+        if count == 0:
+            return np.zeros(0, dtype)
+        self.count(count * dtype.itemsize)
+        return np.frombuffer(self.view, dtype, count, offset)
+
+class CachedArchiveReader:
+    """Read-only access to ff9.img through an LRU cache of sector sized blocks, with the same reads as ArchiveReader.
+
+    Meant for disc images on network shares or USB drives where every read is a real I/O: missing
+    blocks are read with one call per contiguous run, and a miss on the block right after the last
+    read also fetches readAhead more, so walking a datablock or an animation's tracks reads each
+    sector once. hits, misses, bytesRead and readCount tell how well it went.
+    Block lookups are serialized by a lock, so decode threads can share a reader.
+    """
+
+    def __init__(self, path, capacity = 1024, readAhead = 8):
+        self.path = path
+        self.file = open(path, "rb", buffering=0)
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.blockCount = (self.size + SECTORSIZE - 1) // SECTORSIZE
+        self.capacity = capacity #in blocks
+        self.readAhead = readAhead
+        self.blocks = OrderedDict() #block index: bytes
+        self.nextBlock = -1 #block after the last read, a miss there is a sequential walk
+        self.hits = 0
+        self.misses = 0
+        self.bytesRead = 0
+        self.readCount = 0
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.blocks.clear()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def counters(self):
+        return {"blockHits": self.hits, "blockMisses": self.misses, "bytesRead": self.bytesRead, "readCount": self.readCount}
+
+    #reads blocks [first, end) in one call, then evicts least recently used blocks down to capacity.
+    #protected is the range of blocks the current read returns, which stay even past capacity
+    def fetch(self, first, end, protected):
+        self.file.seek(first * SECTORSIZE)
+        data = self.file.read((end - first) * SECTORSIZE)
+        self.readCount += 1
+        self.bytesRead += len(data)
+        for block in range(first, end):
+            start = (block - first) * SECTORSIZE
+            self.blocks[block] = data[start:start + SECTORSIZE]
+            self.blocks.move_to_end(block)
+        while len(self.blocks) > self.capacity:
+            oldest = next(iter(self.blocks))
+            if oldest in protected:
+                break
+            del self.blocks[oldest]
+
+    def getBlocks(self, first, last):
+        missing = []
+        for block in range(first, last + 1):
+            if block in self.blocks:
+                self.blocks.move_to_end(block)
+            else:
+                missing.append(block)
+        self.hits += last + 1 - first - len(missing)
+        self.misses += len(missing)
+        if len(missing) > 0:
+            end = missing[-1] + 1
+            if missing[0] == self.nextBlock:
+                end += self.readAhead
+            end = min(end, self.blockCount)
+            self.fetch(missing[0], end, range(first, max(end, last + 1)))
+            self.nextBlock = end
+        return [self.blocks[block] for block in range(first, last + 1)]
+
+    def read(self, offset, count):
+        if offset < 0 or offset + count > self.size:
+            raise Exception("read past end of archive")
+        if count == 0:
+            return b""
+        first = offset // SECTORSIZE
+        last = (offset + count - 1) // SECTORSIZE
+        start = offset - first * SECTORSIZE
+        with self.lock:
+            blocks = self.getBlocks(first, last)
+        if first == last:
+            return memoryview(blocks[0])[start:start + count]
+        return b"".join(blocks)[start:start + count]
+
+    def unpack(self, record, offset):
+        return record.unpack_from(self.read(offset, record.size))
+
+    def unpackArray(self, typeCode, offset, count):
+        record = struct.Struct(f"<{count}{typeCode}")
+        return record.unpack_from(self.read(offset, record.size))
+
+    def readUByte(self, offset):
+        return self.read(offset, 1)[0]
+
+    def readUInt16(self, offset):
+        return self.unpack(UINT16, offset)[0]
+
+    def readInt16(self, offset):
+        return self.unpack(INT16, offset)[0]
+
+    def readUInt32(self, offset):
+        return self.unpack(UINT32, offset)[0]
+
+    def readInt32(self, offset):
+        return self.unpack(INT32, offset)[0]
+
+    def readUBytes(self, offset, count):
+        return self.read(offset, count)
+
+    def readArray(self, dtype, offset, count):
+        dtype = np.dtype(dtype)
+        if count == 0:
+            return np.zeros(0, dtype)
+        return np.frombuffer(self.read(offset, count * dtype.itemsize), dtype, count)
+
+#the archive reader to use, blockCache is the cache capacity in sectors or 0 to memory map the archive
+def openArchive(path, blockCache = 0):
+    if blockCache > 0:
+        return CachedArchiveReader(path, blockCache)
+    return ArchiveReader(path)
+
+#### decoded data
+# everything from here to the blender section decodes without bpy, into these structures
+
+class ModelData:
+    """A skeleton and its meshes. Bone lengths and parent indices are arrays indexed by bone."""
+    __slots__ = ("identifier", "boneLengths", "boneParents", "meshes")
+
+    def __init__(self, identifier, boneLengths, boneParents, meshes):
+        self.identifier = identifier
+        self.boneLengths = boneLengths
+        self.boneParents = boneParents
+        self.meshes = meshes
+
+    @property
+    def boneCount(self):
+        return len(self.boneLengths)
+
+class MeshData:
+    """One group of a model.
+
+    positions and boneIndices are per vertex, UVs are the (count, 2) texel coordinates.
+    Faces are flat per-loop vertex and UV indices, already in blender winding, with the
+    loop total, color and material index of each face, in file order.
+    """
+    __slots__ = ("positions", "boneIndices", "UVs", "loopVertices", "loopUVs", "loopTotals", "colors", "materials")
+
+    def __init__(self, positions, boneIndices, UVs, loopVertices, loopUVs, loopTotals, colors, materials):
+        self.positions = positions
+        self.boneIndices = boneIndices
+        self.UVs = UVs
+        self.loopVertices = loopVertices
+        self.loopUVs = loopUVs
+        self.loopTotals = loopTotals
+        self.colors = colors
+        self.materials = materials
+
+class AnimationData:
+    """Every frame of an animation, (frames, 3) root positions and (frames, bones, 4) w, x, y, z rotations.
+    constantPositions (3,) and constantRotations (bones,) flag the channels the file stores as a single value."""
+    __slots__ = ("identifier", "frameCount", "positions", "rotations", "constantPositions", "constantRotations")
+
+    def __init__(self, identifier, frameCount, positions, rotations, constantPositions, constantRotations):
+        self.identifier = identifier
+        self.frameCount = frameCount
+        self.positions = positions
+        self.rotations = rotations
+        self.constantPositions = constantPositions
+        self.constantRotations = constantRotations
+
+class ModelMaterials:
+    """Material entries of one model in a clut and tpage file."""
+    __slots__ = ("meshID", "defaultAnimationID", "materialsCount", "materialsPointer", "id0x19", "unknown1", "unknown2", "materials")
+
+    def __repr__(self):
+        return f'ModelMaterials(meshID={self.meshID}, materials={self.materials})'
+
+class MaterialInfo:
+    """Where a material's texture page, clut and texture window are in vram."""
+    __slots__ = ("tpage", "texMode", "blendMode", "clut", "textureWindow", "faceEyePositions")
+
+    def __repr__(self):
+        return (f'MaterialInfo(tpage={self.tpage}, texMode={self.texMode}, blendMode={self.blendMode}, '
+            f'clut={self.clut}, textureWindow={self.textureWindow})')
+
+class TimImage:
+    """A TIM image, color table and texture data are (height, word width) arrays of raw 16 bit words."""
+    __slots__ = ("colorFormat", "colorTableRect", "colorTable", "textureRect", "textureData")
+
+class TextureSource:
+    """The raw words a texture decodes from, and the textureKey identifying the decoded image."""
+    __slots__ = ("name", "key", "colorFormat", "data", "palette")
+
+    def __init__(self, name, key, colorFormat, data, palette):
+        self.name = name
+        self.key = key
+        self.colorFormat = colorFormat
+        self.data = data
+        self.palette = palette
+
+    #(height, width, 4) float32 RGBA
+    def decode(self):
+        if self.colorFormat == COLOR_PALETTED_4BPP:
+            return Read4bppImage(self.data, self.palette)
+        if self.colorFormat == COLOR_PALETTED_8BPP:
+            return Read8bppImage(self.data, self.palette)
+        if self.colorFormat == COLOR_RGBA_16BPP:
+            return Read16bppImage(self.data)
+        return Read24bppImage(self.data)
+
+class ModelFileData:
+    """A decoded model file. For each model, textures is the list of its materials' texture
+    sources (None if untextured) and animations the ones that fit it (None without an animation file).
+    When animations aren't decoded, animationIndex lists the (identifier, pointer) of the ones that fit instead,
+    to be decoded later with loadAnimation."""
+    __slots__ = ("archivePath", "directory", "modelIndex", "models", "textures", "animations", "animationIndex")
+
+    def __init__(self, archivePath, directory, modelIndex):
+        self.archivePath = archivePath
+        self.directory = directory
+        self.modelIndex = modelIndex
+        self.models = []
+        self.textures = []
+        self.animations = []
+        self.animationIndex = []
 
 #### material data
 
-def readMats(header, file_object):
+def readMats(header, reader):
     mats =[]
-    for i, pointer in enumerate(header["objectPointers"]):
-        file_object.seek(pointer)
-        mats.append(readModelMaterials(file_object))
+    for i, pointer in enumerate(header.objectPointers):
+        mats.append(readModelMaterials(reader, pointer))
     return mats
 
-def readModelMaterials(file_object):
-    tag = readUByte(file_object) #always DC
-    modelCount = readUByte(file_object)
-    padding = readUInt16(file_object)
+def readModelMaterials(reader, startAddress):
+    tag, modelCount, padding = reader.unpack(MATERIAL_FILE_HEADER, startAddress) #tag is always DC
 
-    print("model material data count:", modelCount)
+    log.debug("model material data count: %d", modelCount)
     models = []
     for i in range(0, modelCount):
-        startposition = file_object.tell()
-        info = dict()
-        info["mesh_id"] = readUInt16(file_object)               # 0x02 file id - mesh
-        info["default_animation_id"] = readUInt16(file_object)  # 0x03 file id - animation ( this value can be -1, it means that there is no default animation )
-        temp = readUInt32(file_object)
-        info["materials_count"] = temp >> 24 #readUByte(file_object)        # materials count
-        info["materials_pointer"] = startposition + (temp & 0xFFFFFF) #readUInt24(file_object)     # pointer to materials array ( calculated from begining of structure )
-        info["id_0x19"] = readUInt16(file_object)               # 0x19 file id - ??? ( can be -1 )
-        info["unknown1"] = readUByte(file_object)               # possibly id of some file
-        info["unknown2"] = readUByte(file_object)               # unknown ( align to 32 bits? )
+        startposition = startAddress + MATERIAL_FILE_HEADER.size + i * MODEL_MATERIAL_RECORD.size
+        meshID, animationID, temp, id19, unknown1, unknown2 = reader.unpack(MODEL_MATERIAL_RECORD, startposition)
+        info = ModelMaterials()
+        info.meshID = meshID                                    # 0x02 file id - mesh
+        info.defaultAnimationID = animationID                   # 0x03 file id - animation ( this value can be -1, it means that there is no default animation )
+        info.materialsCount = temp >> 24                        # materials count
+        info.materialsPointer = startposition + (temp & 0xFFFFFF) # pointer to materials array ( calculated from begining of structure )
+        info.id0x19 = id19                                      # 0x19 file id - ??? ( can be -1 )
+        info.unknown1 = unknown1                                # possibly id of some file
+        info.unknown2 = unknown2                                # unknown ( align to 32 bits? )
         models.append(info)
     for info in models:
-        file_object.seek(info["materials_pointer"])
+        count = info.materialsCount
+        address = info.materialsPointer
+        pages = reader.unpackArray("H", address, 2 * count)             #tpage, clut pairs
+        windows = reader.unpackArray("h", address + 4 * count, 2 * count)
+        eyes = reader.unpackArray("h", address + 8 * count, 4 * count)
         materials = []
-        for i in range (0, info["materials_count"]):
-            material = dict()
-            material["tpage"], material["texMode"], material["blendMode"] = decodeTPage(readUInt16(file_object))
-            material["clut"] = decodeCLUT(readUInt16(file_object))
+        for i in range (0, count):
+            material = MaterialInfo()
+            material.tpage, material.texMode, material.blendMode = decodeTPage(pages[2 * i])
+            material.clut = decodeCLUT(pages[2 * i + 1])
+            material.textureWindow = windows[2 * i:2 * i + 2]
+            material.faceEyePositions = (eyes[4 * i:4 * i + 2], eyes[4 * i + 2:4 * i + 4])
             materials.append(material)
-        for material in materials:
-            material["textureWindow"] = (readInt16(file_object), readInt16(file_object))
-        for material in materials:
-            material["faceEyePositions"] = ((readInt16(file_object), readInt16(file_object)),(readInt16(file_object), readInt16(file_object)))
-        info["materials"] = materials
+        info.materials = materials
     return models
 
 def decodeTPage(tpage):
@@ -165,897 +480,2124 @@ def decodeCLUT(clut):
 
 #### mesh data
 
-def readMesh(file_object, group):
-    polygons, maxIndex, maxUVIndex = readPolygons(file_object, group)
-    vertices = readVertices(file_object, maxIndex+1, group)
-    UVs = readUVs(file_object, maxUVIndex+1, group)
-    return polygons, vertices, UVs
-
-def readPolygons(file_object, group):
-    maxIndex = 0
-    maxUVIndex = 0
-    file_object.seek(group["polygonDataPointer"])
-    AQuads = []
-    for i in range(0, group["typeAQuadrangleCount"]):
-        quad = dict()
-        quad["vertices"] = (readUInt16(file_object),readUInt16(file_object),readUInt16(file_object),readUInt16(file_object))
-        quad["UV"] = (readUInt16(file_object),readUInt16(file_object),readUInt16(file_object),readUInt16(file_object))
-        quad["color"] = readUBytes(file_object,3)
-        quad["material"] = readUByte(file_object)
-        AQuads.append(quad)
-        file_object.seek(4, 1)
-        maxIndex = max(maxIndex, max(quad["vertices"]))
-        maxUVIndex = max(maxUVIndex, max(quad["UV"]))
-    ATris = []
-    for i in range(0, group["typeATriangleCount"]):
-        tri = dict()
-        tri["vertices"] = (readUInt16(file_object),readUInt16(file_object),readUInt16(file_object))
-        tri["material"] = readUByte(file_object)
-        file_object.seek(1, 1)
-        tri["color"] = readUBytes(file_object,3)
-        file_object.seek(1, 1)
-        tri["UV"] = (readUInt16(file_object),readUInt16(file_object),readUInt16(file_object))
-        file_object.seek(2, 1)
-        ATris.append(tri)
-        maxIndex = max(maxIndex, max(tri["vertices"]))
-        maxUVIndex = max(maxUVIndex, max(tri["UV"]))
-    BQuads = []
-    for i in range(0, group["typeBQuadrangleCount"]):
-        quad = dict()
-        quad["vertices"] = (readUInt16(file_object),readUInt16(file_object),readUInt16(file_object),readUInt16(file_object))
-        file_object.seek(24,1)
-        BQuads.append(quad)
-        maxIndex = max(maxIndex, max(quad["vertices"]))
-    BTris = []
-    for i in range(0, group["typeBTriangleCount"]):
-        tri = dict()
-        tri["vertices"] = (readUInt16(file_object),readUInt16(file_object),readUInt16(file_object))
-        BTris.append(tri)
-        file_object.seek(18, 1);
-        maxIndex = max(maxIndex, max(tri["vertices"]))
-    CQuads = []
-    for i in range(0, group["typeCQuadrangleCount"]):
-        quad = dict()
-        quad["vertices"] = (readUInt16(file_object),readUInt16(file_object),readUInt16(file_object),readUInt16(file_object))
-        file_object.seek(16,1)
-        CQuads.append(quad)
-        maxIndex = max(maxIndex, max(quad["vertices"]))
-    CTris = []
-    for i in range(0, group["typeCTriangleCount"]):
-        tri = dict()
-        tri["vertices"] = (readUInt16(file_object),readUInt16(file_object),readUInt16(file_object))
-        CTris.append(tri)
-        file_object.seek(14, 1);
-        maxIndex = max(maxIndex, max(tri["vertices"]))
-    polygons = dict()
-    polygons["AQuads"] = AQuads
-    polygons["ATris"] = ATris
-    polygons["BQuads"] = BQuads
-    polygons["BTris"] = BTris
-    polygons["CQuads"] = CQuads
-    polygons["CTris"] = CTris
-    return polygons, maxIndex, maxUVIndex
-
-def readVertices(file_object, count, group):
-    file_object.seek(group["VertexDataPointer"])
-    vertices = []
-    for i in range(0, count):
-        vertex = dict()
-        vertex["position"] = (readInt16(file_object), readInt16(file_object), readInt16(file_object))
-        vertex["boneIndex"] = readUByte(file_object)
-        file_object.seek(1,1) #1 unused byte
-        vertices.append(vertex)
-    return vertices
-
-def readUVs(file_object, count, group):
-    file_object.seek(group["textureDataPointer"])
-    UVs = []
-    for i in range(0, count):
-        UV = (readUByte(file_object), readUByte(file_object))
-        UVs.append(UV)
-    return UVs
-
-def readModel(file_object, materials, chosenDirectory): #uvOffsets):
-    startAddress = file_object.tell() #filePointer["address"]
-    #file_object.seek(startAddress)
-    zeroes = readUInt16(file_object)
-    boneCount = readUByte(file_object)
-
-    groupCount = readUByte(file_object)
-    dataSize = readUInt16(file_object)
-    xOffset = readInt16(file_object)
-    yOffset = readInt16(file_object)
-    zOffset = readInt16(file_object)
-    bonesPointer = readUInt32(file_object) + startAddress
-    current2 = file_object.tell()
-    groupsPointer = readUInt32(file_object) + startAddress
-    if file_object.tell() != bonesPointer:
+# polygon records, padding included so a whole block maps onto one array
+A_QUAD_DTYPE = np.dtype([("vertices", "<u2", 4), ("UV", "<u2", 4), ("color", "u1", 3), ("material", "u1"), ("padding", "V4")])
+A_TRIANGLE_DTYPE = np.dtype([("vertices", "<u2", 3), ("material", "u1"), ("padding0", "V1"), ("color", "u1", 3),
+    ("padding1", "V1"), ("UV", "<u2", 3), ("padding2", "V2")])
+B_QUAD_DTYPE = np.dtype({"names": ["vertices"], "formats": [("<u2", 4)], "itemsize": 32})
+B_TRIANGLE_DTYPE = np.dtype({"names": ["vertices"], "formats": [("<u2", 3)], "itemsize": 24})
+C_QUAD_DTYPE = np.dtype({"names": ["vertices"], "formats": [("<u2", 4)], "itemsize": 24})
+C_TRIANGLE_DTYPE = np.dtype({"names": ["vertices"], "formats": [("<u2", 3)], "itemsize": 20})
+VERTEX_DTYPE = np.dtype([("position", "<i2", 3), ("boneIndex", "u1"), ("padding", "V1")])
+ANGLE_TABLE_DTYPE = np.dtype([("s1", "<u2"), ("s2", "<u2"), ("s3", "<u2"), ("mask", "<u2")])
+
+#corner order of each polygon once turned into a blender face
+QUAD_WINDING = [0, 2, 3, 1]
+TRIANGLE_WINDING = [0, 2, 1]
+
+#group record fields
+GROUP_VERTEX_POINTER = 11
+GROUP_POLYGON_POINTER = 12
+GROUP_TEXTURE_POINTER = 13
+
+#in file order: A quads, A tris, B quads, B tris, C quads, C tris, with the group record field holding their count
+POLYGON_BLOCKS = (
+    (1, A_QUAD_DTYPE, QUAD_WINDING),
+    (2, A_TRIANGLE_DTYPE, TRIANGLE_WINDING),
+    (3, B_QUAD_DTYPE, QUAD_WINDING),
+    (4, B_TRIANGLE_DTYPE, TRIANGLE_WINDING),
+    (5, C_QUAD_DTYPE, QUAD_WINDING),
+    (6, C_TRIANGLE_DTYPE, TRIANGLE_WINDING),
+)
+
+def readModel(reader, startAddress, identifier = None):
+    (zeroes, boneCount, groupCount, dataSize, xOffset, yOffset, zOffset,
+        bonesPointer, groupsPointer) = reader.unpack(MODEL_HEADER, startAddress)
+    bonesPointer += startAddress
+    groupsPointer += startAddress
+    if startAddress + MODEL_HEADER.size != bonesPointer:
         raise Exception("bone pointer error")
-    bones = []
-    for i in range(0, boneCount):
-        bone = dict()
-        byte0 = readUByte(file_object)
-        byte1 = readUByte(file_object)
-        byte2 = readUByte(file_object)
-        bone["length"] = byte2 * 65536 + byte1 * 256 + byte0
-        bone["parentBoneIndex"] = readUByte(file_object)
-        bones.append(bone)
-    if file_object.tell() != groupsPointer:
+    #24 bit length and 8 bit parent index per bone
+    bones = reader.readArray("<u4", bonesPointer, boneCount)
+    boneLengths = (bones & 0xFFFFFF).astype(np.int32)
+    boneParents = (bones >> 24).astype(np.uint8)
+    if bonesPointer + 4 * boneCount != groupsPointer:
         raise Exception("group pointer error")
-    groups =[]
+    meshes = []
     for i in range(0, groupCount):
-        group = dict()
-        group["datasize"] = readUInt16(file_object)
-        group["typeAQuadrangleCount"] = readUInt16(file_object)
-        group["typeATriangleCount"] = readUInt16(file_object)
-        group["typeBQuadrangleCount"] = readUInt16(file_object)
-        group["typeBTriangleCount"] = readUInt16(file_object)
-        group["typeCQuadrangleCount"] = readUInt16(file_object)
-        group["typeCTriangleCount"] = readUInt16(file_object)
-            
-        group["xOffset"] = readInt16(file_object)
-        group["yOffset"] = readInt16(file_object)
-        group["zOffset"] = readInt16(file_object)
-
-        group["BoneDataPointer"] = readUInt32(file_object) + startAddress;
-        group["VertexDataPointer"] = readUInt32(file_object) + startAddress;
-        group["polygonDataPointer"] = readUInt32(file_object) + startAddress;
-        group["textureDataPointer"] = readUInt32(file_object) + startAddress;
-        group["endPointer"] = readUInt32(file_object) + startAddress;
-        groups.append(group)
-    
-    #build armature and a mesh for each group
-    armature = buildArmature(bones, 'Armature')
-    groupLengths = dict()
-    for i, group in enumerate(groups):
-        polygons, vertices, UVs = readMesh(file_object, group)
-        buildMesh(polygons, vertices, UVs, armature, f'mesh {i}', materials, chosenDirectory)#uvOffsets)
-        getGroupLengths(groupLengths, vertices)
-    adjustBoneLengths(armature, groupLengths)
-    poseArmature(armature, bones)
-    return armature
-
-#### blender mesh and armature building
-
-def getGroupLengths(lengths, vertices):
-    for vertex in vertices:
-        if vertex["boneIndex"] not in lengths:
-            lengths[vertex["boneIndex"]] = vertex["position"][2] * SCALE_FACTOR
+        #datasize, polygon counts, x y z offsets, then bone, vertex, polygon, texture and end pointers relative to the model
+        group = reader.unpack(GROUP_RECORD, groupsPointer + i * GROUP_RECORD.size)
+        meshes.append(readMesh(reader, startAddress, group))
+    return ModelData(identifier, boneLengths, boneParents, meshes)
+
+def readMesh(reader, startAddress, group):
+    loopVertices, loopUVs, loopTotals, colors, materials = readPolygons(reader, startAddress + group[GROUP_POLYGON_POINTER], group)
+    vertices = readVertices(reader, startAddress + group[GROUP_VERTEX_POINTER], int(loopVertices.max(initial=0)) + 1)
+    UVs = readUVs(reader, startAddress + group[GROUP_TEXTURE_POINTER], int(loopUVs.max(initial=0)) + 1)
+    return MeshData(vertices["position"], vertices["boneIndex"], UVs, loopVertices, loopUVs, loopTotals, colors, materials)
+
+#decodes the six polygon blocks of a group into flat per-loop and per-face arrays, faces in file order.
+#only type A polygons carry UVs, colors and materials, the others get zeroes
+def readPolygons(reader, address, group):
+    loopVertices = []
+    loopUVs = []
+    loopTotals = []
+    colors = []
+    materials = []
+    for countField, dtype, winding in POLYGON_BLOCKS:
+        count = group[countField]
+        records = reader.readArray(dtype, address, count)
+        address += count * dtype.itemsize
+        loopVertices.append(records["vertices"][:, winding].ravel())
+        loopTotals.append(np.full(count, len(winding), np.uint32))
+        if "UV" in dtype.names:
+            loopUVs.append(records["UV"][:, winding].ravel())
+            colors.append(records["color"])
+            materials.append(records["material"])
         else:
-            lengths[vertex["boneIndex"]] = max(lengths[vertex["boneIndex"]], vertex["position"][2] * SCALE_FACTOR)
-
-def buildArmature(bones, name):
-    #adds empty skeleton
-    armature = bpy.data.armatures.new(name)
-    armatureObject = bpy.data.objects.new(name, armature)
-    bpy.context.scene.collection.objects.link(armatureObject)
-    
-    armatureObject.show_in_front = True
-    armatureObject.display_type ='WIRE'
-
-    #move to edit mode
-    bpy.context.window.view_layer.objects.active = armatureObject
-    bpy.ops.object.mode_set(mode='EDIT', toggle=False)
-    edit_bones = armatureObject.data.edit_bones
-    #for each object, create a bone
-    #bone length is z position relative to parent)
-    for i, boneDescription in enumerate (bones):
-        bone = edit_bones.new(f'bone {i}')
-        if i!=0:
-            bone.parent = edit_bones[f'bone {boneDescription["parentBoneIndex"]}']
-            bone.parent.tail[2] = max(bone.parent.tail[2], boneDescription["length"] * SCALE_FACTOR)
-        bone.tail = bone.head + Vector([0,0,MIN_BONE_LENGTH])
-    bpy.ops.object.mode_set(mode = 'OBJECT')
-    return armatureObject
-
-def poseArmature(armatureObject, bones):
-    #set base bone positions
-    bpy.ops.object.mode_set(mode='POSE', toggle=False)
-    for i, boneDescription in enumerate (bones):
-        bone = armatureObject.pose.bones[f'bone {i}']
-
-        bone.location = Vector([0,boneDescription["length"] * SCALE_FACTOR,0])
-        bone.keyframe_insert(data_path="location", frame=0)
-        #bone.rotation_mode = EULER_ORDER
-    bpy.ops.object.mode_set(mode = 'OBJECT')
-
-#leaf bones get their size set relative to affected vertices instead of child bones
-def adjustBoneLengths(armatureObject, lengths):
-    bpy.ops.object.mode_set(mode='EDIT', toggle=False)
-    for boneIndex in lengths:
-        boneName = f'bone {boneIndex}'
-        bone = armatureObject.data.edit_bones[boneName]
-        if len(bone.children) == 0: #only adjust leaf bones
-            bone.tail[2] = max(bone.tail[2], lengths[boneIndex])
-    bpy.ops.object.mode_set(mode = 'OBJECT')
-
-def buildMesh(polygons, vertices, UVs, armature, objectName, materials, chosenDirectory): #:uvOffsets):
-    if chosenDirectory == 8:
-        offset = -16
-    else:
-        offset = 0
-    positions = []
-    faces = []
-
-    for vertex in vertices:
-        positions.append(vertex["position"])
-    for polygon in polygons["AQuads"]:
-        faces.append((polygon["vertices"][0], polygon["vertices"][2], polygon["vertices"][3] ,polygon["vertices"][1]))
-    for polygon in polygons["ATris"]:
-        faces.append((polygon["vertices"][0], polygon["vertices"][2], polygon["vertices"][1]))
-    for polygon in polygons["BQuads"]:
-        faces.append((polygon["vertices"][0], polygon["vertices"][2], polygon["vertices"][3] ,polygon["vertices"][1]))
-    for polygon in polygons["BTris"]:
-        faces.append((polygon["vertices"][0], polygon["vertices"][2], polygon["vertices"][1]))
-    for polygon in polygons["CQuads"]:
-        faces.append((polygon["vertices"][0], polygon["vertices"][2], polygon["vertices"][3] ,polygon["vertices"][1]))
-    for polygon in polygons["CTris"]:
-        faces.append((polygon["vertices"][0], polygon["vertices"][2], polygon["vertices"][1]))
-
-    mesh = bpy.data.meshes.new(objectName)
-    mesh.from_pydata(positions, [], faces)#faces) #(x y z) vertices, (1 2) edges, (variable index count) faces 
-
-    #TODO: if directory is 3 or 4, iterate through all UVs for each material and find min/max UVs, then crop the material's texture image (to closest multiple of 8)
-
-    if materials is not None:
-
-        #then resize UVs
-        textureDimensions =[]
-        for material in materials:
-            image = material.node_tree.nodes["Image Texture"].image
-            textureDimensions.append((image.size[0], image.size[1]))
-            mesh.materials.append(material)
-        scaledUVs = []
-        materialIDs =[]
-        for polygon in polygons["AQuads"]:
-            dimensions = textureDimensions[polygon["material"]]
-            #offset = uvOffsets[polygon["material"]]
-            UV0 = (UVs[polygon["UV"][0]][0] / dimensions[0], (UVs[polygon["UV"][0]][1]-offset )/ dimensions[1])
-            UV1 = (UVs[polygon["UV"][1]][0] / dimensions[0], (UVs[polygon["UV"][1]][1]-offset )/ dimensions[1])
-            UV2 = (UVs[polygon["UV"][2]][0] / dimensions[0], (UVs[polygon["UV"][2]][1]-offset )/ dimensions[1])
-            UV3 = (UVs[polygon["UV"][3]][0] / dimensions[0], (UVs[polygon["UV"][3]][1]-offset )/ dimensions[1])
-            scaledUVs.extend((UV0, UV2, UV3, UV1))
-            materialIDs.append(polygon["material"])
-        for polygon in polygons["ATris"]:
-            dimensions = textureDimensions[polygon["material"]]
-            #offset = uvOffsets[polygon["material"]]
-            UV0 = (UVs[polygon["UV"][0]][0] / dimensions[0], (UVs[polygon["UV"][0]][1]-offset) / dimensions[1])
-            UV1 = (UVs[polygon["UV"][1]][0] / dimensions[0], (UVs[polygon["UV"][1]][1]-offset) / dimensions[1])
-            UV2 = (UVs[polygon["UV"][2]][0] / dimensions[0], (UVs[polygon["UV"][2]][1]-offset) / dimensions[1])
-            scaledUVs.extend((UV0, UV2, UV1))
-            materialIDs.append(polygon["material"])
-        #build UVs from polygons
-        #build material IDs
-        new_uv = mesh.uv_layers.new(name = 'DefaultUV')
-        for loop in mesh.loops:
-            new_uv.uv[loop.index].vector = scaledUVs[loop.index]
-        for faceIndex, face in enumerate(mesh.polygons):
-            face.material_index = materialIDs[faceIndex]
-
-    #add to scene
-    object = bpy.data.objects.new(objectName, mesh)
-    scene = bpy.context.scene
-    scene.collection.objects.link(object)
-    object.scale = (SCALE_FACTOR, SCALE_FACTOR, SCALE_FACTOR)
-
-    groups = dict()
-    for i, vertex in enumerate(vertices):
-        if vertex["boneIndex"] not in groups:
-            groups[vertex["boneIndex"]] = []
-        groups[vertex["boneIndex"]].append(i)
-    for i in groups:
-        vertexGroup = object.vertex_groups.new(name=f'bone {i}')
-        vertexGroup.add(groups[i], 1.0, 'ADD')
-
-    #parent mesh to armature
-    object.parent = armature
-    modifier = object.modifiers.new("Armature", 'ARMATURE')
-    modifier.object = armature
+            loopUVs.append(np.zeros(count * len(winding), np.uint16))
+            colors.append(np.zeros((count, 3), np.uint8))
+            materials.append(np.zeros(count, np.uint8))
+    return (np.concatenate(loopVertices), np.concatenate(loopUVs), np.concatenate(loopTotals),
+        np.concatenate(colors), np.concatenate(materials))
+
+def readVertices(reader, address, count):
+    return reader.readArray(VERTEX_DTYPE, address, count)
+
+def readUVs(reader, address, count):
+    return reader.readArray(np.uint8, address, 2 * count).reshape(count, 2)
+
+#texel rows UVs are shifted by in a directory's images, weapon UVs start 16 rows above their image
+def getUVOffset(directory):
+    return -16 if directory == 8 else 0
+
+#per bone, the highest vertex along the bone over all meshes, -inf for bones no vertex uses
+def getGroupLengths(model):
+    lengths = np.full(model.boneCount, -np.inf)
+    for mesh in model.meshes:
+        np.maximum.at(lengths, mesh.boneIndices, mesh.positions[:, 2] * SCALE_FACTOR)
+    return lengths
+
+#bone tails along z: at least MIN_BONE_LENGTH, and reaching the farthest child
+def getBoneTails(model):
+    tails = np.full(model.boneCount, MIN_BONE_LENGTH)
+    np.maximum.at(tails, model.boneParents[1:], model.boneLengths[1:] * SCALE_FACTOR)
+    return tails
+
+def getLeafBones(model):
+    leaves = np.ones(model.boneCount, bool)
+    leaves[model.boneParents[1:]] = False
+    return leaves
+
+#bone tails reach the farthest child, and leaf bones the highest vertex they move instead
+def getRestTails(model):
+    tails = getBoneTails(model)
+    leaves = getLeafBones(model)
+    tails[leaves] = np.maximum(tails[leaves], getGroupLengths(model)[leaves])
+    return tails
 
 #### animations
 
-def readAnimations(animationHeader, armature, file_object):
-    bpy.ops.object.mode_set(mode='POSE', toggle=False)
-    animStart = 1
-    for pointer in animationHeader["objectPointers"]:
-        #no idea how to match the right animations, so we just try everything and ignore the ones that produce errors
-        try:
-            file_object.seek(pointer)
-            startAddress = file_object.tell()
-            zeroes = readUInt16(file_object)
-            if zeroes != 0:
-                raise Exception("invalid file header!!")
-            frameCount = readUInt16(file_object)
-
-            #this is actually positions
-            X = readUInt16(file_object)
-            Y = readUInt16(file_object)
-            Z = readUInt16(file_object)
-            mask = readUInt16(file_object)
-            if mask > 7:
-                raise Exception("invalid mask")
-
-            highAnglesPointer = readUInt32(file_object)
-            lowAnglesPointer = readUInt32(file_object)
-            getPositions(armature, animStart, frameCount, mask, X, Y, Z, startAddress, file_object)
-            getAngles(armature, animStart, frameCount, startAddress, highAnglesPointer, lowAnglesPointer, file_object)
-            animStart+= frameCount
-        except Exception as e:
-          print("An exception occurred, skipping animation")
-          print(e)
-
-    bpy.ops.object.mode_set(mode = 'OBJECT')
-    return animStart -1
-
-#gets positions for origin
-def getPositions(armature, animStart, frameCount, mask, X, Y, Z, startAddress, file_object):
-    bone = armature.pose.bones['bone 0']
-    for frame in range(0, frameCount):
-        bone.location = getPosition(frame, mask, X, Y, Z, startAddress, file_object)
-        bone.keyframe_insert(data_path="location", frame= frame+animStart)
-
-def getPosition(frame, mask, X, Y, Z, startAddress, file_object):
-    if (mask & 1) != 0: 
-        positionX = toSignedInt16(X);
-    else:
-        file_object.seek(startAddress + X + 2 * frame)
-        positionX = readInt16(file_object)
-    if (mask & 2) != 0:
-        positionY = toSignedInt16(Y);
-    else:
-        file_object.seek(startAddress + Y + 2 * frame)
-        positionY = readInt16(file_object)
-    if (mask & 4) != 0:
-        positionZ = toSignedInt16(Z);
-    else:
-        file_object.seek(startAddress + Z + 2 * frame)
-        positionZ = readInt16(file_object)
-    return Vector([positionX * SCALE_FACTOR, -positionY * SCALE_FACTOR, -positionZ * SCALE_FACTOR])
+ROOT_CORRECTION = (math.cos(-math.pi / 4), math.sin(-math.pi / 4), 0, 0) #half rotate root to match blender's frame of reference, ie 3pi/2 around x
+
+class AnimationCache:
+    """Animations decoded so far, or the reason they were skipped, keyed by (file address, animation pointer).
+    Decoding depends on the skeleton, so each key holds one result per bone count.
+    The models of a field or overworld file share one animation file, this decodes it once for all of them."""
+    __slots__ = ("results", "lookups", "misses")
+
+    def __init__(self):
+        self.results = dict()
+        self.lookups = 0
+        self.misses = 0
+
+    @property
+    def hits(self):
+        return self.lookups - self.misses
+
+    def get(self, reader, animationHeader, pointer, identifier, boneCount):
+        self.lookups += 1
+        byBoneCount = self.results.setdefault((animationHeader.address, pointer), dict())
+        if boneCount not in byBoneCount:
+            self.misses += 1
+            byBoneCount[boneCount] = tryDecodeAnimation(reader, animationHeader, pointer, identifier, boneCount)
+        return byBoneCount[boneCount]
+
+    #decodes, workers threads at a time, every animation of the file for each of the bone counts, in file order
+    def prefetch(self, reader, animationHeader, boneCounts, workers = 1):
+        jobs = []
+        for boneCount in dict.fromkeys(boneCounts):
+            for identifier, pointer in zip(animationHeader.objectIdentifiers, animationHeader.objectPointers):
+                if boneCount not in self.results.get((animationHeader.address, pointer), ()):
+                    jobs.append((pointer, identifier, boneCount))
+        results = mapInPool(lambda job: tryDecodeAnimation(reader, animationHeader, *job), jobs, workers)
+        for (pointer, identifier, boneCount), result in zip(jobs, results):
+            self.results.setdefault((animationHeader.address, pointer), dict())[boneCount] = result
+        self.misses += len(jobs)
+
+#the decoded animation, or the reason it doesn't fit a skeleton of boneCount bones
+def tryDecodeAnimation(reader, animationHeader, pointer, identifier, boneCount):
+    reason = checkAnimation(reader, pointer, animationHeader.endOfFile, boneCount)
+    if reason is not None:
+        return reason
+    try:
+        return decodeAnimation(reader, pointer, boneCount, identifier)
+    except Exception as e:
+        return str(e)
+
+#the animations of a file that fit a skeleton of boneCount bones, the others are counted by reason in skipped
+def readAnimations(animationHeader, boneCount, reader, skipped, cache = None):
+    if cache is None:
+        cache = AnimationCache()
+    animations = []
+    for identifier, pointer in zip(animationHeader.objectIdentifiers, animationHeader.objectPointers):
+        #animations aren't linked to models, so every animation whose layout fits the skeleton is used
+        result = cache.get(reader, animationHeader, pointer, identifier, boneCount)
+        if isinstance(result, str):
+            skipped[result] = skipped.get(result, 0) + 1
+        else:
+            animations.append(result)
+    return animations
+
+#(identifier, pointer) of the animations of a file that fit a skeleton of boneCount bones, found without decoding them
+def listAnimations(animationHeader, boneCount, reader, skipped):
+    index = []
+    for identifier, pointer in zip(animationHeader.objectIdentifiers, animationHeader.objectPointers):
+        reason = checkAnimation(reader, pointer, animationHeader.endOfFile, boneCount)
+        if reason is None:
+            index.append((identifier, pointer))
+        else:
+            skipped[reason] = skipped.get(reason, 0) + 1
+    return index
 
-def getAngles(armature, animStart, frameCount, startAddress, highAnglesPointer, lowAnglesPointer, file_object):
-    boneCount = len(armature.pose.bones)
-    rootCorrection = Quaternion((1,0,0), 3 * math.pi/2) #half rotate root to match blender's frame of reference 
-    for frame in range(0, frameCount):
-        for boneIndex in range(0, boneCount):
-            bone = armature.pose.bones[f'bone {boneIndex}']
-            bone.rotation_quaternion = GetAngle(boneIndex, frame, startAddress, highAnglesPointer, lowAnglesPointer, file_object)
-            if boneIndex == 0:
-                bone.rotation_quaternion = rootCorrection @ bone.rotation_quaternion
-            bone.keyframe_insert(data_path="rotation_quaternion", frame= frame+animStart)
-
-def GetAngle(boneIndex, frame, startAddress, highAnglesPointer, lowAnglesPointer, file_object):
-    #high bytes of angles
-    file_object.seek(startAddress + highAnglesPointer + boneIndex * 8)
-    s1 = readUInt16(file_object)
-    s2 = readUInt16(file_object)
-    s3 = readUInt16(file_object)
-    mask = readUInt16(file_object)
+#decodes one animation listed by listAnimations
+def loadAnimation(archivePath, pointer, boneCount, identifier = None, blockCache = 0):
+    with openArchive(archivePath, blockCache) as reader:
+        return decodeAnimation(reader, pointer, boneCount, identifier)
+
+#cheap compatibility test run before decoding, only reads the header and angle tables.
+#returns None if the animation fits a skeleton of boneCount bones, or the reason it doesn't
+def checkAnimation(reader, startAddress, endAddress, boneCount):
+    if startAddress + ANIMATION_HEADER.size > endAddress:
+        return "truncated header"
+    zeroes, frameCount, X, Y, Z, mask, highAnglesPointer, lowAnglesPointer = reader.unpack(ANIMATION_HEADER, startAddress)
+    if zeroes != 0:
+        return "invalid header"
+    if frameCount == 0:
+        return "no frames"
+    if mask > 7:
+        return "invalid position mask"
+    extent = endAddress - startAddress
+
+    #track offsets are relative to the animation, they tell where the angle tables have to stop
+    trackOffsets = []
+    for axis, value in enumerate((X, Y, Z)):
+        if (mask & (1 << axis)) == 0:
+            if value + 2 * frameCount > extent:
+                return "position track out of bounds"
+            trackOffsets.append(value)
+    tablePointers = [highAnglesPointer]
+    if lowAnglesPointer != 0:
+        tablePointers.append(lowAnglesPointer)
+    for tablePointer in tablePointers:
+        if tablePointer + 8 * boneCount > extent:
+            return "angle table out of bounds"
+        table = reader.readArray(ANGLE_TABLE_DTYPE, startAddress + tablePointer, boneCount)
+        if (table["mask"] > 7).any():
+            return "invalid angle mask"
+        for channel, name in enumerate(("s1", "s2", "s3")):
+            tracks = table[name][(table["mask"] & (1 << channel)) == 0].astype(np.int64)
+            if (tracks + frameCount > extent).any():
+                return "angle track out of bounds"
+            trackOffsets.extend(tracks.tolist())
+
+    #each table holds 8 bytes per bone and runs up to the next table or track
+    for tablePointer in tablePointers:
+        following = [offset for offset in trackOffsets + tablePointers if offset > tablePointer]
+        if len(following) == 0:
+            continue #nothing after the table, bone count can't be told
+        impliedBoneCount = (min(following) - tablePointer) // 8
+        if impliedBoneCount < boneCount:
+            return "fewer bones than the model"
+        if impliedBoneCount > boneCount:
+            return "more bones than the model"
+    return None
+
+#decodes every frame of an animation at once
+def decodeAnimation(reader, startAddress, boneCount, identifier = None):
+    zeroes, frameCount, X, Y, Z, mask, highAnglesPointer, lowAnglesPointer = reader.unpack(ANIMATION_HEADER, startAddress)
+    if zeroes != 0:
+        raise Exception("invalid file header!!")
     if mask > 7:
         raise Exception("invalid mask")
 
-    if (mask & 1) != 0:
-        yawHigh = (s1 & 0xff) << 4
-    else:
-        file_object.seek(startAddress + s1 + frame)
-        yawHigh = readUByte(file_object) << 4
-    if (mask & 2) != 0:
-        pitchHigh = (s2 & 0xff) << 4
-    else:
-        file_object.seek(startAddress + s2 + frame)
-        pitchHigh = readUByte(file_object) << 4
-    if (mask & 4) != 0:
-        rollHigh = (s3 & 0xff) << 4
-    else:
-        file_object.seek(startAddress + s3 + frame)
-        rollHigh = readUByte(file_object) << 4
-
-    #low bytes of angles
-
+    #position tracks hold one int16 per frame, masked ones are a single constant
+    constantPositions = np.array([(mask & (1 << axis)) != 0 for axis in range(3)])
+    positions = np.empty((frameCount, 3))
+    for axis, value in enumerate((X, Y, Z)):
+        if (mask & (1 << axis)) != 0:
+            positions[:, axis] = toSignedInt16(value)
+        else:
+            positions[:, axis] = reader.readArray("<i2", startAddress + value, frameCount)
+    positions *= (SCALE_FACTOR, -SCALE_FACTOR, -SCALE_FACTOR)
 
+    #angles are 12 bits, high byte tracks give the top 8, optional low byte tracks the bottom 4
+    highAngles, constantAngles = readAngleTracks(reader, startAddress, highAnglesPointer, boneCount, frameCount)
+    angles = (highAngles & 0xff) << 4
     if lowAnglesPointer!=0:
-        file_object.seek(startAddress + lowAnglesPointer + boneIndex * 8)
-        s1 = readUInt16(file_object)
-        s2 = readUInt16(file_object)
-        s3 = readUInt16(file_object)
-        mask = readUInt16(file_object)
-        if mask > 7:
-            raise Exception("invalid mask")
-        #Invalid on guard, IE I'm not reading the right stuff 
-
-        if (mask & 1) != 0:
-            yawLow = s1 & 0x0f;
-        else:
-            file_object.seek(startAddress + s1 + frame)
-            yawLow = readUByte(file_object) & 0x0f
-        if (mask & 2) != 0:
-            pitchLow = s2 & 0x0f;
-        else:
-            file_object.seek(startAddress + s2 + frame)
-            pitchLow = readUByte(file_object) & 0x0f
-        if (mask & 4) != 0: 
-            rollLow = s3 & 0x0f;
-        else:
-            file_object.seek(startAddress + s3 + frame)
-            rollLow = readUByte(file_object) & 0x0f
-    else:
-        yawLow = 0
-        pitchLow = 0
-        rollLow = 0
-    if (yawHigh > 4095 or yawHigh < 0 or pitchHigh > 4095
-        or pitchHigh < 0 or rollHigh > 4095 or rollHigh < 0):
-        raise Exception("angles error");
-    yaw = (yawHigh + yawLow) / 4096.0 * (2.0 * math.pi)
-    pitch = (pitchHigh + pitchLow) / 4096.0 * (2.0 * math.pi)
-    roll = (rollHigh + rollLow) / 4096.0 * (2.0 * math.pi)
-
-    rotX = Quaternion((1, 0, 0), yaw)
-    rotY = Quaternion((0, 0, -1), pitch)
-    rotZ = Quaternion((0, 1, 0), roll)
-    return rotZ @ rotY @ rotX
-    #return Euler((yaw, roll, pitch), 'ZYX').to_quaternion()
+        lowAngles, constantLowAngles = readAngleTracks(reader, startAddress, lowAnglesPointer, boneCount, frameCount)
+        angles += lowAngles & 0x0f
+        constantAngles &= constantLowAngles
+    rotations = anglesToQuaternions(angles / 4096.0 * (2.0 * math.pi))
+    rotations[:, 0] = multiplyQuaternions(np.array(ROOT_CORRECTION), rotations[:, 0])
+    #keyframes are single precision in blender anyway, halves what a cached directory 4 file holds
+    return AnimationData(identifier, frameCount, positions.astype(np.float32), rotations.astype(np.float32),
+        constantPositions, constantAngles.all(axis=1))
+
+#reads a (frames, bones, 3) array of yaw, pitch, roll bytes from a bone angle table,
+#and which of them the table stores as a constant, as (bones, 3)
+def readAngleTracks(reader, startAddress, tablePointer, boneCount, frameCount):
+    table = reader.readArray(ANGLE_TABLE_DTYPE, startAddress + tablePointer, boneCount)
+    if (table["mask"] > 7).any():
+        raise Exception("invalid mask")
+    constant = (table["mask"][:, None] & np.array((1, 2, 4))) != 0
+    tracks = np.empty((frameCount, boneCount, 3), np.int32)
+    for boneIndex, (s1, s2, s3, mask) in enumerate(table.tolist()):
+        for channel, value in enumerate((s1, s2, s3)):
+            if (mask & (1 << channel)) != 0:
+                tracks[:, boneIndex, channel] = value
+            else:
+                tracks[:, boneIndex, channel] = reader.readArray(np.uint8, startAddress + value, frameCount)
+    return tracks, constant
+
+#angles is (..., 3) yaw, pitch, roll in radians, returns (..., 4) w, x, y, z quaternions
+#equivalent to Quaternion((0, 1, 0), roll) @ Quaternion((0, 0, -1), pitch) @ Quaternion((1, 0, 0), yaw)
+def anglesToQuaternions(angles):
+    #mathutils wraps axis angles to [-pi, pi) first, which picks the sign of the quaternion
+    halves = (np.mod(angles + math.pi, 2.0 * math.pi) - math.pi) * 0.5
+    cosines = np.cos(halves)
+    sines = np.sin(halves)
+    zeroes = np.zeros(angles.shape[:-1])
+    rotX = np.stack((cosines[..., 0], sines[..., 0], zeroes, zeroes), axis=-1)
+    rotY = np.stack((cosines[..., 1], zeroes, zeroes, -sines[..., 1]), axis=-1)
+    rotZ = np.stack((cosines[..., 2], zeroes, sines[..., 2], zeroes), axis=-1)
+    return multiplyQuaternions(rotZ, multiplyQuaternions(rotY, rotX))
+
+#hamilton product of (..., 4) w, x, y, z arrays
+def multiplyQuaternions(a, b):
+    aw, ax, ay, az = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bw, bx, by, bz = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    return np.stack((
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw), axis=-1)
 
 def toSignedInt16(value):
-    return value-65536 if value & 0x8000 else value      
-
-#### textures and materials
-
-def readTextures(textureHeader, file_object):
-    materials = []
-    for i, pointer in enumerate(textureHeader["objectPointers"]):
-        file_object.seek(pointer)
-        texture = timToImage(readTIMTexture(file_object), f'image {i}')
-        materials.append(makeMaterial(texture))
-    return materials
-
-def readTexturesEx(textureHeader, matInfo, file_object):
+    return value-65536 if value & 0x8000 else value
+
+#### keyframe reduction
+
+#which of the (frames, channels) values to key for linear interpolation to stay within tolerance of all of them.
+#the first and last frames are always keyed. tolerance None keys every frame, 0 only drops keys lying exactly on a line.
+#swing door: from the last key, the slopes reaching every skipped value within tolerance narrow down to a corridor,
+#the first value whose slope leaves it means the frame before needs a key. all channels are walked at once
+def findKeys(values, tolerance = None):
+    frameCount, channelCount = values.shape
+    if tolerance is None or frameCount <= 2:
+        return np.ones(values.shape, bool)
+    values = values.astype(np.float64)
+    keep = np.zeros(values.shape, bool)
+    keep[0] = True
+    keep[-1] = True
+    channels = np.arange(channelCount)
+    anchor = np.zeros(channelCount, np.int64)
+    low = np.full(channelCount, -np.inf)
+    high = np.full(channelCount, np.inf)
+    for frame in range(1, frameCount):
+        start = values[anchor, channels]
+        slope = (values[frame] - start) / (frame - anchor)
+        broken = (slope < low) | (slope > high)
+        if broken.any():
+            keep[frame - 1, broken] = True
+            anchor[broken] = frame - 1
+            low[broken] = -np.inf
+            high[broken] = np.inf
+            start = values[anchor, channels]
+        distance = frame - anchor
+        low = np.maximum(low, (values[frame] - tolerance - start) / distance)
+        high = np.minimum(high, (values[frame] + tolerance - start) / distance)
+    return keep
+
+#keys to insert for an animation, as (frames, 3) and (frames, bones, 4) masks like its positions and rotations.
+#channels the file stores as constants get a single key, to be held with constant interpolation
+def getAnimationKeys(animation, tolerance = None):
+    frameCount, boneCount = animation.rotations.shape[:2]
+    positionKeys = findKeys(animation.positions, tolerance)
+    positionKeys[1:, animation.constantPositions] = False
+    rotationKeys = findKeys(animation.rotations.reshape(frameCount, -1), tolerance).reshape(frameCount, boneCount, 4)
+    rotationKeys[1:, animation.constantRotations] = False
+    return positionKeys, rotationKeys
+
+#### textures
+
+#one texture per TIM, shared by all the models of the file
+def readTextures(textureHeader, reader):
+    textures = []
+    for i, pointer in enumerate(textureHeader.objectPointers):
+        TIM = readTIMTexture(reader, pointer)
+        palette = TIM.colorTable.ravel() if TIM.colorTable is not None else None
+        key = textureKey(TIM.colorFormat, TIM.textureData, palette)
+        textures.append(TextureSource(f'image {i}', key, TIM.colorFormat, TIM.textureData, palette))
+    return textures
+
+#one texture per material, drawn from the TIMs of the file as laid out in vram
+def readTexturesEx(textureHeader, matInfo, reader):
     #matinfo has an entry for each model
     #each model has x materials
     #so there's one more level than I think
-    allMaterials = dict()
+    allTextures = dict()
     tims = []
-    for i, pointer in enumerate(textureHeader["objectPointers"]):
-        file_object.seek(pointer)
-        tims.append(readTIMTexture(file_object))
+    for i, pointer in enumerate(textureHeader.objectPointers):
+        tims.append(readTIMTexture(reader, pointer))
+    vram = Vram(tims)
     for modelInfo in matInfo:
-        materials =[]
-        for i, texInfo in enumerate(modelInfo["materials"]):
-            print("texinfo: ", texInfo)
-            #iterate through tims to find the ones containing texture and clut
-            for tim in tims:
-                if (texInfo["tpage"][0] >= tim["TextureRect"][0]
-                and texInfo["tpage"][0] < tim["TextureRect"][0] + tim["TextureRect"][2]
-                and texInfo["tpage"][1] >= tim["TextureRect"][1]
-                and texInfo["tpage"][1] < tim["TextureRect"][1] + tim["TextureRect"][3]):
-                    tpage = tim
-                    break
-            for tim in tims:
-                if (texInfo["clut"][0] >= tim["TextureRect"][0]
-                and texInfo["clut"][0] < tim["TextureRect"][0] + tim["TextureRect"][2]
-                and texInfo["clut"][1] >= tim["TextureRect"][1]
-                and texInfo["clut"][1] < tim["TextureRect"][1] + tim["TextureRect"][3]):
-                    clut = tim
-                    break
-            texture = timToImageEx(tpage, clut, texInfo, f'model {modelInfo["mesh_id"]} image {i}')
-            materials.append(makeMaterial(texture))
-        allMaterials[modelInfo["mesh_id"]] =materials
-    return allMaterials #this one will be a dict of list, because it has to handle several models
-
-def readTIMTexture(file_object):
+        textures =[]
+        for i, texInfo in enumerate(modelInfo.materials):
+            log.debug("texinfo: %s", texInfo)
+            textureName = f'model {modelInfo.meshID} image {i}'
+            page, palette = getTextureSource(vram, texInfo, textureName)
+            key = textureKey(texInfo.texMode, page, palette, texInfo.blendMode)
+            textures.append(TextureSource(textureName, key, texInfo.texMode, page, palette))
+        allTextures[modelInfo.meshID] = textures
+    return allTextures #this one will be a dict of list, because it has to handle several models
+
+VRAM_WIDTH = 1024
+VRAM_HEIGHT = 512
+#texture pages are 64x256 16-bit pixels, the vram index is a grid of them
+VRAM_CELL_WIDTH = 64
+VRAM_CELL_HEIGHT = 256
+
+class Vram:
+    """Emulated PS1 framebuffer, 1024x512 16-bit words, with all the TIMs of a texture file uploaded.
+
+    rects keeps where each image landed, and cells indexes them by the texture page
+    cells they overlap so finding what owns a coordinate only looks at a handful of rects.
+    """
+
+    def __init__(self, tims):
+        self.words = np.zeros((VRAM_HEIGHT, VRAM_WIDTH), np.uint16)
+        self.rects = []
+        self.cells = [[[] for x in range(VRAM_WIDTH // VRAM_CELL_WIDTH)] for y in range(VRAM_HEIGHT // VRAM_CELL_HEIGHT)]
+        for tim in tims:
+            if tim.colorTable is not None:
+                self.upload(tim.colorTableRect, tim.colorTable)
+            self.upload(tim.textureRect, tim.textureData)
+
+    def upload(self, rect, data):
+        x, y, width, height = rect
+        #clip to the framebuffer
+        width = min(width, VRAM_WIDTH - x)
+        height = min(height, VRAM_HEIGHT - y)
+        if width <= 0 or height <= 0:
+            return
+        self.words[y:y + height, x:x + width] = data[:height, :width]
+        rectIndex = len(self.rects)
+        self.rects.append((x, y, width, height))
+        for cellY in range(y // VRAM_CELL_HEIGHT, (y + height - 1) // VRAM_CELL_HEIGHT + 1):
+            for cellX in range(x // VRAM_CELL_WIDTH, (x + width - 1) // VRAM_CELL_WIDTH + 1):
+                self.cells[cellY][cellX].append(rectIndex)
+
+    #the uploaded rect containing a coordinate, later uploads win like they would in vram. None if nothing is there
+    def findRect(self, x, y):
+        if x < 0 or y < 0 or x >= VRAM_WIDTH or y >= VRAM_HEIGHT:
+            return None
+        for rectIndex in reversed(self.cells[y // VRAM_CELL_HEIGHT][x // VRAM_CELL_WIDTH]):
+            rectX, rectY, width, height = self.rects[rectIndex]
+            if rectX <= x < rectX + width and rectY <= y < rectY + height:
+                return self.rects[rectIndex]
+        return None
+
+#the (wrapped) texture page words and palette words a material is drawn from, palette is None for 16bpp
+def getTextureSource(vram, info, textureName):
+    tpage = vram.findRect(*info.tpage)
+    if tpage is None:
+        raise Exception(f'{textureName}: no texture uploaded at tpage {info.tpage}')
+    #the image that holds the tpage is how far from tpage start we're allowed to look ahead
+    pageX, pageY, pageWidth, pageHeight = tpage
+
+    x = info.textureWindow[0]
+    x = (x  >> (2-info.texMode)) + info.tpage[0] - pageX #now in vram size, from start of tpage
+    y = info.textureWindow[1] + info.tpage[1] - pageY
+
+    log.debug("%s: page %dx%d, %s", textureName, pageWidth, pageHeight, info)
+    #the texture window wraps around the page
+    page = np.roll(vram.words[pageY:pageY + pageHeight, pageX:pageX + pageWidth], (-y, -x), axis=(0, 1))
+
+    if info.texMode == COLOR_RGBA_16BPP:
+        return page, None
+    if info.texMode == COLOR_PALETTED_4BPP or info.texMode == COLOR_PALETTED_8BPP:
+        clutLength = 16 if info.texMode == COLOR_PALETTED_4BPP else 256
+        clutX, clutY = info.clut
+        if vram.findRect(clutX, clutY) is None:
+            raise Exception(f'{textureName}: no clut uploaded at {info.clut}')
+        return page, vram.words[clutY, clutX:clutX + clutLength]
+    raise Exception("invalid color format")
+
+#identifies a texture by what its pixels are decoded from, plus any material parameter
+def textureKey(colorFormat, data, palette, *materialParameters):
+    key = hashlib.blake2b(digest_size=16)
+    key.update(repr((colorFormat, data.shape, materialParameters)).encode("utf-8"))
+    key.update(np.ascontiguousarray(data).tobytes())
+    if palette is not None:
+        key.update(np.ascontiguousarray(palette).tobytes())
+    return key.hexdigest()
+
+def readTIMTexture(reader, startAddress):
     #read header
-    start = startAddress = file_object.tell()
-    TIMtag = readUByte(file_object)
+    TIMtag, version, flags = reader.unpack(TIM_HEADER, startAddress)
     if TIMtag != 0x10:
         raise Exception("Invalid texture!")
-    version = readUByte(file_object)
-    file_object.seek(2, 1) #skip 2 bytes
-    flags = readUInt32(file_object)
     colorformat = flags & 3
     ColorTablePresent = (flags & 8) != 0
+    address = startAddress + TIM_HEADER.size
 
-    TIM = dict()
-    TIM["format"] = colorformat
+    TIM = TimImage()
+    TIM.colorFormat = colorformat
+    TIM.colorTableRect = None
+    TIM.colorTable = None
     #read palettes
     if ColorTablePresent:
-        colorTableLength = readUInt32(file_object)
-        colorTableX = readUInt16(file_object) #x,y,width, height are in 16-bit pixels
-        colorTableY = readUInt16(file_object)
-        colorTableWidth = readUInt16(file_object)
-        colorTableHeight = readUInt16(file_object)
+        #x,y,width, height are in 16-bit pixels
+        colorTableLength, colorTableX, colorTableY, colorTableWidth, colorTableHeight = reader.unpack(TIM_BLOCK, address)
         tablelength = colorTableHeight * colorTableWidth
-        colorTable = []
-        for i in range(0, tablelength):
-            colorTable.append(UInt16ToRGBA(readUInt16(file_object)))
-        print("colorTableX:" , colorTableX)
-        print("colorTableY:" , colorTableY)
-        print("colorTableWidth:" , colorTableWidth)
-        print("colorTableHeight:" , colorTableHeight)
-        TIM["ColorTableRect"] = (colorTableX, colorTableY, colorTableWidth, colorTableHeight)
-        TIM["ColorTable"] = colorTable
+        log.debug("color table at %d, %d, %dx%d", colorTableX, colorTableY, colorTableWidth, colorTableHeight)
+        TIM.colorTableRect = (colorTableX, colorTableY, colorTableWidth, colorTableHeight)
+        #raw 16 bit colors
+        TIM.colorTable = reader.readArray("<u2", address + TIM_BLOCK.size, tablelength).reshape(colorTableHeight, colorTableWidth)
+        address += TIM_BLOCK.size + 2 * tablelength
     #read texture data
-    textureLength = readUInt32(file_object)
-    textureX = readUInt16(file_object)
-    textureY = readUInt16(file_object)
-    textureWordWidth = readUInt16(file_object)
-    textureHeight = readUInt16(file_object)
-    
-    print("textureX:" , textureX)
-    print("textureY:" , textureY)
-    print("textureWordWidth:" , textureWordWidth)
-    print("textureHeight:" , textureHeight)
-    print("")
-    TIM["TextureRect"] = (textureX, textureY, textureWordWidth, textureHeight)
-
-    #read array of Uint16
-    data = []
-    for i in range (0, textureWordWidth * textureHeight):
-        data.append(readUInt16(file_object))
-    TIM["TextureData"] = data
-    return TIM
+    textureLength, textureX, textureY, textureWordWidth, textureHeight = reader.unpack(TIM_BLOCK, address)
 
-def timToImage(TIM, textureName):
-    if TIM["format"] == COLOR_PALETTED_4BPP:
-        textureWidth = TIM["TextureRect"][RECT_WIDTH]*4
-        imageData = Read4bppImage(TIM["TextureData"])
-    elif TIM["format"] == COLOR_PALETTED_8BPP:
-        textureWidth = TIM["TextureRect"][RECT_WIDTH]*2
-        imageData = Read8bppImage(TIM["TextureData"], TIM["ColorTable"])
-    elif TIM["format"] == COLOR_RGBA_16BPP:
-        textureWidth = TIM["TextureRect"][RECT_WIDTH]
-        imageData = Read16bppImage(TIM["TextureData"])
-    else: #elif TIM["format"] == COLOR_RGB_24BPP:
-        imageData = Read24bppImage(TIM["TextureData"])
-
-    image = bpy.data.images.new(textureName, textureWidth, TIM["TextureRect"][RECT_HEIGHT], alpha = True)
-    image.pixels = imageData
-    image.file_format = 'PNG'
-    image.pack()
-    return image
-
-def timToImageEx(tim, clut, info, textureName):
+    log.debug("texture at %d, %d, %d words x %d", textureX, textureY, textureWordWidth, textureHeight)
+    TIM.textureRect = (textureX, textureY, textureWordWidth, textureHeight)
 
-    #build palette
-    #clut is a full tim image, need to get the raw palette line from it
-    if info["texMode"] == COLOR_PALETTED_4BPP:
-        clutLength = 16
-    else:
-        clutLength = 256
-    print(clut)
-    palette = []
-    clutorigin =  (info["clut"][1] -clut["TextureRect"][RECT_Y]) * clut["TextureRect"][RECT_WIDTH] + info["clut"][0] -clut["TextureRect"][RECT_X]
-    for i in range(clutLength):
-        palette.append(UInt16ToRGBA(clut["TextureData"][clutorigin +i]))
-
-    pageWidth = tim["TextureRect"][RECT_WIDTH] #<< info["texMode"] # this is how far from tpage start we're allowed to look ahead horizontally. Always 256 vertically
-    pageHeight = tim["TextureRect"][RECT_HEIGHT] #256
-
-    x = info["textureWindow"][0]
-    x = (x  >> (2-info["texMode"])) + info["tpage"][0] - tim["TextureRect"][0] #now in vram size, from start of tpage
-
-    y = info["textureWindow"][1] + info["tpage"][1] - tim["TextureRect"][1]
-
-    imagePixels =[]
-    print (pageWidth, pageHeight)
-    print (pageWidth * pageHeight, len(tim["TextureData"]))
-    print(info)
-    for pixelY in range (0, pageHeight):
-        for pixelX in range(0, pageWidth):
-            pixel = tim["TextureData"][((pageHeight + pixelY+y)%pageHeight) * tim["TextureRect"][RECT_WIDTH] + ((pageWidth+ pixelX+x)%pageWidth)]
-            if info["texMode"] == COLOR_PALETTED_4BPP:
-                imagePixels.extend(palette[pixel & 0xF])
-                imagePixels.extend(palette[(pixel >> 4) & 0xF])
-                imagePixels.extend(palette[(pixel >> 8) & 0xF])
-                imagePixels.extend(palette[(pixel >> 12) & 0xF])
-            elif info["texMode"] == COLOR_PALETTED_8BPP:
-                imagePixels.extend(palette[pixel & 0xFF])
-                imagePixels.extend(palette[(pixel >> 8) & 0xFF])
-            elif info["texMode"] == COLOR_RGBA_16BPP:
-                imagePixels.extend(UInt16ToRGBA(pixel))
-            else:
-                raise Exception("invalid color format")
+    #read (height, word width) array of Uint16
+    TIM.textureData = reader.readArray("<u2", address + TIM_BLOCK.size, textureWordWidth * textureHeight).reshape(textureHeight, textureWordWidth)
+    return TIM
 
-    image = bpy.data.images.new(textureName, pageWidth * (1 << (2-info["texMode"])), pageHeight, alpha = True)
-    image.pixels = imagePixels
-    image.file_format = 'PNG'
-    image.pack()
-    return image
+#splits (height, width) 16 bit words into (height, width * 16/bitsPerPixel) indices, lowest bits first
+def unpackIndices(data, bitsPerPixel):
+    shifts = np.arange(0, 16, bitsPerPixel, dtype=np.uint16)
+    indices = (data[..., None] >> shifts) & ((1 << bitsPerPixel) - 1)
+    return indices.reshape(data.shape[0], -1)
 
-def Read4bppImage(data):
-    raise Exception("not implemented")
+#the Read*Image functions all return (height, width, 4) float32 RGBA
+def Read4bppImage(data, colorTable):
+    return getColorLookup()[colorTable][unpackIndices(data, 4)]
 
-def Read8bppImage(data, palette):
-    result = []
-    for pixel in data:
-        result.extend(palette[pixel & 0xFF])
-        result.extend(palette[(pixel >> 8) & 0xFF])
-    return result
+def Read8bppImage(data, colorTable):
+    return getColorLookup()[colorTable][unpackIndices(data, 8)]
 
 def Read16bppImage(data):
-    result = []
-    for pixel in data:
-        result.extend(UInt16ToRGBA(pixel))
-    return result
+    return getColorLookup()[data]
 
 def Read24bppImage(data):
-    raise Exception("not implemented")   
-            
-
-def UInt16ToRGBA(colorword):
-    red = (colorword & 31) / 31.0
-    green = ((colorword >> 5) & 31) / 31.0
-    blue = ((colorword >> 10) & 31) / 31.0
-    STP = (colorword & 32768) != 0 #Special Transparency Processing
-    alpha = 1
-    if (red == 0 and blue == 0 and green == 0 and STP == False):
-        alpha = 0
-    return (red, green, blue, alpha)
-
-def makeMaterial(texture):
-    #simple texture with transparency and nearest neighbor filtering
-    mat = bpy.data.materials.new(texture.name)
-    mat.use_nodes = True
-    mat.use_backface_culling = True
-    nodes = mat.node_tree.nodes
-    nodes.remove(nodes["Principled BSDF"])
-    textureNode=nodes.new("ShaderNodeTexImage")
-    textureNode.image = texture
-    textureNode.interpolation = 'Closest'
-    transparentNode =nodes.new("ShaderNodeBsdfTransparent")
-    mixNode =nodes.new("ShaderNodeMixShader")
-    mat.node_tree.links.new(mixNode.inputs[0], textureNode.outputs[1]) #texture alpha as factor
-    mat.node_tree.links.new(mixNode.inputs[1], transparentNode.outputs[0])
-    mat.node_tree.links.new(mixNode.inputs[2], textureNode.outputs[0])
-    mat.node_tree.links.new(nodes['Material Output'].inputs[0], mixNode.outputs[0])
-    mat.blend_method = 'CLIP'
-    mat.alpha_threshold = 0.999
-    mat.shadow_method = 'CLIP'
-    return mat
+    #3 bytes per pixel packed in 16 bit words, rows can end with a padding byte
+    width = data.shape[1] * 2 // 3
+    colors = np.ascontiguousarray(data).view(np.uint8)[:, :width * 3].reshape(data.shape[0], width, 3)
+    imageData = np.ones((data.shape[0], width, 4), np.float32)
+    imageData[..., :3] = colors / 255.0
+    return imageData
+
+#(..., 4) float32 RGBA of an array of 16 bit colors
+def UInt16ToRGBA(colorwords):
+    colorwords = np.asarray(colorwords, np.uint32)
+    rgba = np.empty(colorwords.shape + (4,), np.float32)
+    rgba[..., 0] = (colorwords & 31) / 31.0
+    rgba[..., 1] = ((colorwords >> 5) & 31) / 31.0
+    rgba[..., 2] = ((colorwords >> 10) & 31) / 31.0
+    STP = (colorwords & 32768) != 0 #Special Transparency Processing
+    rgba[..., 3] = ((colorwords & 32767) != 0) | STP #only black without STP is transparent
+    return rgba
+
+COLOR_LOOKUP = None
+
+#(65536, 4) float32 RGBA for every 16 bit color
+def getColorLookup():
+    global COLOR_LOOKUP
+    if COLOR_LOOKUP is None:
+        COLOR_LOOKUP = UInt16ToRGBA(np.arange(65536))
+    return COLOR_LOOKUP
+
+#### texture cropping
+# field and overworld materials each get a whole texture page, of which their UVs usually sample a small window
+
+CROP_GRANULARITY = 8 #texture windows are placed in steps of 8 texels, crops are rounded out to them
+BITS_PER_PIXEL = (4, 8, 16, 24) #by color format
+CROP_BYTES_PER_TEXEL = 4 #blender keeps imported images as 8 bit RGBA
+
+#(width, height) in texels of what a texture source decodes to
+def getTextureSize(texture):
+    height, wordWidth = texture.data.shape
+    return wordWidth * 16 // BITS_PER_PIXEL[texture.colorFormat], height
+
+#per material, the (x, y, width, height) texel rect the model's faces sample, rounded out to CROP_GRANULARITY.
+#None for materials no face uses, or whose UVs reach past the texture and wrap around
+def getUVBounds(model, textures):
+    low = np.full((len(textures), 2), np.iinfo(np.int32).max)
+    high = np.full((len(textures), 2), -1)
+    for mesh in model.meshes:
+        loopMaterials = np.repeat(mesh.materials, mesh.loopTotals)
+        used = loopMaterials < len(textures)
+        UVs = mesh.UVs[mesh.loopUVs[used]].astype(np.int32)
+        np.minimum.at(low, loopMaterials[used], UVs)
+        np.maximum.at(high, loopMaterials[used], UVs)
+    bounds = []
+    for texture, start, end in zip(textures, low, high):
+        size = np.array(getTextureSize(texture))
+        if end[0] < 0 or (end >= size).any():
+            bounds.append(None)
+            continue
+        start = start // CROP_GRANULARITY * CROP_GRANULARITY
+        end = np.minimum((end // CROP_GRANULARITY + 1) * CROP_GRANULARITY, size)
+        bounds.append((int(start[0]), int(start[1]), int(end[0] - start[0]), int(end[1] - start[1])))
+    return bounds
+
+#the texture source of a texel rect of another. texel rects on multiples of 8 start and end on whole words at any bit depth
+def cropTexture(texture, rect):
+    x, y, width, height = rect
+    bits = BITS_PER_PIXEL[texture.colorFormat]
+    data = texture.data[y:y + height, x * bits // 16:((x + width) * bits + 15) // 16]
+    key = hashlib.blake2b(f'{texture.key}:{rect}'.encode("utf-8"), digest_size=16).hexdigest()
+    return TextureSource(texture.name, key, texture.colorFormat, data, texture.palette)
+
+#moves the model's UVs by the texel origin of their face's material, UVs shared by faces of different materials are split
+def offsetUVs(model, origins):
+    for mesh in model.meshes:
+        loopMaterials = np.repeat(mesh.materials, mesh.loopTotals).astype(np.int64)
+        pairs, loopUVs = np.unique(mesh.loopUVs.astype(np.int64) * 256 + loopMaterials, return_inverse=True)
+        mesh.UVs = (mesh.UVs[pairs // 256] - origins[pairs % 256]).astype(np.uint8)
+        mesh.loopUVs = loopUVs.astype(np.uint32)
+
+#crops the textures of a model to the part its UVs sample, remapping them to match. returns the new texture list
+def cropTextures(model, textures, report):
+    origins = np.zeros((256, 2), np.int32) #by material index, as stored in the faces
+    cropped = []
+    for i, (texture, rect) in enumerate(zip(textures, getUVBounds(model, textures))):
+        width, height = getTextureSize(texture)
+        count(report, "uncroppedTextureBytes", width * height * CROP_BYTES_PER_TEXEL)
+        if rect is not None and rect[2:] != (width, height):
+            origins[i] = rect[:2]
+            texture = cropTexture(texture, rect)
+            width, height = rect[2:]
+        count(report, "textureBytes", width * height * CROP_BYTES_PER_TEXEL)
+        cropped.append(texture)
+    if origins.any():
+        offsetUVs(model, origins)
+    return cropped
 
 #### file system
 
-def readDataBlockHeader(file_object):
-    header = dict()
-    header["fileCount"] = readUByte(file_object)
-    header["zero"] = readUInt16(file_object)
-    if header["zero"] !=0:
+DIRECTORY_DTYPE = np.dtype([("type", "<u4"), ("fileCount", "<u4"), ("startSector", "<u4"), ("sectorOfFirstFile", "<u4")])
+
+class ArchiveIndex:
+    """The root directory of the archive, directories is an array of DIRECTORY_DTYPE entries."""
+    __slots__ = ("header", "unknown1", "unknown2", "directories")
+
+    @property
+    def directoryCount(self):
+        return len(self.directories)
+
+class FileHeader:
+    """Where the file starts, identifiers and absolute pointers of its objects, and where it ends."""
+    __slots__ = ("address", "objectIdentifiers", "objectPointers", "endOfFile")
+
+    def __repr__(self):
+        return f'FileHeader(objectIdentifiers={self.objectIdentifiers}, objectPointers={self.objectPointers}, endOfFile={self.endOfFile})'
+
+    @property
+    def objectCount(self):
+        return len(self.objectPointers)
+
+class FilePointer:
+    """A file in a datablock, parent is the index of that datablock in the directory tables."""
+    __slots__ = ("address", "type", "parent")
+
+    def __init__(self, address, type, parent):
+        self.address = address
+        self.type = type
+        self.parent = parent
+
+DIRECTORY_TABLES = {
+    "fileID": np.uint16, "fileType": np.uint16, "fileFirstSector": np.uint32, #directory file pointer table
+    "blockParent": np.int32, "blockEnd": np.int32,                           #datablocks
+    "pointerBlock": np.int32, "pointerAddress": np.int64, "pointerType": np.uint8, #files in datablocks
+}
+
+class DirectoryTables:
+    """Flattened directory -> datablock -> file pointer tables for one directory of the archive, one array per column.
+
+    Blocks are numbered in depth first order so the blocks below a block are the
+    range [block, blockEnd[block]). Root blocks have a blockParent of -1.
+    """
+    __slots__ = tuple(DIRECTORY_TABLES)
+
+    def __init__(self, columns):
+        for name, dtype in DIRECTORY_TABLES.items():
+            setattr(self, name, np.asarray(columns[name], dtype))
+
+    def rootBlocks(self):
+        return np.flatnonzero(self.blockParent == -1).tolist()
+
+#appends a datablock and, after it, all of its nested datablocks to the flat directory tables.
+def readDataBlockHeader(reader, address, parentBlock, tables):
+    fileCount, zero = reader.unpack(DATABLOCK_HEADER, address)
+    if zero !=0:
         raise Exception("db header error")
-    header["pointers"] = []
-    header["childChunks"] = []
-    for i in range(0, header["fileCount"]):
-        #read db pointer
-        pointer = dict()
-        baseAddress = file_object.tell()
-        byte0 = readUByte(file_object)
-        byte1 = readUByte(file_object)
-        byte2 = readUByte(file_object)
-        pointer["address"] = byte2 * 65536 + byte1 * 256 + byte0 + baseAddress
-        pointer["type"] = readUByte(file_object)
-        header["pointers"].append(pointer)
-    for pointer in header["pointers"]:
-        if pointer["type"] == FILETYPE_DATABLOCK:
-            #file_object.seek(pointer["address"]) #seek is done inside
-            fileheader = readFileHeader(pointer, file_object)
-            for datapointer in fileheader["objectPointers"]:
-                file_object.seek(datapointer)
-                DBmarker = readUByte(file_object)
+    block = len(tables["blockParent"])
+    tables["blockParent"].append(parentBlock)
+    tables["blockEnd"].append(block + 1)
+    baseAddress = address + DATABLOCK_HEADER.size
+    pointers = []
+    for value in reader.unpackArray("I", baseAddress, fileCount):
+        #read db pointer, 24 bit address relative to the pointer itself and 8 bit type
+        pointers.append(((value & 0xFFFFFF) + baseAddress, value >> 24))
+        baseAddress += 4
+    for pointerAddress, pointerType in pointers:
+        tables["pointerBlock"].append(block)
+        tables["pointerAddress"].append(pointerAddress)
+        tables["pointerType"].append(pointerType)
+    for pointerAddress, pointerType in pointers:
+        if pointerType == FILETYPE_DATABLOCK:
+            fileheader = readFileHeader(FilePointer(pointerAddress, pointerType, block), reader)
+            for datapointer in fileheader.objectPointers:
+                DBmarker = reader.readUByte(datapointer)
                 if DBmarker != DBCHUNK:
                     raise Exception("not a datablock")
-                DBheader = readDataBlockHeader(file_object)
-                DBheader["parent"] = header
-                header["childChunks"].append(DBheader)
-    return header
-
-def collectFiles(dataBlocks, fileType, fileCollection):
-    for block in dataBlocks:
-        for pointer in block["pointers"]:
-            if pointer["type"] == fileType:
-                fileCollection.append(pointer)
-                pointer["parent"] = block
-        collectFiles(block["childChunks"], fileType, fileCollection)
-
-def readFileHeader(filePointer, file_object):
-    startAddress = filePointer["address"]
-    file_object.seek(startAddress)
+                readDataBlockHeader(reader, datapointer + 1, block, tables)
+    tables["blockEnd"][block] = len(tables["blockParent"])
+
+def readDirectory(reader, dir):
+    tables = {name: [] for name in DIRECTORY_TABLES}
+    startAddress = int(dir["startSector"]) * SECTORSIZE
+    for i in range(0, int(dir["fileCount"])):
+        fileID, fileType, firstSector = reader.unpack(DIRECTORY_FILE_POINTER, startAddress + i * DIRECTORY_FILE_POINTER.size)
+        tables["fileID"].append(fileID)
+        tables["fileType"].append(fileType)
+        tables["fileFirstSector"].append(firstSector)
+    #then load the file headers or subdirectories
+    if dir["type"] == DIRTYPE_NORMAL: #only if type 2
+        for firstSector in tables["fileFirstSector"]:
+            address = firstSector * SECTORSIZE
+            fileType = reader.readUByte(address)
+            if fileType == DBCHUNK:
+                #read db chunk header
+                readDataBlockHeader(reader, address + 1, -1, tables)
+            #else:
+            #    #other sort of file
+    return DirectoryTables(tables)
+
+#files of a type in the given blocks and all the blocks below them, in depth first order
+def collectFiles(tables, blocks, fileType):
+    inBlocks = np.zeros(len(tables.pointerBlock), bool)
+    for block in blocks:
+        inBlocks |= (tables.pointerBlock >= block) & (tables.pointerBlock < tables.blockEnd[block])
+    fileCollection = []
+    for i in np.flatnonzero(inBlocks & (tables.pointerType == fileType)).tolist():
+        fileCollection.append(FilePointer(int(tables.pointerAddress[i]), fileType, int(tables.pointerBlock[i])))
+    return fileCollection
+
+def parentBlock(tables, block):
+    parent = int(tables.blockParent[block])
+    return block if parent == -1 else parent
+
+def readFileHeader(filePointer, reader):
+    startAddress = filePointer.address
 
     #read header
-    DBmark = readUByte(file_object)
-    objectCount = readUByte(file_object)
-    zero = readUInt16(file_object)
+    DBmark, objectCount, zero = reader.unpack(FILE_HEADER, startAddress)
     if zero != 0:
          raise Exception("invalid file header!!")
     #read the IDs
-    objectIdentifiers = []
-    for i in range(0, objectCount):
-        objectIdentifiers.append(readUInt16(file_object))
+    address = startAddress + FILE_HEADER.size
+    objectIdentifiers = list(reader.unpackArray("H", address, objectCount))
+    address += 2 * objectCount
 
     #IDs are 4 bytes aligned, so skip two bytes if odd count
     if objectCount % 2 !=0:
-        file_object.seek(2, 1) #1: seek relative to position
-    #read the object pointers
+        address += 2
+    #read the object pointers, each relative to its own position
     objectPointers = [];
-    for i in range(0, objectCount):
-        baseaddress = file_object.tell()
-        objectPointers.append(baseaddress + readInt32(file_object))
-    endOfFile = file_object.tell() + readUInt32(file_object)
-    header = dict()
-    header["objectCount"] = objectCount
-    header["objectIdentifiers"] = objectIdentifiers
-    header["objectPointers"] = objectPointers
+    for i, offset in enumerate(reader.unpackArray("i", address, objectCount)):
+        objectPointers.append(address + 4 * i + offset)
+    address += 4 * objectCount
+    endOfFile = address + reader.readUInt32(address)
+    header = FileHeader()
+    header.address = startAddress
+    header.objectIdentifiers = objectIdentifiers
+    header.objectPointers = objectPointers
+    header.endOfFile = endOfFile
 
     return header
 
-def readIndex(file_object):
-    index = dict() #aka root directory
-    index["header"] = readUBytes(file_object, 4)
-    index["unknown1"] = readUInt32(file_object)
-    index["directoryCount"] = readUInt32(file_object)
-    index["unknown2"] = readUInt32(file_object)
-    index["directories"] = []
-    for i in range(0, index["directoryCount"]):
-        directory = dict()
-        directory["type"] = readUInt32(file_object)
-        directory["fileCount"] = readUInt32(file_object)
-        directory["startSector"] = readUInt32(file_object) #directory information sector
-        directory["sectorOfFirstFile"] = readUInt32(file_object)
-        index["directories"].append(directory)
+def readIndex(reader):
+    index = ArchiveIndex() #aka root directory
+    index.header, index.unknown1, directoryCount, index.unknown2 = reader.unpack(INDEX_HEADER, 0)
+    index.directories = reader.readArray(DIRECTORY_DTYPE, INDEX_HEADER.size, directoryCount)
     return index
 
-def ImportModel(archiveFile, chosenDirectory = None, chosenModel = None):
-    with open(archiveFile, "rb") as file_object:
-        index = readIndex(file_object)
-        print("index read")
+#### index cache
+
+INDEX_CACHE_VERSION = 1
+
+def getCacheDirectory():
+    if sys.platform == "win32":
+        root = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif sys.platform == "darwin":
+        root = os.path.expanduser("~/Library/Caches")
+    else:
+        root = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(root, "ff9_blender_importer")
+
+#all cache files of an archive share this prefix, whatever the archive's state
+def getIndexCachePrefix(archivePath):
+    archivePath = os.path.abspath(archivePath)
+    pathHash = hashlib.sha1(archivePath.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(getCacheDirectory(), f'{os.path.basename(archivePath)}-{pathHash}-')
+
+#feeds what changes whenever the archive changes to a hash: its size, modification time and root index
+def hashArchiveState(key, reader, index):
+    stat = os.stat(reader.path)
+    key.update(f'{stat.st_size} {stat.st_mtime_ns} '.encode("utf-8"))
+    key.update(reader.readUBytes(0, INDEX_HEADER.size + index.directoryCount * DIRECTORY_ENTRY.size))
+    return key
+
+#changes whenever the archive does, for keys of what was decoded from it
+def getArchiveState(archivePath):
+    with openArchive(archivePath) as reader:
+        return hashArchiveState(hashlib.blake2b(digest_size=16), reader, readIndex(reader)).hexdigest()
+
+def getIndexCachePath(reader, index):
+    key = hashArchiveState(hashlib.sha1(f'{INDEX_CACHE_VERSION} '.encode("utf-8")), reader, index)
+    return getIndexCachePrefix(reader.path) + key.hexdigest()[:16] + ".npz"
+
+def invalidateIndexCache(archivePath):
+    prefix = getIndexCachePrefix(archivePath)
+    directory = os.path.dirname(prefix)
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if path.startswith(prefix) and name.endswith(".npz"):
+            os.remove(path)
+
+#directory tables from the on disk index cache, reading and caching them if they're not in it yet
+def loadDirectory(reader, index, directoryIndex, useCache = True):
+    if not useCache:
+        return readDirectory(reader, index.directories[directoryIndex])
+    cachePath = getIndexCachePath(reader, index)
+    cached = dict()
+    if os.path.exists(cachePath):
+        try:
+            with np.load(cachePath, allow_pickle=False) as archive:
+                cached = {name: archive[name] for name in archive.files}
+        except Exception as e:
+            log.warning("discarding unreadable index cache: %s", e)
+    tableNames = {name: f'dir{directoryIndex}_{name}' for name in DIRECTORY_TABLES}
+    if all(key in cached for key in tableNames.values()):
+        return DirectoryTables({name: cached[key] for name, key in tableNames.items()})
+
+    tables = readDirectory(reader, index.directories[directoryIndex])
+    for name, key in tableNames.items():
+        cached[key] = getattr(tables, name)
+    try:
+        invalidateIndexCache(reader.path) #drops entries for older states of the archive
+        os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+        temporaryPath = cachePath + f".{os.getpid()}.tmp.npz" #several processes can be filling the cache at once
+        np.savez(temporaryPath, **cached)
+        os.replace(temporaryPath, cachePath)
+    except OSError as e:
+        log.warning("could not write index cache: %s", e)
+    return tables
+
+#### model files
+
+#function over items in a pool of workers threads, results in item order.
+#numpy releases the GIL in the bulk of texture and animation decoding
+def mapInPool(function, items, workers):
+    if workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, items))
+
+#0 workers means one per core
+def getWorkerCount(workers):
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def newReport():
+    report = dict()
+    report["timers"] = dict() #stage: seconds, in the order stages first ran
+    report["counters"] = dict() #name: count
+    report["skippedAnimations"] = dict() #reason: count
+    report["textureCacheHits"] = 0
+    report["textureCacheMisses"] = 0
+    report["animationCacheHits"] = 0
+    report["animationCacheMisses"] = 0
+    report["assetCacheHits"] = 0
+    report["assetCacheMisses"] = 0
+    return report
+
+#adds the time spent in the with block to a stage timer of the report
+@contextmanager
+def timed(report, stage):
+    then = time.perf_counter()
+    try:
+        yield
+    finally:
+        report["timers"][stage] = report["timers"].get(stage, 0.0) + time.perf_counter() - then
+
+def count(report, name, amount):
+    report["counters"][name] = report["counters"].get(name, 0) + amount
+
+#decodes a model file and what its models use, without blender
+#workers is how many threads decode animations. without decodeAnimations, only the animations that fit are listed
+def decodeModelFile(reader, chosenDirectory, chosenModel, report, useIndexCache = True, workers = 1, decodeAnimations = True):
+    with timed(report, "index"):
+        index = readIndex(reader)
+        log.debug("index read")
 
         ## directory should be chosen at this stage
 
 
-        dir = index["directories"][chosenDirectory]
-        file_object.seek(dir["startSector"] * SECTORSIZE)
-        #read files in the directory root
-        pointers = []
-        for i in range(0, dir["fileCount"]):
-            filePointer = dict()
-            filePointer["id"] = readUInt16(file_object)
-            filePointer["type"] = readUInt16(file_object)
-            filePointer["FirstSectorOfFile"] = readUInt32(file_object)
-            pointers.append(filePointer)
-
-        print("pointers read")
-        #then load the file headers or subdirectories
-        if dir["type"] == DIRTYPE_NORMAL: #only if type 2
-            dataBlocks = []
-            for pointer in pointers:
-                file_object.seek(pointer["FirstSectorOfFile"] * SECTORSIZE)
-                fileType = readUByte(file_object)
-                if fileType == DBCHUNK:
-                    #read db chunk header
-                    header = readDataBlockHeader(file_object)
-                    dataBlocks.append(header)
-                #else:
-                #    #other sort of file
-
-            modelfiles = []
-            collectFiles(dataBlocks, FILETYPE_MODEL, modelfiles)
-            print("model files count:", len(modelfiles))
-            if len(modelfiles) == 0:
-                raise Exception("No model files found")
-
-            ##model file index should be chosen at this stage at the latest
-            modelFile = modelfiles[chosenModel]
-
-            matFiles = []
-            if chosenDirectory == 3 or chosenDirectory == 4:
-                collectFiles([modelFile["parent"]], FILETYPE_CLUT_AND_TPAGES_FOR_MODEL, matFiles)
-            else:
-                collectFiles([modelFile["parent"]["parent"]], FILETYPE_CLUT_AND_TPAGES_FOR_MODEL, matFiles)
-            print("model material files count:",len(matFiles))
-            if len(matFiles) > 0:
-                matHeader = readFileHeader(matFiles[0], file_object)
-                matInfo = readMats(matHeader, file_object)
-                for mat in matInfo:
-                    print(mat)
-
-            textureFiles = []
-            collectFiles([modelFile["parent"]["parent"]], FILETYPE_TIM_IMAGE, textureFiles)
-            print("texture files count:",len(textureFiles))
-
-            if len(textureFiles) > 0:
-                textureHeader = readFileHeader(textureFiles[0], file_object)
-                if chosenDirectory == 3 or chosenDirectory == 4:
-                    allMaterials = readTexturesEx(textureHeader, matInfo[0], file_object) #this one will be a dict of list, because it has to handle several models
-                else:
-                    materials = readTextures(textureHeader, file_object)
-            else:
-                materials = None
-
-            fileHeader = readFileHeader(modelFile, file_object)
-
-            sceneAnimEnd = -1
-            for i, pointer in enumerate(fileHeader["objectPointers"]):
-                file_object.seek(pointer) #should become a foreach?
-                if chosenDirectory == 4 or chosenDirectory == 3:
-                    materials = allMaterials[fileHeader["objectIdentifiers"][i]]
-                armature = readModel(file_object, materials, chosenDirectory)
-
-                animationFiles =[]
-                collectFiles([modelFile["parent"]], FILETYPE_ANIM, animationFiles)
-                if len(animationFiles) > 0:
-                    print("animation file count:", len(animationFiles))
-                    animationHeader = readFileHeader(animationFiles[0], file_object)
-                    print(animationHeader)
-                    animEnd = readAnimations(animationHeader, armature, file_object)
-                    sceneAnimEnd = max(sceneAnimEnd, animEnd)
-            if sceneAnimEnd != -1:
-                bpy.context.scene.frame_end = sceneAnimEnd
-            #scene.frame_set(originalFrame)
-        else:
+        dir = index.directories[chosenDirectory]
+        if dir["type"] != DIRTYPE_NORMAL: #only if type 2
             raise Exception(f'Unsupported directory type: {dir["type"]}')
+        tables = loadDirectory(reader, index, chosenDirectory, useIndexCache)
+        log.debug("directory tables read")
+
+    modelfiles = collectFiles(tables, tables.rootBlocks(), FILETYPE_MODEL)
+    log.debug("model files count: %d", len(modelfiles))
+    if len(modelfiles) == 0:
+        raise Exception("No model files found")
 
-### import dialog
+    ##model file index should be chosen at this stage at the latest
+    modelFile = modelfiles[chosenModel]
+    modelBlock = modelFile.parent
 
-class MyDialog(bpy.types.Operator):
+    with timed(report, "texture read"):
+        if chosenDirectory == 3 or chosenDirectory == 4:
+            matFiles = collectFiles(tables, [modelBlock], FILETYPE_CLUT_AND_TPAGES_FOR_MODEL)
+        else:
+            matFiles = collectFiles(tables, [parentBlock(tables, modelBlock)], FILETYPE_CLUT_AND_TPAGES_FOR_MODEL)
+        log.debug("model material files count: %d", len(matFiles))
+        if len(matFiles) > 0:
+            matHeader = readFileHeader(matFiles[0], reader)
+            matInfo = readMats(matHeader, reader)
+            for mat in matInfo:
+                log.debug("%s", mat)
+
+        textureFiles = collectFiles(tables, [parentBlock(tables, modelBlock)], FILETYPE_TIM_IMAGE)
+        log.debug("texture files count: %d", len(textureFiles))
+
+        if len(textureFiles) > 0:
+            textureHeader = readFileHeader(textureFiles[0], reader)
+            if chosenDirectory == 3 or chosenDirectory == 4:
+                allTextures = readTexturesEx(textureHeader, matInfo[0], reader) #this one will be a dict of list, because it has to handle several models
+            else:
+                textures = readTextures(textureHeader, reader)
+        else:
+            textures = None
+
+    fileHeader = readFileHeader(modelFile, reader)
+
+    animationHeader = None
+    animationFiles = collectFiles(tables, [modelBlock], FILETYPE_ANIM)
+    log.debug("animation file count: %d", len(animationFiles))
+    if len(animationFiles) > 0:
+        animationHeader = readFileHeader(animationFiles[0], reader)
+        log.debug("%s", animationHeader)
+    animationCache = AnimationCache()
+
+    with timed(report, "mesh decode"):
+        models = [readModel(reader, pointer, identifier) for identifier, pointer in zip(fileHeader.objectIdentifiers, fileHeader.objectPointers)]
+    if animationHeader is not None and decodeAnimations:
+        with timed(report, "animation decode"):
+            animationCache.prefetch(reader, animationHeader, [model.boneCount for model in models], workers)
+
+    data = ModelFileData(reader.path, chosenDirectory, chosenModel)
+    for identifier, model in zip(fileHeader.objectIdentifiers, models):
+        if (chosenDirectory == 4 or chosenDirectory == 3) and len(textureFiles) > 0:
+            with timed(report, "texture crop"):
+                textures = cropTextures(model, allTextures[identifier], report)
+        for mesh in model.meshes:
+            count(report, "vertices", len(mesh.positions))
+            count(report, "polygons", len(mesh.loopTotals))
+
+        animations = None
+        animationIndex = None
+        if animationHeader is not None and decodeAnimations:
+            animations = readAnimations(animationHeader, model.boneCount, reader, report["skippedAnimations"], animationCache)
+        elif animationHeader is not None:
+            animationIndex = listAnimations(animationHeader, model.boneCount, reader, report["skippedAnimations"])
+        data.models.append(model)
+        data.textures.append(textures)
+        data.animations.append(animations)
+        data.animationIndex.append(animationIndex)
+    report["animationCacheHits"] += animationCache.hits
+    report["animationCacheMisses"] += animationCache.misses
+    return data
+
+#### decoded model cache
+
+ASSET_CACHE_VERSION = 1
+ASSET_CACHE_CAPACITY = 512 * 1024 * 1024 #bytes on disk
+ANIMATION_ARRAYS = ("positions", "rotations", "constantPositions", "constantRotations")
+
+#the arrays of a decoded model file, with a json description of the rest and of what decoding reported.
+#each mesh field and animation track is concatenated over the model, a few large arrays load much faster than many small ones.
+#textures are kept as the words they decode from, a fraction of the size of their pixels
+def packModelFile(data, decodeReport):
+    arrays = dict()
+    models = []
+    for m, (model, textures, animations, animationIndex) in enumerate(zip(data.models, data.textures, data.animations, data.animationIndex)):
+        prefix = f'model{m}_'
+        arrays[prefix + "boneLengths"] = model.boneLengths
+        arrays[prefix + "boneParents"] = model.boneParents
+        for name in MeshData.__slots__:
+            arrays[prefix + "mesh_" + name] = np.concatenate([getattr(mesh, name) for mesh in model.meshes]) if len(model.meshes) > 0 else np.zeros(0)
+        for t, texture in enumerate(textures or []):
+            arrays[f'{prefix}texture{t}_data'] = texture.data
+            if texture.palette is not None:
+                arrays[f'{prefix}texture{t}_palette'] = texture.palette
+        if animations:
+            for name in ANIMATION_ARRAYS:
+                arrays[prefix + "animation_" + name] = np.concatenate([getattr(animation, name)[None] if name.startswith("constant") else getattr(animation, name)
+                    for animation in animations])
+        models.append({
+            "identifier": None if model.identifier is None else int(model.identifier),
+            "meshLengths": [[len(getattr(mesh, name)) for name in MeshData.__slots__] for mesh in model.meshes],
+            "textures": None if textures is None else [(texture.name, texture.key, int(texture.colorFormat)) for texture in textures],
+            "animations": None if animations is None else [(int(animation.identifier), int(animation.frameCount)) for animation in animations],
+            "animationIndex": None if animationIndex is None else [(int(identifier), int(pointer)) for identifier, pointer in animationIndex],
+        })
+    description = {"directory": data.directory, "modelIndex": data.modelIndex, "models": models, "report": decodeReport}
+    arrays["description"] = np.array(json.dumps(description))
+    return arrays
+
+#splits a concatenated array back into parts of the given lengths, as views
+def splitArray(array, lengths):
+    return np.split(array, np.cumsum(lengths)[:-1]) if len(lengths) > 0 else []
+
+#the model file data and decode report packModelFile stored, from an opened .npz
+def unpackModelFile(archive, archivePath):
+    description = json.loads(str(archive["description"]))
+    data = ModelFileData(archivePath, description["directory"], description["modelIndex"])
+    for m, entry in enumerate(description["models"]):
+        prefix = f'model{m}_'
+        meshLengths = np.array(entry["meshLengths"], np.int64).reshape(-1, len(MeshData.__slots__))
+        fields = [splitArray(archive[prefix + "mesh_" + name], meshLengths[:, i]) for i, name in enumerate(MeshData.__slots__)]
+        meshes = [MeshData(*mesh) for mesh in zip(*fields)]
+        data.models.append(ModelData(entry["identifier"], archive[prefix + "boneLengths"], archive[prefix + "boneParents"], meshes))
+        textures = None
+        if entry["textures"] is not None:
+            textures = []
+            for t, (name, key, colorFormat) in enumerate(entry["textures"]):
+                palette = f'{prefix}texture{t}_palette'
+                textures.append(TextureSource(name, key, colorFormat, archive[f'{prefix}texture{t}_data'],
+                    archive[palette] if palette in archive.files else None))
+        animations = None
+        if entry["animations"] is not None:
+            frameCounts = [frameCount for identifier, frameCount in entry["animations"]]
+            animations = []
+            if len(frameCounts) > 0:
+                positions = splitArray(archive[prefix + "animation_positions"], frameCounts)
+                rotations = splitArray(archive[prefix + "animation_rotations"], frameCounts)
+                constantPositions = archive[prefix + "animation_constantPositions"]
+                constantRotations = archive[prefix + "animation_constantRotations"]
+                for a, (identifier, frameCount) in enumerate(entry["animations"]):
+                    animations.append(AnimationData(identifier, frameCount, positions[a], rotations[a], constantPositions[a], constantRotations[a]))
+        animationIndex = None
+        if entry["animationIndex"] is not None:
+            animationIndex = [tuple(item) for item in entry["animationIndex"]]
+        data.textures.append(textures)
+        data.animations.append(animations)
+        data.animationIndex.append(animationIndex)
+    return data, description["report"]
+
+class AssetCache:
+    """Decoded model files on disk, one .npz per archive state, directory and model index.
+
+    manifest.json records the size and last use of each entry. Past capacity bytes the least
+    recently used entries are deleted. Entries a missing or stale manifest doesn't know about are
+    picked up from the directory, so several processes can share the cache. Without a directory it's
+    models/ in the user cache directory, looked up on every use like the index cache's.
+    """
+
+    def __init__(self, directory = None, capacity = ASSET_CACHE_CAPACITY):
+        self.chosenDirectory = directory
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def directory(self):
+        if self.chosenDirectory is not None:
+            return self.chosenDirectory
+        return os.path.join(getCacheDirectory(), "models")
+
+    #entry names start like the archive's index cache files, so an archive's entries can be told apart
+    def getPrefix(self, archivePath):
+        return os.path.basename(getIndexCachePrefix(archivePath))
+
+    #the name changes whenever the archive does. listed is for model files decoded without their animations
+    def getName(self, reader, index, directory, modelIndex, listed = False):
+        key = hashArchiveState(hashlib.sha1(f'{ASSET_CACHE_VERSION} '.encode("utf-8")), reader, index)
+        return f'{self.getPrefix(reader.path)}{key.hexdigest()[:16]}-dir{directory}-model{modelIndex}{"-listed" if listed else ""}.npz'
+
+    #(model file data, decode report) of an entry, None if it's not cached
+    def load(self, name, archivePath):
+        path = os.path.join(self.directory, name)
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                result = unpackModelFile(archive, archivePath)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            log.warning("discarding unreadable cached model file %s: %s", name, e)
+            self.remove(name)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touch(name)
+        return result
+
+    def store(self, name, arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        temporaryPath = path + f".{os.getpid()}.tmp.npz"
+        np.savez(temporaryPath, **arrays)
+        os.replace(temporaryPath, path)
+        self.touch(name)
+
+    #marks an entry as just used, then evicts past capacity
+    def touch(self, name):
+        entries = self.readManifest()
+        entries[name] = {"bytes": os.path.getsize(os.path.join(self.directory, name)), "used": time.time()}
+        total = sum(entry["bytes"] for entry in entries.values())
+        for oldest in sorted(entries, key=lambda entryName: entries[entryName]["used"]):
+            if total <= self.capacity:
+                break
+            total -= entries.pop(oldest)["bytes"]
+            self.deleteFile(oldest)
+        self.writeManifest(entries)
+
+    def remove(self, name):
+        entries = self.readManifest()
+        entries.pop(name, None)
+        self.deleteFile(name)
+        self.writeManifest(entries)
+
+    #drops every entry of an archive, whatever its state
+    def invalidate(self, archivePath):
+        prefix = self.getPrefix(archivePath)
+        entries = self.readManifest()
+        for name in [name for name in entries if name.startswith(prefix)]:
+            del entries[name]
+            self.deleteFile(name)
+        self.writeManifest(entries)
+
+    def getManifestPath(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    #name: {"bytes", "used"} of every entry on disk
+    def readManifest(self):
+        try:
+            with open(self.getManifestPath()) as file:
+                entries = json.load(file)["entries"]
+        except (OSError, ValueError, KeyError):
+            entries = dict()
+        names = set()
+        if os.path.isdir(self.directory):
+            names = {name for name in os.listdir(self.directory) if name.endswith(".npz") and ".tmp." not in name}
+        for name in names - entries.keys():
+            stat = os.stat(os.path.join(self.directory, name))
+            entries[name] = {"bytes": stat.st_size, "used": stat.st_mtime}
+        return {name: entry for name, entry in entries.items() if name in names}
+
+    def writeManifest(self, entries):
+        if not os.path.isdir(self.directory):
+            return
+        temporaryPath = self.getManifestPath() + f".{os.getpid()}.tmp"
+        with open(temporaryPath, "w") as file:
+            json.dump({"version": ASSET_CACHE_VERSION, "entries": entries}, file)
+        os.replace(temporaryPath, self.getManifestPath())
+
+    def deleteFile(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+ASSET_CACHE = AssetCache()
+
+#decodeModelFile through a decoded model cache: a hit skips reading and decoding, and reports what decoding did
+def loadModelFile(reader, chosenDirectory, chosenModel, report, assetCache = None, workers = 1, decodeAnimations = True):
+    if assetCache is None:
+        return decodeModelFile(reader, chosenDirectory, chosenModel, report, workers=workers, decodeAnimations=decodeAnimations)
+    with timed(report, "asset cache"):
+        name = assetCache.getName(reader, readIndex(reader), chosenDirectory, chosenModel, not decodeAnimations)
+        cached = assetCache.load(name, reader.path)
+    if cached is not None:
+        data, decodeReport = cached
+        report["assetCacheHits"] += 1
+        for key in ("counters", "skippedAnimations"):
+            for itemName, amount in decodeReport[key].items():
+                report[key][itemName] = report[key].get(itemName, 0) + amount
+        return data
+
+    report["assetCacheMisses"] += 1
+    before = {key: dict(report[key]) for key in ("counters", "skippedAnimations")}
+    data = decodeModelFile(reader, chosenDirectory, chosenModel, report, workers=workers, decodeAnimations=decodeAnimations)
+    decodeReport = {key: {itemName: amount - before[key].get(itemName, 0) for itemName, amount in report[key].items()} for key in before}
+    with timed(report, "asset cache"):
+        try:
+            assetCache.store(name, packModelFile(data, decodeReport))
+        except OSError as e:
+            log.warning("could not write decoded model cache: %s", e)
+    return data
+
+#### model catalogue
+
+class CatalogueEntry:
+    """What a model file holds, read from headers only. Per model: identifier, bone and group count,
+    and the face count of each group. animationCount is the number of candidate animations."""
+    __slots__ = ("modelIndex", "identifiers", "boneCounts", "groupCounts", "faceCounts", "animationCount", "textureFileCount")
+
+    def __repr__(self):
+        return f'CatalogueEntry(modelIndex={self.modelIndex}, identifiers={self.identifiers}, boneCounts={self.boneCounts})'
+
+#bone count, group count and per group face counts, without reading any vertex or polygon
+def readModelSummary(reader, startAddress):
+    (zeroes, boneCount, groupCount, dataSize, xOffset, yOffset, zOffset,
+        bonesPointer, groupsPointer) = reader.unpack(MODEL_HEADER, startAddress)
+    faceCounts = []
+    for i in range(0, groupCount):
+        group = reader.unpack(GROUP_RECORD, startAddress + groupsPointer + i * GROUP_RECORD.size)
+        faceCounts.append(sum(group[countField] for countField, dtype, winding in POLYGON_BLOCKS))
+    return boneCount, groupCount, faceCounts
+
+#every model file of a directory, in the order decodeModelFile numbers them
+def readCatalogue(reader, directoryIndex, useIndexCache = True):
+    index = readIndex(reader)
+    dir = index.directories[directoryIndex]
+    if dir["type"] != DIRTYPE_NORMAL:
+        raise Exception(f'Unsupported directory type: {dir["type"]}')
+    tables = loadDirectory(reader, index, directoryIndex, useIndexCache)
+    catalogue = []
+    for modelIndex, modelFile in enumerate(collectFiles(tables, tables.rootBlocks(), FILETYPE_MODEL)):
+        entry = CatalogueEntry()
+        entry.modelIndex = modelIndex
+        fileHeader = readFileHeader(modelFile, reader)
+        entry.identifiers = fileHeader.objectIdentifiers
+        entry.boneCounts = []
+        entry.groupCounts = []
+        entry.faceCounts = []
+        for pointer in fileHeader.objectPointers:
+            boneCount, groupCount, faceCounts = readModelSummary(reader, pointer)
+            entry.boneCounts.append(boneCount)
+            entry.groupCounts.append(groupCount)
+            entry.faceCounts.append(faceCounts)
+        #only the first animation file of the block is matched against the models
+        animationFiles = collectFiles(tables, [modelFile.parent], FILETYPE_ANIM)
+        entry.animationCount = readFileHeader(animationFiles[0], reader).objectCount if len(animationFiles) > 0 else 0
+        entry.textureFileCount = len(collectFiles(tables, [parentBlock(tables, modelFile.parent)], FILETYPE_TIM_IMAGE))
+        catalogue.append(entry)
+    return catalogue
+
+CATALOGUE_CACHE = dict() #(path, size, modification time, directory): catalogue
+
+#catalogue of a directory, read once per state of the archive
+def getCatalogue(archivePath, directoryIndex, blockCache = 0):
+    stat = os.stat(archivePath)
+    key = (os.path.abspath(archivePath), stat.st_size, stat.st_mtime_ns, directoryIndex)
+    if key not in CATALOGUE_CACHE:
+        with openArchive(archivePath, blockCache) as reader:
+            CATALOGUE_CACHE[key] = readCatalogue(reader, directoryIndex)
+    return CATALOGUE_CACHE[key]
+
+def clearCatalogue(archivePath):
+    archivePath = os.path.abspath(archivePath)
+    for key in [key for key in CATALOGUE_CACHE if key[0] == archivePath]:
+        del CATALOGUE_CACHE[key]
+
+#### blender scene building
+
+class TextureCache:
+    """Images and their materials created by the importer this session, keyed by textureKey.
+
+    Entries only hold material names: a material whose "ff9TextureKey" property no longer
+    matches (deleted, renamed, another file loaded) is a miss. Past capacity the least
+    recently used entries are forgotten, and purge removes cached materials and images
+    nothing uses anymore.
+    """
+
+    def __init__(self, capacity = 1024):
+        self.capacity = capacity
+        self.entries = OrderedDict() #key: material name
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        name = self.entries.get(key)
+        material = bpy.data.materials.get(name) if name is not None else None
+        if material is None or material.get("ff9TextureKey") != key:
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return material
+
+    #like get, without counting or reordering
+    def contains(self, key):
+        name = self.entries.get(key)
+        material = bpy.data.materials.get(name) if name is not None else None
+        return material is not None and material.get("ff9TextureKey") == key
+
+    def add(self, key, material):
+        material["ff9TextureKey"] = key
+        getMaterialImage(material)["ff9TextureKey"] = key
+        self.entries[key] = material.name
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return material
+
+    #deletes cached materials without users and their images, returns how many materials went
+    def purge(self):
+        removed = 0
+        for key, name in list(self.entries.items()):
+            material = bpy.data.materials.get(name)
+            if material is None or material.get("ff9TextureKey") != key:
+                del self.entries[key]
+            elif material.users == 0:
+                image = getMaterialImage(material)
+                bpy.data.materials.remove(material)
+                if image is not None and image.users == 0:
+                    bpy.data.images.remove(image)
+                del self.entries[key]
+                removed += 1
+        return removed
+
+    #takes in materials an earlier session imported, found by their "ff9TextureKey" property
+    def adopt(self):
+        for material in bpy.data.materials:
+            key = material.get("ff9TextureKey")
+            if key is not None and key not in self.entries and getMaterialImage(material) is not None:
+                self.entries[key] = material.name
+                self.entries.move_to_end(key, last=False) #least recently used until asked for
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+TEXTURE_CACHE = TextureCache()
+
+#a material for each texture source, reusing cached ones. images is textureKey: decoded pixels, what's missing is decoded here
+def buildMaterials(textures, images = None):
+    materials = []
+    for texture in textures:
+        material = TEXTURE_CACHE.get(texture.key)
+        if material is None:
+            imageData = images[texture.key] if images is not None and texture.key in images else texture.decode()
+            material = TEXTURE_CACHE.add(texture.key, makeMaterial(makeImage(imageData, texture.name)))
+        materials.append(material)
+    return materials
 
-    bl_idname = "tools.mydialog"
-    bl_label = "Import FF9 Model"
+#pixels of the textures that have no cached material yet, decoded workers threads at a time, as textureKey: pixels
+def decodeTextures(textures, workers = 1):
+    missing = dict()
+    for texture in textures:
+        if texture.key not in missing and not TEXTURE_CACHE.contains(texture.key):
+            missing[texture.key] = texture
+    return dict(zip(missing, mapInPool(TextureSource.decode, list(missing.values()), workers)))
+
+#imageData is a (height, width, 4) float array
+def makeImage(imageData, textureName):
+    image = bpy.data.images.new(textureName, imageData.shape[1], imageData.shape[0], alpha = True)
+    image.pixels.foreach_set(imageData.ravel())
+    image.file_format = 'PNG'
+    image.pack()
+    return image
 
-    archiveFilePath: bpy.props.StringProperty(name="archiveFilePath", options={'HIDDEN'})
+def getMaterialImage(material):
+    return material.node_tree.nodes["Image Texture"].image
 
-    directory: bpy.props.IntProperty(name="Directory index", max=13, min=0)
-    modelIndex: bpy.props.IntProperty(name="Model file index", min=0)
+def makeMaterial(texture):
+    #simple texture with transparency and nearest neighbor filtering
+    mat = bpy.data.materials.new(texture.name)
+    mat.use_nodes = True
+    mat.use_backface_culling = True
+    nodes = mat.node_tree.nodes
+    nodes.remove(nodes["Principled BSDF"])
+    textureNode=nodes.new("ShaderNodeTexImage")
+    textureNode.image = texture
+    textureNode.interpolation = 'Closest'
+    transparentNode =nodes.new("ShaderNodeBsdfTransparent")
+    mixNode =nodes.new("ShaderNodeMixShader")
+    mat.node_tree.links.new(mixNode.inputs[0], textureNode.outputs[1]) #texture alpha as factor
+    mat.node_tree.links.new(mixNode.inputs[1], transparentNode.outputs[0])
+    mat.node_tree.links.new(mixNode.inputs[2], textureNode.outputs[0])
+    mat.node_tree.links.new(nodes['Material Output'].inputs[0], mixNode.outputs[0])
+    mat.blend_method = 'CLIP'
+    mat.alpha_threshold = 0.999
+    mat.shadow_method = 'CLIP'
+    return mat
 
-    def invoke(self, context, event):
-        context.window_manager.invoke_props_dialog(self)
-        return {'RUNNING_MODAL'}
+#build armature and a mesh for each group. on an armature of an earlier import, meshes whose content key
+#still matches are kept, the others get new mesh data, and groups the model no longer has are removed
+def buildModel(model, armature, materials, chosenDirectory, report): #uvOffsets):
+    with timed(report, "meshes"):
+        meshObjects = getMeshObjects(armature)
+        for i, mesh in enumerate(model.meshes):
+            key = getMeshKey(mesh, materials, chosenDirectory)
+            meshObject = meshObjects.pop(i, None)
+            if meshObject is None:
+                meshObject = buildMesh(mesh, armature, f'mesh {i}', materials, chosenDirectory)#uvOffsets)
+            elif meshObject.data.get("ff9MeshKey") == key:
+                count(report, "reusedMeshes", 1)
+                continue
+            else:
+                replaceMeshData(meshObject, makeMesh(mesh, f'mesh {i}', materials, chosenDirectory), mesh)
+                count(report, "rebuiltMeshes", 1)
+            meshObject["ff9Group"] = i
+            meshObject.data["ff9MeshKey"] = key
+        for meshObject in meshObjects.values():
+            removeObject(meshObject)
+            count(report, "removedObjects", 1)
+    with timed(report, "armature"):
+        poseArmature(armature, model)
+
+#adds the skeletons of several models, all in a single edit mode session
+def buildArmatures(models, name):
+    armatureObjects = []
+    for model in models:
+        armature = bpy.data.armatures.new(name)
+        armatureObject = bpy.data.objects.new(name, armature)
+        bpy.context.scene.collection.objects.link(armatureObject)
+        armatureObject.show_in_front = True
+        armatureObject.display_type ='WIRE'
+        armatureObjects.append(armatureObject)
+    if len(armatureObjects) == 0:
+        return armatureObjects
+
+    #every selected armature enters edit mode along with the active one
+    viewLayer = bpy.context.view_layer
+    for sceneObject in viewLayer.objects:
+        sceneObject.select_set(False)
+    for armatureObject in armatureObjects:
+        armatureObject.select_set(True)
+    viewLayer.objects.active = armatureObjects[0]
+    bpy.ops.object.mode_set(mode='EDIT', toggle=False)
+    for model, armatureObject in zip(models, armatureObjects):
+        buildBones(armatureObject.data.edit_bones, model)
+    bpy.ops.object.mode_set(mode = 'OBJECT')
+    return armatureObjects
 
-    def execute(self, context):
-        ImportModel(self.archiveFilePath, self.directory, self.modelIndex)
-        return {'FINISHED'}
+def buildBones(edit_bones, model):
+    #for each object, create a bone, all at the origin pointing up
+    #bone length is z position relative to parent)
+    bones = [edit_bones.new(f'bone {i}') for i in range(model.boneCount)]
+    for bone, parentBoneIndex in zip(bones[1:], model.boneParents[1:].tolist()):
+        bone.parent = bones[parentBoneIndex]
+    #edit bones are still in creation order here
+    tails = np.zeros((model.boneCount, 3), np.float32)
+    tails[:, 2] = getRestTails(model)
+    edit_bones.foreach_set("tail", tails.ravel())
+
+#rest pose through the data API, no pose mode needed. only the root location is animated, the others keep these
+def poseArmature(armatureObject, model):
+    locations = np.zeros((model.boneCount, 3), np.float32)
+    locations[:, 1] = model.boneLengths * SCALE_FACTOR
+    poseBones = armatureObject.pose.bones
+    order = [int(bone.name[len("bone "):]) for bone in poseBones]
+    poseBones.foreach_set("location", locations[order].ravel())
+
+#a mesh object for a group, skinned to the armature
+def buildMesh(meshData, armature, objectName, materials, chosenDirectory): #:uvOffsets):
+    mesh = makeMesh(meshData, objectName, materials, chosenDirectory)
 
-### file picker
+    #add to scene
+    object = bpy.data.objects.new(objectName, mesh)
+    scene = bpy.context.scene
+    scene.collection.objects.link(object)
+    object.scale = (SCALE_FACTOR, SCALE_FACTOR, SCALE_FACTOR)
+    assignVertexGroups(object, meshData)
 
-class ImportFF9Model(bpy.types.Operator, ImportHelper): 
-    bl_idname       = "import_ff9_model.chev";
-    bl_label        = "import model";
-    bl_options      = {'PRESET'};
-    
-    filename_ext    = ".img";
+    #parent mesh to armature
+    object.parent = armature
+    modifier = object.modifiers.new("Armature", 'ARMATURE')
+    modifier.object = armature
+    return object
 
-    filter_glob: StringProperty(
-        default="*",
-        options={'HIDDEN'},
-        maxlen=255,
-    )
-    
-    def execute(self, context):
-        print("importer start")
-        then = time.time()
+def makeMesh(meshData, objectName, materials, chosenDirectory):
+    offset = getUVOffset(chosenDirectory)
+    loopTotals = meshData.loopTotals
+    loopStarts = np.zeros(len(loopTotals), np.int32)
+    np.cumsum(loopTotals[:-1], out=loopStarts[1:])
 
-        archiveFilePath = self.filepath
-        
-        print("importing {0}".format(archiveFilePath))
-        
-        #ImportModel(archiveFilePath, 10, 4)
-        #3,4,7,8, 10
-        #overworld, rooms, monsters, weapons, party
+    #(x y z) vertices, then loops and faces. face sizes follow from the loop starts
+    mesh = bpy.data.meshes.new(objectName)
+    mesh.vertices.add(len(meshData.positions))
+    mesh.vertices.foreach_set("co", meshData.positions.astype(np.float32).ravel())
+    mesh.loops.add(len(meshData.loopVertices))
+    mesh.loops.foreach_set("vertex_index", meshData.loopVertices.astype(np.int32))
+    mesh.polygons.add(len(loopTotals))
+    mesh.polygons.foreach_set("loop_start", loopStarts)
+    mesh.update(calc_edges=True)
 
-        bpy.ops.tools.mydialog('INVOKE_DEFAULT', archiveFilePath = archiveFilePath)
+    if materials is not None:
 
-        now = time.time()
-        print("It took: {0} seconds".format(now-then))
-        return {'FINISHED'}
+        #then resize UVs
+        textureDimensions =[]
+        for material in materials:
+            image = getMaterialImage(material)
+            textureDimensions.append((image.size[0], image.size[1]))
+            mesh.materials.append(material)
+        textureDimensions = np.array(textureDimensions, np.float32)
+        #offset = uvOffsets[polygon["material"]]
+        loopDimensions = np.repeat(textureDimensions[meshData.materials], loopTotals, axis=0)
+        scaledUVs = (meshData.UVs[meshData.loopUVs] - np.array((0, offset), np.float32)) / loopDimensions
+        #build UVs from polygons
+        #build material IDs
+        new_uv = mesh.uv_layers.new(name = 'DefaultUV')
+        new_uv.uv.foreach_set("vector", scaledUVs.astype(np.float32).ravel())
+        mesh.polygons.foreach_set("material_index", meshData.materials.astype(np.int32))
+    return mesh
+
+#one vertex group per bone, in order of first use, filled in a single call
+def assignVertexGroups(object, meshData):
+    object.vertex_groups.clear()
+    boneIndices = meshData.boneIndices
+    order = np.argsort(boneIndices, kind="stable")
+    bones, starts = np.unique(boneIndices[order], return_index=True)
+    groups = np.split(order, starts[1:])
+    for i in np.argsort([group[0] for group in groups]).tolist():
+        vertexGroup = object.vertex_groups.new(name=f'bone {bones[i]}')
+        vertexGroup.add(groups[i].tolist(), 1.0, 'REPLACE')
+
+#re-imports: imported objects are tagged with where they come from and content keys of what they were built from,
+#so importing the same model file again updates them in place
+
+#identifies decoded arrays and settings by content
+def contentKey(*parts):
+    key = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            key.update(repr((part.dtype.str, part.shape)).encode("utf-8"))
+            key.update(np.ascontiguousarray(part).tobytes())
+        else:
+            key.update(repr(part).encode("utf-8"))
+    return key.hexdigest()
+
+def getSkeletonKey(model):
+    return contentKey(model.boneLengths, model.boneParents)
+
+#mesh arrays, the textures of its materials, which also set the UV scale, and the UV offset
+def getMeshKey(meshData, materials, chosenDirectory):
+    textureKeys = None if materials is None else [material.get("ff9TextureKey", material.name) for material in materials]
+    return contentKey(*(getattr(meshData, name) for name in MeshData.__slots__), textureKeys, getUVOffset(chosenDirectory))
+
+def getAnimationKey(animation, tolerance):
+    return contentKey(animation.identifier, animation.positions, animation.rotations, animation.constantPositions, animation.constantRotations, tolerance)
+
+#(archive, directory, model file index, model identifier) of an imported model
+def getModelSource(archivePath, directory, modelIndex, modelIdentifier):
+    return (os.path.abspath(archivePath), directory, modelIndex, modelIdentifier)
+
+def tagArmature(armature, source, model):
+    armature["ff9Archive"], armature["ff9Directory"], armature["ff9ModelFile"], armature["ff9ModelIdentifier"] = source
+    armature["ff9SkeletonKey"] = getSkeletonKey(model)
+
+#the model source tagArmature stored
+def getArmatureSource(armature):
+    return (armature["ff9Archive"], armature["ff9Directory"], armature["ff9ModelFile"], armature["ff9ModelIdentifier"])
+
+#armature objects of earlier imports in the scene, by model source
+def findImportedArmatures():
+    armatures = dict()
+    for sceneObject in bpy.context.scene.objects:
+        if sceneObject.type == 'ARMATURE' and "ff9ModelFile" in sceneObject:
+            armatures.setdefault(getArmatureSource(sceneObject), sceneObject)
+    return armatures
+
+#the mesh objects of an armature by group index
+def getMeshObjects(armature):
+    return {child["ff9Group"]: child for child in armature.children if child.type == 'MESH' and "ff9Group" in child}
+
+def replaceMeshData(meshObject, mesh, meshData):
+    oldMesh = meshObject.data
+    meshObject.data = mesh
+    assignVertexGroups(meshObject, meshData)
+    if oldMesh.users == 0:
+        bpy.data.meshes.remove(oldMesh)
+
+def removeObject(sceneObject):
+    data = sceneObject.data
+    bpy.data.objects.remove(sceneObject)
+    if data is not None and data.users == 0:
+        if isinstance(data, bpy.types.Mesh):
+            bpy.data.meshes.remove(data)
+        elif isinstance(data, bpy.types.Armature):
+            bpy.data.armatures.remove(data)
+
+#an armature and its meshes
+def removeModel(armature):
+    for child in list(armature.children):
+        removeObject(child)
+    removeObject(armature)
+
+#actions of earlier imports by model source, then content key.
+#models with the same bone count can share animations, so actions are only reused by the model they were built for
+def findImportedActions():
+    actions = dict()
+    for action in bpy.data.actions:
+        if "ff9AnimationKey" in action and "ff9Model" in action:
+            actions.setdefault(action["ff9Model"], dict())[action["ff9AnimationKey"]] = action
+    return actions
+
+#drops a model's actions from earlier imports that this one didn't reuse, returns how many
+def removeStaleActions(source, actions):
+    kept = {action.name for action in actions}
+    removed = 0
+    for action in list(bpy.data.actions):
+        if action.get("ff9Model") == repr(source) and action.name not in kept:
+            bpy.data.actions.remove(action)
+            removed += 1
+    return removed
+
+#the FF9 NLA track, active action and registered animations of a reused armature, before importing its animations again
+def clearAnimations(armature):
+    for name in REGISTERED_ANIMATION_PROPERTIES:
+        if name in armature:
+            del armature[name]
+    if armature.animation_data is None:
+        return
+    armature.animation_data.action = None
+    for track in list(armature.animation_data.nla_tracks):
+        if track.name in (NLA_TRACK_NAME, REST_TRACK_NAME):
+            armature.animation_data.nla_tracks.remove(track)
+
+ANIMATIONS_NLA = 'NLA' #every animation decoded to its own action, laid out one after the other as NLA strips
+ANIMATIONS_ACTIONS = 'ACTIONS' #every animation decoded to its own action, the first one active
+ANIMATIONS_LAZY = 'LAZY' #only the list of animations kept on the armature, each decoded when first picked
+NLA_TRACK_NAME = "FF9 animations"
+REST_TRACK_NAME = "FF9 rest pose"
+REST_FRAMES = (-1, 0) #the rest pose strip ends on frame 0, so frame 1 is the first animation's
+REGISTERED_ANIMATION_PROPERTIES = ("ff9KeyTolerance", "ff9AnimationIdentifiers", "ff9AnimationPointers") #set by registerAnimations
+
+#one action per animation, named after the model and animation identifiers.
+#actions from earlier imports of the model keyed from the same content are reused, reusable maps their content keys to them.
+#returns the actions, how many keys were inserted and which actions were reused
+def buildActions(armature, modelIdentifier, animations, tolerance = None, reusable = None, source = None):
+    boneCount = len(armature.pose.bones)
+    actions = []
+    keyCount = 0
+    reused = []
+    for animation in animations:
+        key = getAnimationKey(animation, tolerance)
+        action = reusable.get(key) if reusable is not None else None
+        reused.append(action is not None)
+        if action is None:
+            action = bpy.data.actions.new(getActionName(modelIdentifier, animation.identifier))
+            action.use_fake_user = True #unassigned actions would be lost on save
+            keyCount += keyAnimation(action, animation, boneCount, tolerance)
+            action["ff9AnimationKey"] = key
+            action["ff9Model"] = repr(source)
+        actions.append(action)
+    return actions, keyCount, reused
+
+def getActionName(modelIdentifier, animationIdentifier):
+    return f'model {modelIdentifier} animation {animationIdentifier}'
+
+#keys an animation into an action from frame 1, returns how many keys were inserted.
+#constant channels get a single held key, reduced ones are linear. tolerance is as in findKeys
+def keyAnimation(action, animation, boneCount, tolerance = None):
+    frames = np.arange(1, 1 + animation.frameCount, dtype=np.float32)
+    positionKeys, rotationKeys = getAnimationKeys(animation, tolerance)
+    constantPositions = np.broadcast_to(animation.constantPositions, positionKeys.shape)
+    constantRotations = np.broadcast_to(animation.constantRotations[:, None], rotationKeys.shape)
+    insertKeyframes(action, 'pose.bones["bone 0"].location', 'bone 0', frames, animation.positions, positionKeys, constantPositions)
+    for boneIndex in range(0, boneCount):
+        insertKeyframes(action, f'pose.bones["bone {boneIndex}"].rotation_quaternion', f'bone {boneIndex}', frames, animation.rotations[:, boneIndex],
+            rotationKeys[:, boneIndex], constantRotations[:, boneIndex])
+    return int(positionKeys.sum() + rotationKeys.sum())
+
+#lays actions out one after the other on a new NLA track from frame 1, returns the last frame.
+#restAction goes on a track of its own above, only over frame 0
+def layOutActions(armature, actions, frameCounts, restAction = None):
+    if armature.animation_data is None:
+        armature.animation_data_create()
+    track = armature.animation_data.nla_tracks.new()
+    track.name = NLA_TRACK_NAME
+    start = 1
+    for action, frameCount in zip(actions, frameCounts):
+        strip = track.strips.new(action.name, start, action)
+        strip.extrapolation = 'HOLD' if start == 1 else 'HOLD_FORWARD'
+        start += frameCount
+    if restAction is not None:
+        restTrack = armature.animation_data.nla_tracks.new()
+        restTrack.name = REST_TRACK_NAME
+        strip = restTrack.strips.new(restAction.name, REST_FRAMES[0], restAction)
+        strip.extrapolation = 'NOTHING'
+    return start - 1
+
+#the root at its rest location over frame 0, like before the animations start.
+#the other channels still hold the first animation's first frame
+def buildRestAction(model, reusable = None, source = None):
+    key = contentKey("rest pose", model.boneLengths[0])
+    action = reusable.get(key) if reusable is not None else None
+    if action is None:
+        action = bpy.data.actions.new(f'model {model.identifier} rest pose')
+        action.use_fake_user = True
+        locations = np.zeros((len(REST_FRAMES), 3), np.float32)
+        locations[:, 1] = model.boneLengths[0] * SCALE_FACTOR
+        insertKeyframes(action, 'pose.bones["bone 0"].location', 'bone 0', np.array(REST_FRAMES, np.float32), locations)
+        action["ff9AnimationKey"] = key
+        action["ff9Model"] = repr(source)
+    return action
+
+def setAction(armature, action):
+    if armature.animation_data is None:
+        armature.animation_data_create()
+    armature.animation_data.action = action
+
+#what loading an animation later needs, kept as custom properties of the armature
+def registerAnimations(armature, archivePath, modelIdentifier, animationIndex, tolerance = None):
+    armature["ff9Archive"] = os.path.abspath(archivePath)
+    armature["ff9KeyTolerance"] = -1.0 if tolerance is None else tolerance
+    armature["ff9ModelIdentifier"] = modelIdentifier
+    armature["ff9AnimationIdentifiers"] = [identifier for identifier, pointer in animationIndex]
+    armature["ff9AnimationPointers"] = [pointer for identifier, pointer in animationIndex]
+
+#the action of a registered animation, decoded and keyed the first time it's asked for.
+#it's only reused by the same model, with the same key tolerance, while the archive stays the same.
+#like the actions of a full import, it's tagged with its model so the next import of that model drops it
+def getRegisteredAction(armature, animationIndex):
+    identifier = armature["ff9AnimationIdentifiers"][animationIndex]
+    pointer = armature["ff9AnimationPointers"][animationIndex]
+    boneCount = len(armature.pose.bones)
+    tolerance = armature.get("ff9KeyTolerance", -1.0)
+    key = contentKey(getArchiveState(armature["ff9Archive"]), pointer, boneCount, tolerance, getArmatureSource(armature))
+    for action in bpy.data.actions:
+        if action.get("ff9Animation") == key:
+            return action
+    animation = loadAnimation(armature["ff9Archive"], pointer, boneCount, identifier)
+    action = bpy.data.actions.new(getActionName(armature["ff9ModelIdentifier"], identifier))
+    action.use_fake_user = True
+    action["ff9Animation"] = key
+    action["ff9Model"] = repr(getArmatureSource(armature))
+    keyAnimation(action, animation, boneCount, tolerance if tolerance >= 0 else None)
+    return action
+
+INTERPOLATION_CONSTANT = 0 #Keyframe.interpolation enum values, for foreach_set
+INTERPOLATION_LINEAR = 1
+
+#appends keys to the fcurves of a (possibly multi component) property in one go
+#values is (keys, components), or (keys,) for a single component.
+#keep, shaped like values, picks the keys to insert. in channels where it drops any, keys are made linear and constant ones are held
+def insertKeyframes(action, dataPath, groupName, frames, values, keep = None, constant = None):
+    values = values.reshape(len(frames), -1)
+    if keep is not None:
+        keep = keep.reshape(values.shape)
+        constant = constant.reshape(values.shape)
+    for index in range(values.shape[1]):
+        fcurve = action.fcurves.find(dataPath, index=index)
+        if fcurve is None:
+            fcurve = action.fcurves.new(dataPath, index=index, action_group=groupName)
+        points = fcurve.keyframe_points
+        existing = len(points)
+        reduced = keep is not None and not keep[:, index].all()
+        picked = keep[:, index] if reduced else slice(None)
+        keyFrames = frames[picked]
+        co = np.empty((existing + len(keyFrames), 2), np.float32)
+        points.foreach_get("co", co[:existing].ravel())
+        co[existing:, 0] = keyFrames
+        co[existing:, 1] = values[picked, index]
+        points.add(len(keyFrames))
+        points.foreach_set("co", co.ravel())
+        if reduced: #untouched channels keep blender's default interpolation
+            interpolation = np.empty(len(points), np.int32)
+            if existing > 0:
+                points.foreach_get("interpolation", interpolation)
+            interpolation[existing:] = np.where(constant[picked, index], INTERPOLATION_CONSTANT, INTERPOLATION_LINEAR)
+            points.foreach_set("interpolation", interpolation)
+        fcurve.update()
+
+#stage timers and counters go to report if given, workers is how many threads decode textures.
+#keyTolerance drops animation keys linear interpolation gets within that distance of, None keeps them all.
+#animationMode is one of the ANIMATIONS_ values, for the lazy one data should hold the animation index
+#with updateExisting, models imported before from the same archive, directory and model file are updated in place
+def buildModelFile(data, report = None, workers = 1, keyTolerance = None, animationMode = ANIMATIONS_NLA, updateExisting = False):
+    if report is None:
+        report = newReport()
+    sources = [getModelSource(data.archivePath, data.directory, data.modelIndex, model.identifier) for model in data.models]
+    existing = findImportedArmatures() if updateExisting else dict()
+    importedActions = findImportedActions() if updateExisting else None
+    if updateExisting:
+        TEXTURE_CACHE.adopt()
+    with timed(report, "texture decode"):
+        images = decodeTextures([texture for textures in data.textures if textures is not None for texture in textures], workers)
+    builtMaterials = dict() #models sharing a texture list share its materials
+    sceneAnimEnd = -1
+    with timed(report, "armature"):
+        armatures = [existing.get(source) for source in sources]
+        updated = set() #indices of models whose armature was kept
+        for i, (model, armature) in enumerate(zip(data.models, armatures)):
+            if armature is not None and armature.get("ff9SkeletonKey") != getSkeletonKey(model):
+                removeModel(armature) #bones changed, rebuilt with their meshes
+                armatures[i] = None
+                count(report, "rebuiltArmatures", 1)
+            elif armature is not None:
+                clearAnimations(armature)
+                updated.add(i)
+                count(report, "reusedArmatures", 1)
+        missing = [i for i, armature in enumerate(armatures) if armature is None]
+        for i, armature in zip(missing, buildArmatures([data.models[i] for i in missing], 'Armature')):
+            armatures[i] = armature
+            tagArmature(armature, sources[i], data.models[i])
+    for i, (model, armature, textures, animations, animationIndex, source) in enumerate(zip(data.models, armatures, data.textures, data.animations,
+            data.animationIndex, sources)):
+        materials = None
+        if textures is not None:
+            if id(textures) not in builtMaterials:
+                with timed(report, "materials"):
+                    builtMaterials[id(textures)] = buildMaterials(textures, images)
+            materials = builtMaterials[id(textures)]
+        buildModel(model, armature, materials, data.directory, report)
+        if animationIndex is not None:
+            registerAnimations(armature, data.archivePath, model.identifier, animationIndex, keyTolerance)
+        actions = []
+        if animations is not None and len(animations) > 0:
+            with timed(report, "keyframes"):
+                reusableActions = importedActions.get(repr(source), dict()) if updateExisting else None
+                actions, keyCount, reusedActions = buildActions(armature, model.identifier, animations, keyTolerance, reusableActions, source)
+                frameCounts = [animation.frameCount for animation in animations]
+                if animationMode == ANIMATIONS_NLA:
+                    restAction = buildRestAction(model, reusableActions, source)
+                    sceneAnimEnd = max(sceneAnimEnd, layOutActions(armature, actions, frameCounts, restAction))
+                    actions = actions + [restAction]
+                else:
+                    setAction(armature, actions[0])
+                    sceneAnimEnd = max(sceneAnimEnd, frameCounts[0])
+            count(report, "keyframes", keyCount)
+            count(report, "sampledKeyframes", sum(frameCount for frameCount, kept in zip(frameCounts, reusedActions) if not kept) * (3 + 4 * model.boneCount))
+            count(report, "reusedActions", sum(reusedActions))
+            if i in updated:
+                count(report, "rebuiltActions", len(reusedActions) - sum(reusedActions))
+        if updateExisting: #also when this import keys no animations, lazy or all rejected
+            count(report, "removedActions", removeStaleActions(source, actions))
+    if sceneAnimEnd != -1:
+        bpy.context.scene.frame_end = sceneAnimEnd
+    if updateExisting:
+        TEXTURE_CACHE.purge() #materials and images replaced meshes no longer use
+    #scene.frame_set(originalFrame)
+
+#returns a report of what was imported and skipped, with stage timers and counters
+#blockCache is the read cache capacity in sectors, 0 memory maps the archive instead
+#profilePath, if given, is where to write cProfile stats of the whole import, for pstats or snakeviz
+#workers is how many threads decode textures and animations, 0 for one per core
+#keyTolerance drops animation keys that linear interpolation gets within that distance of, 0 only exact ones, None none
+#animationMode is one of the ANIMATIONS_ values. useAssetCache reads and fills the decoded model cache
+#updateExisting updates the objects of an earlier import of the same model file instead of adding new ones
+def ImportModel(archiveFile, chosenDirectory = None, chosenModel = None, rebuildIndex = False, blockCache = 0, profilePath = None, workers = 0, keyTolerance = None,
+        animationMode = ANIMATIONS_NLA, useAssetCache = True, updateExisting = True):
+    report = newReport()
+    arguments = (report, archiveFile, chosenDirectory, chosenModel, rebuildIndex, blockCache, getWorkerCount(workers), keyTolerance, animationMode,
+        ASSET_CACHE if useAssetCache else None, updateExisting)
+    if profilePath:
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(importModelFile, *arguments)
+        finally:
+            profiler.dump_stats(profilePath)
+        report["profilePath"] = profilePath
+    else:
+        importModelFile(*arguments)
+    log.info(formatReport(report))
+    log.info(formatTimers(report))
+    return report
+
+def importModelFile(report, archiveFile, chosenDirectory, chosenModel, rebuildIndex, blockCache, workers, keyTolerance, animationMode, assetCache, updateExisting):
+    then = time.perf_counter()
+    TEXTURE_CACHE.purge()
+    cacheHits, cacheMisses = TEXTURE_CACHE.hits, TEXTURE_CACHE.misses
+    if rebuildIndex:
+        invalidateIndexCache(archiveFile)
+        ASSET_CACHE.invalidate(archiveFile)
+    with openArchive(archiveFile, blockCache) as reader:
+        data = loadModelFile(reader, chosenDirectory, chosenModel, report, assetCache, workers, animationMode != ANIMATIONS_LAZY)
+        report["archiveReads"] = reader.counters()
+    buildModelFile(data, report, workers, keyTolerance, animationMode, updateExisting)
+    report["textureCacheHits"] = TEXTURE_CACHE.hits - cacheHits
+    report["textureCacheMisses"] = TEXTURE_CACHE.misses - cacheMisses
+    counters = report["counters"]
+    counters["reads"] = report["archiveReads"]["readCount"]
+    counters["bytesRead"] = report["archiveReads"]["bytesRead"]
+    counters["imagesCreated"] = report["textureCacheMisses"]
+    counters["animationsRejected"] = sum(report["skippedAnimations"].values())
+    report["timers"]["total"] = time.perf_counter() - then
+
+def formatReport(report):
+    text = f'Import finished, {report["textureCacheMisses"]} textures created, {report["textureCacheHits"]} reused'
+    skipped = report["skippedAnimations"]
+    if len(skipped) > 0:
+        text += f', skipped {sum(skipped.values())} animations (' + ", ".join(f'{count} {reason}' for reason, count in skipped.items()) + ")"
+    if report["assetCacheHits"] > 0:
+        text += ', decoded data read from cache'
+    if report["animationCacheHits"] > 0:
+        text += f', {report["animationCacheHits"]} animation lookups shared between models'
+    if "archiveReads" in report:
+        reads = report["archiveReads"]
+        text += f', read {reads["bytesRead"] / 1024:.0f} KiB in {reads["readCount"]} reads'
+        if "blockHits" in reads:
+            lookups = max(1, reads["blockHits"] + reads["blockMisses"])
+            text += f' ({reads["blockHits"] / lookups:.0%} cache hits)'
+    counters = report["counters"]
+    if counters.get("uncroppedTextureBytes", 0) > counters.get("textureBytes", 0):
+        saved = counters["uncroppedTextureBytes"] - counters["textureBytes"]
+        text += f', cropping textures to their UVs saved {saved / 1024:.0f} KiB ({saved / counters["uncroppedTextureBytes"]:.0%})'
+    reused = [(counters.get(f'reused{kind}', 0), counters.get(f'rebuilt{kind}', 0), kind.lower()) for kind in ("Armatures", "Meshes", "Actions")]
+    if any(counters.get(f'reused{kind}', 0) > 0 for kind in ("Armatures", "Meshes")):
+        text += ", updated existing objects: reused " + ", ".join(f'{reusedCount} {kind}' for reusedCount, rebuiltCount, kind in reused)
+        text += ", rebuilt " + ", ".join(f'{rebuiltCount} {kind}' for reusedCount, rebuiltCount, kind in reused)
+    if counters.get("keyframes", 0) > 0:
+        text += f', {counters["keyframes"]} keyframes for {counters["sampledKeyframes"]} samples ({counters["sampledKeyframes"] / counters["keyframes"]:.1f}x fewer)'
+    return text
+
+#stage timers slowest first, then the counters
+def formatTimers(report):
+    timers = sorted(report["timers"].items(), key=lambda item: -item[1])
+    text = "Time: " + ", ".join(f'{stage} {seconds * 1000:.0f} ms' for stage, seconds in timers)
+    counters = report["counters"]
+    if len(counters) > 0:
+        text += ". Counts: " + ", ".join(f'{count} {name}' for name, count in counters.items())
+    if "profilePath" in report:
+        text += f'. Profile written to {report["profilePath"]}'
+    return text
+
+if bpy is not None:
+
+    ### import dialog
+
+    ANIMATION_MODES = [
+        (ANIMATIONS_NLA, "NLA strips", "Decode every animation to its own action, laid out one after the other as NLA strips"),
+        (ANIMATIONS_ACTIONS, "Actions", "Decode every animation to its own action, the first one assigned"),
+        (ANIMATIONS_LAZY, "On demand", "Only list the animations, each one is decoded when picked with Object > Animation > Load FF9 Animation"),
+    ]
+
+    #the directory first, then models are picked from a search list of its catalogue
+    class MyDialog(bpy.types.Operator):
+
+        bl_idname = "tools.mydialog"
+        bl_label = "Import FF9 Model"
+
+        archiveFilePath: bpy.props.StringProperty(name="archiveFilePath", options={'HIDDEN'})
+
+        directory: bpy.props.IntProperty(name="Directory index", max=13, min=0)
+        rebuildIndex: bpy.props.BoolProperty(name="Rebuild index cache", description="Discard the cached archive index and decoded models and read them again", default=False)
+        useAssetCache: bpy.props.BoolProperty(name="Cache decoded models", default=True,
+            description="Keep decoded meshes, textures and animations on disk so importing the same model again skips decoding")
+        updateExisting: bpy.props.BoolProperty(name="Update existing objects", default=True,
+            description="Reimporting a model file updates the objects of its earlier import, rebuilding only what changed, instead of adding new ones")
+        blockCache: bpy.props.IntProperty(name="Read cache (sectors)", min=0, default=0,
+            description="Read the archive through a cache of this many 2048 byte sectors instead of memory mapping it. Helps with disc images on network or USB drives")
+        profilePath: bpy.props.StringProperty(name="Profile to", subtype='FILE_PATH', default="",
+            description="If set, write cProfile stats of the import to this file, to read with pstats or snakeviz")
+        workers: bpy.props.IntProperty(name="Decode threads", min=0, default=0,
+            description="Threads decoding textures and animations, 0 uses one per core")
+        reduceKeys: bpy.props.BoolProperty(name="Reduce keyframes", default=False,
+            description="Drop animation keys that linear interpolation between the remaining ones reproduces")
+        keyTolerance: bpy.props.FloatProperty(name="Key tolerance", min=0.0, default=0.0, precision=5,
+            description="How far a dropped key may be from the interpolated curve, 0 only drops keys lying exactly on it")
+        animationMode: bpy.props.EnumProperty(name="Animations", items=ANIMATION_MODES, default=ANIMATIONS_NLA)
+
+        def invoke(self, context, event):
+            context.window_manager.invoke_props_dialog(self)
+            return {'RUNNING_MODAL'}
+
+        def execute(self, context):
+            if self.rebuildIndex:
+                invalidateIndexCache(self.archiveFilePath)
+                ASSET_CACHE.invalidate(self.archiveFilePath)
+                clearCatalogue(self.archiveFilePath)
+            bpy.ops.tools.ff9modelsearch('INVOKE_DEFAULT', archiveFilePath = self.archiveFilePath, directory = self.directory, blockCache = self.blockCache,
+                profilePath = bpy.path.abspath(self.profilePath) if self.profilePath else "", workers = self.workers,
+                keyTolerance = self.keyTolerance if self.reduceKeys else -1.0, animationMode = self.animationMode, useAssetCache = self.useAssetCache,
+                updateExisting = self.updateExisting)
+            return {'FINISHED'}
+
+    CATALOGUE_ITEMS = dict() #(path, directory): (catalogue, enum items), blender needs the item strings kept alive
+
+    def getCatalogueItems(self, context):
+        key = (self.archiveFilePath, self.directory)
+        try:
+            catalogue = getCatalogue(self.archiveFilePath, self.directory, self.blockCache)
+        except Exception as e:
+            CATALOGUE_ITEMS[key] = (None, [("-1", f'Directory {self.directory}: {e}', "")])
+            return CATALOGUE_ITEMS[key][1]
+        if key not in CATALOGUE_ITEMS or CATALOGUE_ITEMS[key][0] is not catalogue:
+            items = []
+            for entry in catalogue:
+                name = (f'{entry.modelIndex}: model {"/".join(str(i) for i in entry.identifiers)} ('
+                    f'{"/".join(str(count) for count in entry.boneCounts)} bones, '
+                    f'{"/".join(str(count) for count in entry.groupCounts)} groups, '
+                    f'{"/".join(str(sum(counts)) for counts in entry.faceCounts)} faces)')
+                description = (f'{entry.animationCount} candidate animations, {entry.textureFileCount} texture files, '
+                    'faces per group: ' + "; ".join(", ".join(str(count) for count in counts) for counts in entry.faceCounts))
+                items.append((str(entry.modelIndex), name, description))
+            if len(items) == 0:
+                items.append(("-1", f'Directory {self.directory}: no model files', ""))
+            CATALOGUE_ITEMS[key] = (catalogue, items)
+        return CATALOGUE_ITEMS[key][1]
+
+    class ModelSearch(bpy.types.Operator):
+
+        bl_idname = "tools.ff9modelsearch"
+        bl_label = "Import FF9 Model"
+        bl_property = "model"
+
+        archiveFilePath: bpy.props.StringProperty(name="archiveFilePath", options={'HIDDEN'})
+        directory: bpy.props.IntProperty(name="Directory index", options={'HIDDEN'})
+        blockCache: bpy.props.IntProperty(name="Read cache (sectors)", options={'HIDDEN'})
+        profilePath: bpy.props.StringProperty(name="Profile to", options={'HIDDEN'})
+        workers: bpy.props.IntProperty(name="Decode threads", options={'HIDDEN'})
+        keyTolerance: bpy.props.FloatProperty(name="Key tolerance", default=-1.0, options={'HIDDEN'}) #negative keeps every key
+        animationMode: bpy.props.EnumProperty(name="Animations", items=ANIMATION_MODES, options={'HIDDEN'})
+        useAssetCache: bpy.props.BoolProperty(name="Cache decoded models", default=True, options={'HIDDEN'})
+        updateExisting: bpy.props.BoolProperty(name="Update existing objects", default=True, options={'HIDDEN'})
+        model: bpy.props.EnumProperty(name="Model file", items=getCatalogueItems)
+
+        def invoke(self, context, event):
+            context.window_manager.invoke_search_popup(self)
+            return {'RUNNING_MODAL'}
+
+        def execute(self, context):
+            if self.model == "-1":
+                self.report({'ERROR'}, f'No model to import in directory {self.directory}')
+                return {'CANCELLED'}
+            report = ImportModel(self.archiveFilePath, self.directory, int(self.model), blockCache = self.blockCache, profilePath = self.profilePath or None, workers = self.workers,
+                keyTolerance = self.keyTolerance if self.keyTolerance >= 0 else None, animationMode = self.animationMode,
+                useAssetCache = self.useAssetCache, updateExisting = self.updateExisting)
+            self.report({'INFO'}, formatTimers(report))
+            self.report({'INFO'}, formatReport(report))
+            return {'FINISHED'}
+
+    ### on-demand animations
+
+    ANIMATION_ITEMS = dict() #armature name: (identifiers, enum items), blender needs the item strings kept alive
+
+    def getAnimationItems(self, context):
+        armature = context.active_object
+        if armature is None or "ff9AnimationIdentifiers" not in armature:
+            return [("-1", "No FF9 animations registered on the active object", "")]
+        identifiers = list(armature["ff9AnimationIdentifiers"])
+        if armature.name not in ANIMATION_ITEMS or ANIMATION_ITEMS[armature.name][0] != identifiers:
+            items = [(str(i), f'animation {identifier}', f'Decode animation {identifier} of model {armature["ff9ModelIdentifier"]} and make it the active action')
+                for i, identifier in enumerate(identifiers)]
+            ANIMATION_ITEMS[armature.name] = (identifiers, items)
+        return ANIMATION_ITEMS[armature.name][1]
+
+    #animations listed by an import in "On demand" mode, decoded the first time they're picked
+    class LoadAnimation(bpy.types.Operator):
+
+        bl_idname = "tools.ff9loadanimation"
+        bl_label = "Load FF9 Animation"
+        bl_property = "animation"
+
+        animation: bpy.props.EnumProperty(name="Animation", items=getAnimationItems)
+
+        @classmethod
+        def poll(cls, context):
+            return context.active_object is not None and "ff9AnimationIdentifiers" in context.active_object
+
+        def invoke(self, context, event):
+            context.window_manager.invoke_search_popup(self)
+            return {'RUNNING_MODAL'}
+
+        def execute(self, context):
+            if self.animation == "-1":
+                return {'CANCELLED'}
+            armature = context.active_object
+            try:
+                action = getRegisteredAction(armature, int(self.animation))
+            except Exception as e:
+                self.report({'ERROR'}, str(e))
+                return {'CANCELLED'}
+            setAction(armature, action)
+            context.scene.frame_end = int(action.frame_range[1])
+            self.report({'INFO'}, f'Loaded {action.name}')
+            return {'FINISHED'}
+
+    ### file picker
+
+    class ImportFF9Model(bpy.types.Operator, ImportHelper):
+        bl_idname       = "import_ff9_model.chev";
+        bl_label        = "import model";
+        bl_options      = {'PRESET'};
+
+        filename_ext    = ".img";
+
+        filter_glob: StringProperty(
+            default="*",
+            options={'HIDDEN'},
+            maxlen=255,
+        )
+
+        def execute(self, context):
+            log.info("importer start")
+            then = time.time()
+
+            archiveFilePath = self.filepath
+
+            log.info("importing %s", archiveFilePath)
+
+            #ImportModel(archiveFilePath, 10, 4)
+            #3,4,7,8, 10
+            #overworld, rooms, monsters, weapons, party
+
+            bpy.ops.tools.mydialog('INVOKE_DEFAULT', archiveFilePath = archiveFilePath)
+
+            now = time.time()
+            log.info("It took: %s seconds", now-then)
+            return {'FINISHED'}
 
 def menu_func(self, context):
     self.layout.operator(ImportFF9Model.bl_idname, text="FF9 model (ff9.img)");
 
+def animationMenuFunc(self, context):
+    self.layout.operator(LoadAnimation.bl_idname)
+
 def register():
     from bpy.utils import register_class
     register_class(ImportFF9Model)
     register_class(MyDialog)
+    register_class(ModelSearch)
+    register_class(LoadAnimation)
     bpy.types.TOPBAR_MT_file_import.append(menu_func)
-    
+    bpy.types.VIEW3D_MT_object_animation.append(animationMenuFunc)
+
 def unregister():
     from bpy.utils import unregister_class
     unregister_class(ImportFF9Model)
     unregister_class(MyDialog)
+    unregister_class(ModelSearch)
+    unregister_class(LoadAnimation)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func);
+    bpy.types.VIEW3D_MT_object_animation.remove(animationMenuFunc)
 
 if __name__ == "__main__":
-    register()
\ No newline at end of file
+    register()
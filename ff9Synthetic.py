@@ -0,0 +1,337 @@
+#writes synthetic ff9.img archives laid out the way the importer reads them, for benchmarks and tests without game discs
+#usage: python ff9Synthetic.py output.img [--preset medium] [--seed 0]
+
+import argparse
+import struct
+import numpy as np
+
+from ff9ModelImporter import (SECTORSIZE, DBCHUNK, DIRTYPE_NORMAL,
+    FILETYPE_MODEL, FILETYPE_ANIM, FILETYPE_TIM_IMAGE, FILETYPE_CLUT_AND_TPAGES_FOR_MODEL, FILETYPE_DATABLOCK,
+    COLOR_PALETTED_4BPP, COLOR_PALETTED_8BPP, COLOR_RGBA_16BPP, COLOR_RGB_24BPP,
+    INDEX_HEADER, DIRECTORY_ENTRY, DIRECTORY_FILE_POINTER, MODEL_HEADER, GROUP_RECORD,
+    MATERIAL_FILE_HEADER, MODEL_MATERIAL_RECORD, ANIMATION_HEADER, TIM_BLOCK,
+    A_QUAD_DTYPE, A_TRIANGLE_DTYPE, B_QUAD_DTYPE, B_TRIANGLE_DTYPE, C_QUAD_DTYPE, C_TRIANGLE_DTYPE,
+    VERTEX_DTYPE, ANGLE_TABLE_DTYPE)
+
+BITS_PER_PIXEL = {COLOR_PALETTED_4BPP: 4, COLOR_PALETTED_8BPP: 8, COLOR_RGBA_16BPP: 16, COLOR_RGB_24BPP: 24}
+POLYGON_DTYPES = (A_QUAD_DTYPE, A_TRIANGLE_DTYPE, B_QUAD_DTYPE, B_TRIANGLE_DTYPE, C_QUAD_DTYPE, C_TRIANGLE_DTYPE)
+
+#textures go on the right half of vram, one 64x256 texture page each, their cluts in the rows just above 256
+TEXTURE_PAGE_X = 512
+TEXTURE_PAGE_COUNT = 16
+CLUT_Y = 240
+
+class ArchiveSpec:
+    """Size and shape of a synthetic archive.
+
+    Each populated directory holds filesPerDirectory root datablocks. The model block, holding a model
+    file of modelsPerFile models, an animation file and a clut and tpage file, sits nestingDepth
+    datablocks below its root, and the block above it holds one TIM file with an image per timFormats
+    entry. faceCounts are the A quad, A triangle, B quad, B triangle, C quad and C triangle counts of
+    every group. mismatchedAnimations are extra animations with one bone too many, which the importer skips.
+    With standaloneCluts the color tables of paletted field and overworld textures are separate 16 bit TIMs
+    after the textures instead of being embedded in them. textureWindow is the (x, y) texel offset every material's texture
+    window starts at, anything but (0, 0) makes field and overworld textures wrap around their page.
+    """
+    __slots__ = ("directoryCount", "directories", "filesPerDirectory", "nestingDepth", "modelsPerFile",
+        "boneCount", "groupCount", "vertexCount", "uvCount", "faceCounts",
+        "animationsPerFile", "animationFrames", "mismatchedAnimations",
+        "timFormats", "textureWidth", "textureHeight", "standaloneCluts", "textureWindow", "seed")
+
+    def __init__(self, **values):
+        self.directoryCount = 14
+        self.directories = (7,)
+        self.filesPerDirectory = 1
+        self.nestingDepth = 1
+        self.modelsPerFile = 1
+        self.boneCount = 16
+        self.groupCount = 4
+        self.vertexCount = 64
+        self.uvCount = 64
+        self.faceCounts = (32, 32, 0, 0, 0, 0)
+        self.animationsPerFile = 4
+        self.animationFrames = 32
+        self.mismatchedAnimations = 0
+        self.timFormats = (COLOR_PALETTED_4BPP, COLOR_PALETTED_8BPP, COLOR_RGBA_16BPP)
+        self.textureWidth = 64
+        self.textureHeight = 64
+        self.standaloneCluts = False
+        self.textureWindow = (0, 0)
+        self.seed = 0
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def asDict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+PRESETS = {
+    "small": dict(),
+    "medium": dict(directories=(4, 7, 10), filesPerDirectory=8, nestingDepth=2, modelsPerFile=2, boneCount=32,
+        groupCount=8, vertexCount=256, uvCount=256, faceCounts=(128, 128, 16, 16, 16, 16),
+        animationsPerFile=16, animationFrames=64, mismatchedAnimations=4, standaloneCluts=True, textureWindow=(16, 8)),
+    "large": dict(directories=(4, 7, 10), filesPerDirectory=32, nestingDepth=3, modelsPerFile=4, boneCount=64,
+        groupCount=16, vertexCount=1024, uvCount=512, faceCounts=(512, 512, 32, 32, 32, 32),
+        animationsPerFile=48, animationFrames=128, mismatchedAnimations=8, textureHeight=256, standaloneCluts=True, textureWindow=(32, 64)),
+}
+
+#### file layouts
+
+def align(position, alignment = 4):
+    return (position + alignment - 1) & ~(alignment - 1)
+
+#a file: DB mark, object count, identifiers, pointers relative to themselves, end of file, then the objects
+def buildFile(identifiers, objects):
+    count = len(identifiers)
+    data = bytearray(struct.pack("<BBH", DBCHUNK, count, 0))
+    data += struct.pack(f"<{count}H", *identifiers)
+    if count % 2 != 0:
+        data += bytes(2)
+    pointerStart = len(data)
+    position = pointerStart + 4 * count + 4
+    offsets = []
+    for item in objects:
+        position = align(position)
+        offsets.append(position)
+        position += len(item)
+    for i, offset in enumerate(offsets):
+        data += struct.pack("<i", offset - (pointerStart + 4 * i))
+    data += struct.pack("<I", position - len(data))
+    for offset, item in zip(offsets, objects):
+        data += bytes(offset - len(data))
+        data += item
+    return bytes(data)
+
+#a datablock: DB marker, file count, then 24 bit pointers relative to themselves with the file type in the top byte
+def buildDataBlock(files):
+    count = len(files)
+    data = bytearray(struct.pack("<BBH", DBCHUNK, count, 0))
+    pointerStart = len(data)
+    position = pointerStart + 4 * count
+    offsets = []
+    for fileType, item in files:
+        position = align(position)
+        offsets.append(position)
+        position += len(item)
+    if position > 0xFFFFFF:
+        raise Exception("datablock too large for 24 bit pointers")
+    for i, (offset, (fileType, item)) in enumerate(zip(offsets, files)):
+        data += struct.pack("<I", (offset - (pointerStart + 4 * i)) | (fileType << 24))
+    for offset, (fileType, item) in zip(offsets, files):
+        data += bytes(offset - len(data))
+        data += item
+    return bytes(data)
+
+def buildModel(rng, spec):
+    boneCount = spec.boneCount
+    bones = np.zeros(boneCount, np.uint32)
+    if boneCount > 1:
+        lengths = rng.integers(0, 3000, boneCount - 1)
+        parents = (rng.random(boneCount - 1) * np.arange(1, boneCount)).astype(np.uint32) #any earlier bone
+        bones[1:] = lengths | (parents << 24)
+    groupsPointer = MODEL_HEADER.size + 4 * boneCount
+    position = groupsPointer + GROUP_RECORD.size * spec.groupCount
+    groups = bytearray()
+    groupData = bytearray()
+    for group in range(spec.groupCount):
+        vertices = np.zeros(spec.vertexCount, VERTEX_DTYPE)
+        vertices["position"] = rng.integers(-800, 800, (spec.vertexCount, 3))
+        vertices["boneIndex"] = rng.integers(0, boneCount, spec.vertexCount)
+        polygons = bytearray()
+        for count, dtype in zip(spec.faceCounts, POLYGON_DTYPES):
+            records = np.zeros(count, dtype)
+            records["vertices"] = rng.integers(0, spec.vertexCount, records["vertices"].shape)
+            if "UV" in dtype.names:
+                records["UV"] = rng.integers(0, spec.uvCount, records["UV"].shape)
+                records["color"] = rng.integers(0, 256, records["color"].shape)
+                records["material"] = rng.integers(0, len(spec.timFormats), count)
+            polygons += records.tobytes()
+        UVs = rng.integers(0, 256, 2 * spec.uvCount, dtype=np.uint8)
+        vertexPointer = position + len(groupData)
+        groupData += vertices.tobytes()
+        polygonPointer = position + len(groupData)
+        groupData += polygons
+        texturePointer = position + len(groupData)
+        groupData += UVs.tobytes()
+        groupData += bytes(align(len(groupData)) - len(groupData))
+        endPointer = position + len(groupData)
+        groups += GROUP_RECORD.pack(0, *spec.faceCounts, 0, 0, 0,
+            MODEL_HEADER.size, vertexPointer, polygonPointer, texturePointer, endPointer)
+    header = MODEL_HEADER.pack(0, boneCount, spec.groupCount, 0, 0, 0, 0, MODEL_HEADER.size, groupsPointer)
+    return header + bones.astype("<u4").tobytes() + bytes(groups) + bytes(groupData)
+
+#header, high angle table, low angle table, then all the tracks one after the other
+def buildAnimation(rng, boneCount, frameCount):
+    highPointer = ANIMATION_HEADER.size
+    lowPointer = highPointer + 8 * boneCount
+    tracks = bytearray()
+    trackStart = lowPointer + 8 * boneCount
+
+    def addTrack(length):
+        offset = trackStart + len(tracks)
+        tracks.extend(rng.integers(0, 256, length, dtype=np.uint8).tobytes())
+        return offset
+
+    positionMask = int(rng.integers(0, 8))
+    positions = []
+    for axis in range(3):
+        if positionMask & (1 << axis):
+            positions.append(int(rng.integers(0, 65536)))
+        else:
+            positions.append(addTrack(2 * frameCount))
+    tables = []
+    for table in range(2):
+        angles = np.zeros(boneCount, ANGLE_TABLE_DTYPE)
+        angles["mask"] = rng.integers(0, 8, boneCount)
+        for bone, mask in enumerate(angles["mask"].tolist()):
+            for channel, name in enumerate(("s1", "s2", "s3")):
+                if mask & (1 << channel):
+                    angles[name][bone] = rng.integers(0, 65536)
+                else:
+                    angles[name][bone] = addTrack(frameCount)
+        tables.append(angles.tobytes())
+    if trackStart + len(tracks) > 0xFFFF:
+        raise Exception("animation too large for 16 bit track offsets")
+    header = ANIMATION_HEADER.pack(0, frameCount, *positions, positionMask, highPointer, lowPointer)
+    return header + b"".join(tables) + bytes(tracks)
+
+def getTextureRect(spec, index):
+    if index >= TEXTURE_PAGE_COUNT:
+        raise Exception(f'at most {TEXTURE_PAGE_COUNT} textures per file')
+    colorFormat = spec.timFormats[index]
+    wordWidth = spec.textureWidth * BITS_PER_PIXEL[colorFormat] // 16
+    if wordWidth > 64 or spec.textureHeight > 256:
+        raise Exception("textures have to fit in a 64x256 texture page")
+    return (TEXTURE_PAGE_X + 64 * (index % 8), 256 * (index // 8), wordWidth, spec.textureHeight)
+
+def getClutRect(spec, index):
+    colorFormat = spec.timFormats[index]
+    if colorFormat == COLOR_PALETTED_4BPP:
+        return (0, CLUT_Y + index, 16, 1)
+    if colorFormat == COLOR_PALETTED_8BPP:
+        return (0, CLUT_Y + index, 256, 1)
+    return None
+
+def buildTIMBlock(rect, words):
+    words = words.astype("<u2").tobytes()
+    return TIM_BLOCK.pack(TIM_BLOCK.size + len(words), *rect) + words
+
+#the TIM of a texture, and with standaloneClut the 16 bit TIM of its color table, or None.
+#the same seed draws the same words either way
+def buildTIM(rng, spec, index, standaloneClut = False):
+    textureRect = getTextureRect(spec, index)
+    clutRect = getClutRect(spec, index)
+    clutWords = None if clutRect is None else rng.integers(0, 65536, clutRect[2] * clutRect[3], dtype=np.uint16)
+    textureWords = rng.integers(0, 65536, textureRect[2] * textureRect[3], dtype=np.uint16)
+    embedded = clutWords is not None and not standaloneClut
+    data = struct.pack("<BBxxI", 0x10, 0, spec.timFormats[index] | (8 if embedded else 0))
+    if embedded:
+        data += buildTIMBlock(clutRect, clutWords)
+    data += buildTIMBlock(textureRect, textureWords)
+    clutTIM = None
+    if clutWords is not None and standaloneClut:
+        clutTIM = struct.pack("<BBxxI", 0x10, 0, COLOR_RGBA_16BPP) + buildTIMBlock(clutRect, clutWords)
+    return data, clutTIM
+
+#one material per TIM of the file for every model, pointing at where the TIM lands in vram
+def buildMaterials(spec, identifiers):
+    materialCount = len(spec.timFormats)
+    pages = []
+    for index, colorFormat in enumerate(spec.timFormats):
+        x, y, wordWidth, height = getTextureRect(spec, index)
+        tpage = (x // 64) | ((y // 256) << 4) | (colorFormat << 7)
+        clutRect = getClutRect(spec, index)
+        clut = (clutRect[0] // 16) | (clutRect[1] << 6) if clutRect is not None else 0
+        pages += [tpage, clut]
+    windows = struct.pack(f"<{2 * materialCount}h", *(spec.textureWindow * materialCount))
+    materials = struct.pack(f"<{2 * materialCount}H", *pages) + windows + bytes(8 * materialCount)
+    recordsEnd = MATERIAL_FILE_HEADER.size + MODEL_MATERIAL_RECORD.size * len(identifiers)
+    data = bytearray(MATERIAL_FILE_HEADER.pack(0xDC, len(identifiers), 0))
+    for i, identifier in enumerate(identifiers):
+        recordStart = MATERIAL_FILE_HEADER.size + MODEL_MATERIAL_RECORD.size * i
+        pointer = recordsEnd + len(materials) * i - recordStart
+        data += MODEL_MATERIAL_RECORD.pack(identifier, 0xFFFF, (materialCount << 24) | pointer, 0xFFFF, 0, 0)
+    for identifier in identifiers:
+        data += materials
+    return bytes(data)
+
+#a root datablock with a model file nestingDepth blocks down, and the file's textures in the block just above it
+def buildRootBlock(rng, spec, firstIdentifier, directory):
+    identifiers = list(range(firstIdentifier, firstIdentifier + spec.modelsPerFile))
+    models = [buildModel(rng, spec) for identifier in identifiers]
+    animations = [buildAnimation(rng, spec.boneCount, spec.animationFrames) for i in range(spec.animationsPerFile)]
+    animations += [buildAnimation(rng, spec.boneCount + 1, spec.animationFrames) for i in range(spec.mismatchedAnimations)]
+    tims = [buildTIM(rng, spec, i, spec.standaloneCluts and directory in (3, 4)) for i in range(len(spec.timFormats))]
+    textures = [texture for texture, clut in tims] + [clut for texture, clut in tims if clut is not None]
+
+    files = [
+        (FILETYPE_MODEL, buildFile(identifiers, models)),
+        (FILETYPE_ANIM, buildFile(list(range(len(animations))), animations)),
+        (FILETYPE_CLUT_AND_TPAGES_FOR_MODEL, buildFile([0], [buildMaterials(spec, identifiers)])),
+    ]
+    textureFile = (FILETYPE_TIM_IMAGE, buildFile(list(range(len(textures))), textures))
+    if spec.nestingDepth == 0:
+        return buildDataBlock([textureFile] + files)
+    block = buildDataBlock(files)
+    block = buildDataBlock([textureFile, (FILETYPE_DATABLOCK, buildFile([0], [block]))])
+    for level in range(1, spec.nestingDepth):
+        block = buildDataBlock([(FILETYPE_DATABLOCK, buildFile([0], [block]))])
+    return block
+
+#### archive
+
+def buildArchive(spec):
+    rng = np.random.default_rng(spec.seed)
+    directoryFiles = []
+    identifier = 0
+    for directory in range(spec.directoryCount):
+        files = []
+        if directory in spec.directories:
+            if directory in (3, 4) and COLOR_RGB_24BPP in spec.timFormats:
+                raise Exception("field and overworld materials can't use 24 bit textures")
+            for i in range(spec.filesPerDirectory):
+                files.append(buildRootBlock(rng, spec, identifier, directory))
+                identifier += spec.modelsPerFile
+        directoryFiles.append(files)
+
+    indexSize = INDEX_HEADER.size + DIRECTORY_ENTRY.size * spec.directoryCount
+    sector = (indexSize + SECTORSIZE - 1) // SECTORSIZE
+    entries = []
+    sectors = [] #(sector, data)
+    for files in directoryFiles:
+        #directory table first, then its files, each starting on a sector
+        tableSector = sector
+        sector += max(1, (DIRECTORY_FILE_POINTER.size * len(files) + SECTORSIZE - 1) // SECTORSIZE)
+        table = bytearray()
+        firstSectors = []
+        for i, data in enumerate(files):
+            table += DIRECTORY_FILE_POINTER.pack(i, 2, sector)
+            firstSectors.append(sector)
+            sectors.append((sector, data))
+            sector += (len(data) + SECTORSIZE - 1) // SECTORSIZE
+        sectors.append((tableSector, bytes(table)))
+        entries.append(DIRECTORY_ENTRY.pack(DIRTYPE_NORMAL, len(files), tableSector, firstSectors[0] if len(files) > 0 else 0))
+
+    archive = bytearray(sector * SECTORSIZE)
+    archive[:indexSize] = INDEX_HEADER.pack(b"FF9 ", 0, spec.directoryCount, 0) + b"".join(entries)
+    for start, data in sectors:
+        archive[start * SECTORSIZE:start * SECTORSIZE + len(data)] = data
+    return bytes(archive)
+
+def writeArchive(path, spec):
+    data = buildArchive(spec)
+    with open(path, "wb") as file:
+        file.write(data)
+    return len(data)
+
+def main(arguments = None):
+    parser = argparse.ArgumentParser(description="Write a synthetic ff9.img")
+    parser.add_argument("output")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args(arguments)
+    spec = ArchiveSpec(seed=options.seed, **PRESETS[options.preset])
+    size = writeArchive(options.output, spec)
+    print(f'wrote {options.output}, {size} bytes')
+
+if __name__ == "__main__":
+    main()
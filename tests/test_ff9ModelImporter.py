@@ -0,0 +1,472 @@
+#checks the importer against synthetic archives from ff9Synthetic. decoding checks run without blender,
+#the blender ones only where bpy can be imported (pip install bpy, or blender -b --python-expr "import pytest; pytest.main()")
+#usage: python -m pytest tests
+
+import copy
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ff9ModelImporter as importer
+import ff9Synthetic
+import ff9Gltf
+
+#two models per file with the same bone count, so they are matched with the same animations
+ARCHIVE_SPEC = dict(directories=(4, 7, 10), filesPerDirectory=2, modelsPerFile=2, animationsPerFile=4, animationFrames=24,
+    mismatchedAnimations=1)
+
+@pytest.fixture(scope="session")
+def archivePath(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("archive") / "ff9.img")
+    ff9Synthetic.writeArchive(path, ff9Synthetic.ArchiveSpec(seed=1, **ARCHIVE_SPEC))
+    return path
+
+#index cache files go to a temporary directory instead of the user's cache
+@pytest.fixture(autouse=True)
+def cacheDirectory(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+def decode(archivePath, directory, modelIndex, **options):
+    with importer.openArchive(archivePath) as reader:
+        return importer.decodeModelFile(reader, directory, modelIndex, importer.newReport(), **options)
+
+#### decoding
+
+@pytest.mark.parametrize("directory", [4, 7, 10])
+def testSyntheticModelFilesDecode(archivePath, directory):
+    data = decode(archivePath, directory, 0, useIndexCache=False)
+    assert [len(model.meshes) for model in data.models] == [4, 4]
+    assert all(len(animations) == ARCHIVE_SPEC["animationsPerFile"] for animations in data.animations)
+
+def writeArchive(tmp_path, name, **values):
+    path = str(tmp_path / name)
+    ff9Synthetic.writeArchive(path, ff9Synthetic.ArchiveSpec(seed=1, **dict(ARCHIVE_SPEC, **values)))
+    return path
+
+#field textures are the same whether their color tables are embedded in their TIMs or uploaded by TIMs of their own
+def testStandaloneClutsDecodeLikeEmbeddedOnes(archivePath, tmp_path):
+    embedded = decode(archivePath, 4, 1, useIndexCache=False)
+    standalone = decode(writeArchive(tmp_path, "cluts.img", standaloneCluts=True), 4, 1, useIndexCache=False)
+    for textures, others in zip(embedded.textures, standalone.textures):
+        assert [texture.colorFormat for texture in others] == list(ff9Synthetic.ArchiveSpec().timFormats)
+        for texture, other in zip(textures, others):
+            np.testing.assert_array_equal(texture.data, other.data)
+            np.testing.assert_array_equal(texture.palette, other.palette)
+
+#a texture window starting inside the page wraps the page around, by texels converted to 16 bit words
+def testTextureWindowsWrapAroundThePage(archivePath, tmp_path):
+    windowX, windowY = 16, 8
+    unwrapped = decode(archivePath, 4, 0, useIndexCache=False)
+    wrapped = decode(writeArchive(tmp_path, "windows.img", textureWindow=(windowX, windowY)), 4, 0, useIndexCache=False)
+    for textures, others in zip(unwrapped.textures, wrapped.textures):
+        for texture, other in zip(textures, others):
+            shift = windowX >> (2 - texture.colorFormat)
+            assert shift > 0
+            np.testing.assert_array_equal(np.roll(texture.data, (-windowY, -shift), axis=(0, 1)), other.data)
+            assert other.key != texture.key
+
+#### archive readers
+
+#leading sectors missing and trailing ones cached, the fetch must not evict what the read still returns
+def testCachedReaderKeepsTheBlocksOfTheCurrentRead(archivePath):
+    with importer.CachedArchiveReader(archivePath, 2) as reader, importer.ArchiveReader(archivePath) as mapped:
+        reader.readUBytes(importer.SECTORSIZE, 2 * importer.SECTORSIZE)
+        assert bytes(reader.readUBytes(0, 3 * importer.SECTORSIZE)) == bytes(mapped.readUBytes(0, 3 * importer.SECTORSIZE))
+        assert len(reader.blocks) == 3
+
+@pytest.mark.parametrize("capacity, readAhead", [(1, 0), (2, 1), (3, 8), (16, 8)])
+def testCachedReaderReadsLikeTheMappedOne(archivePath, capacity, readAhead):
+    rng = np.random.default_rng(capacity)
+    with importer.CachedArchiveReader(archivePath, capacity, readAhead) as reader, importer.ArchiveReader(archivePath) as mapped:
+        size = mapped.size
+        largestRead = 0 #in blocks, a read needing more than capacity keeps them until the next miss evicts
+        for i in range(500):
+            offset = int(rng.integers(0, size - 1))
+            count = int(min(rng.choice([1, 2, 4, 64, importer.SECTORSIZE, 5 * importer.SECTORSIZE]), size - offset))
+            largestRead = max(largestRead, (count + 2 * importer.SECTORSIZE - 2) // importer.SECTORSIZE)
+            if i % 3 == 0: #runs of neighbouring reads, like walking a datablock
+                offset = min(offset, size - 16 * count)
+                for step in range(16):
+                    assert bytes(reader.readUBytes(offset + step * count, count)) == bytes(mapped.readUBytes(offset + step * count, count))
+            else:
+                assert bytes(reader.readUBytes(offset, count)) == bytes(mapped.readUBytes(offset, count))
+            if count >= 4:
+                assert reader.readUInt32(offset) == mapped.readUInt32(offset)
+                np.testing.assert_array_equal(reader.readArray("<i2", offset, count // 2), mapped.readArray("<i2", offset, count // 2))
+            assert len(reader.blocks) <= max(capacity, largestRead + readAhead)
+        assert reader.hits > 0 and reader.misses > 0
+        with pytest.raises(Exception):
+            reader.readUBytes(size - 1, 2)
+
+def testCachedReaderDecodesLikeTheMappedOne(archivePath):
+    with importer.openArchive(archivePath) as mapped:
+        data = importer.decodeModelFile(mapped, 4, 1, importer.newReport(), useIndexCache=False)
+    with importer.openArchive(archivePath, 4) as reader:
+        cached = importer.decodeModelFile(reader, 4, 1, importer.newReport(), useIndexCache=False)
+    for model, other in zip(data.models, cached.models):
+        for mesh, otherMesh in zip(model.meshes, other.meshes):
+            for name in importer.MeshData.__slots__:
+                np.testing.assert_array_equal(getattr(mesh, name), getattr(otherMesh, name))
+    for animations, others in zip(data.animations, cached.animations):
+        for animation, other in zip(animations, others):
+            np.testing.assert_array_equal(animation.rotations, other.rotations)
+
+#### parallel decoding
+
+def assertSameModelFile(expected, actual):
+    assert len(expected.models) == len(actual.models)
+    for model, other in zip(expected.models, actual.models):
+        assert model.identifier == other.identifier
+        np.testing.assert_array_equal(model.boneLengths, other.boneLengths)
+        np.testing.assert_array_equal(model.boneParents, other.boneParents)
+        assert len(model.meshes) == len(other.meshes)
+        for mesh, otherMesh in zip(model.meshes, other.meshes):
+            for name in importer.MeshData.__slots__:
+                np.testing.assert_array_equal(getattr(mesh, name), getattr(otherMesh, name), err_msg=name)
+    for textures, others in zip(expected.textures, actual.textures):
+        assert (textures is None) == (others is None)
+        for texture, other in zip(textures or [], others or []):
+            assert (texture.name, texture.key, texture.colorFormat) == (other.name, other.key, other.colorFormat)
+            np.testing.assert_array_equal(texture.data, other.data)
+            np.testing.assert_array_equal(texture.palette, other.palette)
+    for animations, others in zip(expected.animations, actual.animations):
+        assert (animations is None) == (others is None)
+        assert len(animations or []) == len(others or [])
+        for animation, other in zip(animations or [], others or []):
+            assert (animation.identifier, animation.frameCount) == (other.identifier, other.frameCount)
+            for name in ("positions", "rotations", "constantPositions", "constantRotations"):
+                np.testing.assert_array_equal(getattr(animation, name), getattr(other, name), err_msg=name)
+    assert expected.animationIndex == actual.animationIndex
+
+@pytest.mark.parametrize("directory, blockCache", [(4, 0), (10, 0), (10, 4)])
+def testWorkerCountDoesNotChangeResults(archivePath, directory, blockCache):
+    results = []
+    for workers in (1, 4):
+        report = importer.newReport()
+        with importer.openArchive(archivePath, blockCache) as reader:
+            results.append((importer.decodeModelFile(reader, directory, 0, report, useIndexCache=False, workers=workers), reader.counters()))
+    (data, counters), (threaded, threadedCounters) = results
+    assertSameModelFile(data, threaded)
+    if blockCache == 0: #the block cache's hits depend on the order threads ask
+        assert counters == threadedCounters
+    textures = [texture for textures in data.textures for texture in textures]
+    single = importer.decodeTextures(textures, 1)
+    parallel = importer.decodeTextures(textures, 4)
+    assert list(single) == list(parallel)
+    for key in single:
+        np.testing.assert_array_equal(single[key], parallel[key])
+
+#many threads reading through one mapped reader, none of the counts lost.
+#switching threads very often makes them interleave inside the counter updates
+def testMappedReaderCountsReadsFromThreads(archivePath):
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with importer.ArchiveReader(archivePath) as reader:
+            importer.mapInPool(lambda offset: [reader.readUInt16(offset) for i in range(2000)], list(range(0, 64, 2)), 8)
+            counters = reader.counters()
+    finally:
+        sys.setswitchinterval(interval)
+    assert counters == {"readCount": 32 * 2000, "bytesRead": 32 * 2000 * 2}
+
+#### keyframe reduction
+
+def getLinearError(values, keep):
+    frames = np.arange(len(values))
+    return max(np.abs(np.interp(frames, frames[keep[:, channel]], values[keep[:, channel], channel]) - values[:, channel]).max()
+        for channel in range(values.shape[1]))
+
+@pytest.mark.parametrize("tolerance", [0.001, 0.01, 0.1])
+def testFindKeysStaysWithinTolerance(tolerance):
+    rng = np.random.default_rng(0)
+    values = np.cumsum(rng.normal(0, 0.02, (200, 12)), axis=0).astype(np.float32)
+    values[:, 0] = 0.5 #constant
+    values[:, 1] = np.linspace(-1, 1, 200) #linear
+    keep = importer.findKeys(values, tolerance)
+    assert keep[[0, -1]].all()
+    assert getLinearError(values.astype(np.float64), keep) <= tolerance * (1 + 1e-6)
+    assert keep[:, 0].sum() == 2 and keep[:, 1].sum() == 2
+    assert keep.sum() < keep.size
+
+def testFindKeysWithoutToleranceKeepsEveryFrame():
+    values = np.zeros((10, 3), np.float32)
+    assert importer.findKeys(values).all()
+    keep = importer.findKeys(np.arange(30, dtype=np.float32)[:, None] / 4, 0)
+    assert np.flatnonzero(keep[:, 0]).tolist() == [0, 29]
+
+#channels an animation stores as constants get their first key only, whatever the tolerance
+@pytest.mark.parametrize("tolerance", [None, 0, 0.01])
+def testConstantChannelsGetASingleKey(archivePath, tolerance):
+    for animation in decode(archivePath, 10, 0, useIndexCache=False).animations[0]:
+        positionKeys, rotationKeys = importer.getAnimationKeys(animation, tolerance)
+        assert animation.constantPositions.any() or animation.constantRotations.any()
+        assert positionKeys[:, animation.constantPositions].sum() == animation.constantPositions.sum()
+        assert rotationKeys[:, animation.constantRotations].sum() == animation.constantRotations.sum() * 4
+        assert positionKeys[0].all() and rotationKeys[0].all()
+
+#### animations, in blender
+
+@pytest.fixture
+def scene():
+    bpy = pytest.importorskip("bpy")
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    importer.TEXTURE_CACHE.clear()
+    yield bpy
+    importer.TEXTURE_CACHE.clear()
+
+def importModel(archivePath, directory, modelIndex, **options):
+    return importer.ImportModel(archivePath, directory, modelIndex, workers=1, useAssetCache=False, **options)
+
+def getArmatures(bpy):
+    return sorted((sceneObject for sceneObject in bpy.data.objects if sceneObject.type == 'ARMATURE'), key=lambda armature: armature.name)
+
+def getStripActions(armature, trackName = importer.NLA_TRACK_NAME):
+    if armature.animation_data is None:
+        return []
+    return [strip.action for track in armature.animation_data.nla_tracks if track.name == trackName for strip in track.strips]
+
+def getKeyCount(action):
+    return sum(len(fcurve.keyframe_points) for fcurve in action.fcurves)
+
+#frame 0 shows the root at its rest location, from frame 1 on the animations play one after the other
+def testAnimationsAreLaidOutAfterTheRestPose(archivePath, scene):
+    bpy = scene
+    importModel(archivePath, 10, 0)
+    data = decode(archivePath, 10, 0, useIndexCache=False)
+    animations = data.animations[0]
+    assert bpy.context.scene.frame_end == sum(animation.frameCount for animation in animations)
+    for armature, model in zip(getArmatures(bpy), data.models):
+        assert [action.name for action in getStripActions(armature)] == [importer.getActionName(model.identifier, animation.identifier)
+            for animation in animations]
+        root = armature.pose.bones["bone 0"]
+        bpy.context.scene.frame_set(5)
+        bpy.context.scene.frame_set(0)
+        assert tuple(root.location) == pytest.approx((0, model.boneLengths[0] * importer.SCALE_FACTOR, 0))
+        bpy.context.scene.frame_set(1)
+        assert tuple(root.location) == pytest.approx(tuple(animations[0].positions[0]))
+        bpy.context.scene.frame_set(animations[0].frameCount + 1)
+        assert tuple(root.location) == pytest.approx(tuple(animations[1].positions[0]))
+
+#models with the same bones each get their own action, named after them, and a new tolerance keys it again
+def testAnimationsLoadedOnDemandBelongToTheirModel(archivePath, scene):
+    bpy = scene
+    importModel(archivePath, 7, 0, animationMode=importer.ANIMATIONS_LAZY)
+    armatures = getArmatures(bpy)
+    actions = [importer.getRegisteredAction(armature, 0) for armature in armatures]
+    assert actions[0] != actions[1]
+    assert [action.name for action in actions] == [importer.getActionName(armature["ff9ModelIdentifier"], armature["ff9AnimationIdentifiers"][0])
+        for armature in armatures]
+    assert importer.getRegisteredAction(armatures[0], 0) == actions[0]
+    keyCount = getKeyCount(actions[0])
+    importModel(archivePath, 7, 0, animationMode=importer.ANIMATIONS_LAZY, keyTolerance=0.05)
+    reduced = importer.getRegisteredAction(getArmatures(bpy)[0], 0)
+    assert reduced != actions[0]
+    assert getKeyCount(reduced) < keyCount
+
+#### re-imports, in blender
+
+def getImportedActions(bpy):
+    return [action for action in bpy.data.actions if "ff9Model" in action]
+
+#the models of a file share their animations, each armature still only gets its own actions back
+def testReimportKeepsActionsWithTheirModel(archivePath, scene):
+    bpy = scene
+    importModel(archivePath, 7, 0)
+    objectNames = sorted(sceneObject.name for sceneObject in bpy.data.objects)
+    actionNames = sorted(action.name for action in bpy.data.actions)
+    report = importModel(archivePath, 7, 0)
+    assert sorted(sceneObject.name for sceneObject in bpy.data.objects) == objectNames
+    assert sorted(action.name for action in bpy.data.actions) == actionNames
+    assert report["counters"]["reusedActions"] == 2 * ARCHIVE_SPEC["animationsPerFile"]
+    assert report["counters"].get("removedActions", 0) == 0
+    for armature in getArmatures(bpy):
+        actions = getStripActions(armature) + getStripActions(armature, importer.REST_TRACK_NAME)
+        assert len(actions) == ARCHIVE_SPEC["animationsPerFile"] + 1
+        assert all(action["ff9Model"] == repr(importer.getArmatureSource(armature)) for action in actions)
+
+def testReimportWithOtherToleranceRebuildsActions(archivePath, scene):
+    bpy = scene
+    importModel(archivePath, 10, 0)
+    actionCount = len(bpy.data.actions)
+    report = importModel(archivePath, 10, 0, keyTolerance=0.01)
+    assert len(bpy.data.actions) == actionCount
+    assert report["counters"]["rebuiltActions"] == 2 * ARCHIVE_SPEC["animationsPerFile"]
+    assert report["counters"]["removedActions"] == 2 * ARCHIVE_SPEC["animationsPerFile"]
+
+#an on demand import keys nothing but still drops the actions of the earlier one, and the next import its animation list
+def testSwitchingAnimationModesLeavesNothingStale(archivePath, scene):
+    bpy = scene
+    importModel(archivePath, 7, 1)
+    report = importModel(archivePath, 7, 1, animationMode=importer.ANIMATIONS_LAZY)
+    assert getImportedActions(bpy) == []
+    assert report["counters"]["removedActions"] == 2 * (ARCHIVE_SPEC["animationsPerFile"] + 1)
+    assert all("ff9AnimationPointers" in armature for armature in getArmatures(bpy))
+    importModel(archivePath, 7, 1)
+    assert all("ff9AnimationPointers" not in armature for armature in getArmatures(bpy))
+    assert all(len(getStripActions(armature)) == ARCHIVE_SPEC["animationsPerFile"] for armature in getArmatures(bpy))
+    assert len(getImportedActions(bpy)) == 2 * (ARCHIVE_SPEC["animationsPerFile"] + 1)
+
+#actions loaded on demand belong to their model too, so importing it again drops them
+def testReimportDropsActionsLoadedOnDemand(archivePath, scene):
+    bpy = scene
+    importModel(archivePath, 7, 1, animationMode=importer.ANIMATIONS_LAZY)
+    loadedNames = [importer.getRegisteredAction(armature, 0).name for armature in getArmatures(bpy)]
+    report = importModel(archivePath, 7, 1)
+    assert report["counters"]["removedActions"] == len(loadedNames)
+    assert all("ff9Animation" not in action for action in bpy.data.actions)
+    assert len(getImportedActions(bpy)) == 2 * (ARCHIVE_SPEC["animationsPerFile"] + 1)
+
+def testReimportWithoutUpdatingAddsACopy(archivePath, scene):
+    bpy = scene
+    importModel(archivePath, 10, 1)
+    objectCount = len(bpy.data.objects)
+    importModel(archivePath, 10, 1, updateExisting=False)
+    assert len(bpy.data.objects) == 2 * objectCount
+
+#### texture cropping
+
+#every texel a face samples is the same in the cropped texture at the moved UV.
+#synthetic UVs span the whole texture and wrap, so they are first pulled into a window for there to be something to crop
+def testCroppedTexturesKeepSampledTexels(archivePath, monkeypatch):
+    uncropped = []
+    cropTextures = importer.cropTextures
+    def recordingCropTextures(model, textures, report):
+        uncropped.append((copy.deepcopy(model), textures))
+        return cropTextures(model, textures, report)
+    monkeypatch.setattr(importer, "cropTextures", recordingCropTextures)
+    decode(archivePath, 4, 0, useIndexCache=False)
+    assert len(uncropped) == ARCHIVE_SPEC["modelsPerFile"]
+    report = importer.newReport()
+    for original, originalTextures in uncropped:
+        for mesh in original.meshes:
+            mesh.UVs = (mesh.UVs % 21 + 11).astype(np.uint8)
+        model = copy.deepcopy(original)
+        textures = cropTextures(model, originalTextures, report)
+        assert all(texture.data.size < originalTexture.data.size for texture, originalTexture in zip(textures, originalTextures))
+        images = [texture.decode() for texture in textures]
+        originalImages = [texture.decode() for texture in originalTextures]
+        for mesh, originalMesh in zip(model.meshes, original.meshes):
+            loopMaterials = np.repeat(mesh.materials, mesh.loopTotals)
+            UVs = mesh.UVs[mesh.loopUVs].astype(np.int64)
+            originalUVs = originalMesh.UVs[originalMesh.loopUVs].astype(np.int64)
+            for material in np.unique(loopMaterials):
+                loops = loopMaterials == material
+                u, v = UVs[loops].T
+                originalU, originalV = originalUVs[loops].T
+                np.testing.assert_array_equal(images[material][v, u], originalImages[material][originalV, originalU])
+    counters = report["counters"]
+    assert counters["textureBytes"] < counters["uncroppedTextureBytes"]
+
+#UVs reaching past the texture wrap around it, so such materials keep their whole texture
+def testWrappingUVsKeepTheWholeTexture(archivePath):
+    data = decode(archivePath, 4, 1, useIndexCache=False)
+    for model, textures in zip(data.models, data.textures):
+        assert importer.getUVBounds(model, textures) == [None] * len(textures)
+        assert all(importer.getTextureSize(texture) == (64, 64) for texture in textures)
+
+#### decoded model cache
+
+#the shared cache follows the user cache directory, like the index cache does
+def testAssetCacheDirectoryFollowsTheCacheDirectory(archivePath, cacheDirectory, monkeypatch):
+    if sys.platform == "darwin":
+        pytest.skip("the cache directory doesn't come from the environment on macOS")
+    assert importer.ASSET_CACHE.directory == str(cacheDirectory / "ff9_blender_importer" / "models")
+    with importer.openArchive(archivePath) as reader:
+        importer.loadModelFile(reader, 10, 0, importer.newReport(), importer.ASSET_CACHE)
+        indexCachePath = importer.getIndexCachePath(reader, importer.readIndex(reader))
+    assert os.path.dirname(indexCachePath) == os.path.dirname(importer.ASSET_CACHE.directory)
+    assert len(os.listdir(importer.ASSET_CACHE.directory)) == 2 #the entry and the manifest
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cacheDirectory / "moved"))
+    monkeypatch.setenv("LOCALAPPDATA", str(cacheDirectory / "moved"))
+    assert importer.ASSET_CACHE.directory == str(cacheDirectory / "moved" / "ff9_blender_importer" / "models")
+
+@pytest.mark.parametrize("directory, decodeAnimations", [(4, True), (10, True), (10, False)])
+def testAssetCacheRoundTrip(archivePath, tmp_path, directory, decodeAnimations):
+    assetCache = importer.AssetCache(str(tmp_path / "models"))
+    reports = [importer.newReport(), importer.newReport()]
+    with importer.openArchive(archivePath) as reader:
+        decoded = importer.loadModelFile(reader, directory, 1, reports[0], assetCache, decodeAnimations=decodeAnimations)
+        cached = importer.loadModelFile(reader, directory, 1, reports[1], assetCache, decodeAnimations=decodeAnimations)
+    assert (reports[0]["assetCacheMisses"], reports[1]["assetCacheHits"]) == (1, 1)
+    assert reports[1]["skippedAnimations"] == reports[0]["skippedAnimations"]
+    assert (cached.archivePath, cached.directory, cached.modelIndex) == (decoded.archivePath, decoded.directory, decoded.modelIndex)
+    assertSameModelFile(decoded, cached)
+
+def testAssetCacheEvictsLeastRecentlyUsed(archivePath, tmp_path):
+    assetCache = importer.AssetCache(str(tmp_path / "models"))
+    with importer.openArchive(archivePath) as reader:
+        for modelIndex in (0, 1):
+            importer.loadModelFile(reader, 7, modelIndex, importer.newReport(), assetCache)
+        names = sorted(assetCache.readManifest(), key=lambda name: assetCache.readManifest()[name]["used"])
+        assetCache.capacity = max(entry["bytes"] for entry in assetCache.readManifest().values())
+        importer.loadModelFile(reader, 7, 0, importer.newReport(), assetCache) #touches the oldest, evicting the other
+    assert list(assetCache.readManifest()) == names[:1]
+    assert sorted(name for name in os.listdir(assetCache.directory) if name.endswith(".npz")) == names[:1]
+
+#### glTF export
+
+#the chunks of a .glb file, checking its header on the way
+def readGlb(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, length = struct.unpack_from("<III", data)
+    assert (magic, version, length) == (ff9Gltf.GLB_MAGIC, 2, len(data))
+    chunks = dict()
+    offset = 12
+    while offset < length:
+        chunkLength, chunkType = struct.unpack_from("<II", data, offset)
+        assert chunkLength % 4 == 0
+        chunks[chunkType] = data[offset + 8:offset + 8 + chunkLength]
+        offset += 8 + chunkLength
+    assert offset == length
+    return json.loads(chunks[ff9Gltf.GLB_JSON_CHUNK]), chunks[ff9Gltf.GLB_BIN_CHUNK]
+
+@pytest.mark.parametrize("directory", (4, 7, 10))
+def testGlbMatchesTheDecodedModelFile(archivePath, tmp_path, capsys, directory):
+    path = str(tmp_path / "model.glb")
+    assert ff9Gltf.main([archivePath, str(directory), "1", path]) == 0
+    document, binary = readGlb(path)
+    data = decode(archivePath, directory, 1)
+
+    #a node per model and bone, and one per mesh with faces
+    meshes = [mesh for model in data.models for mesh in model.meshes if len(mesh.loopTotals) > 0]
+    assert len(document["nodes"]) == sum(1 + model.boneCount for model in data.models) + len(meshes)
+    assert len(document["meshes"]) == len(meshes)
+    assert [len(skin["joints"]) for skin in document["skins"]] == [model.boneCount for model in data.models]
+    assert document["scenes"][0]["nodes"] == [node for node, values in enumerate(document["nodes"]) if values["name"].startswith("model") and "mesh" not in values]
+    animationNames = [importer.getActionName(model.identifier, animation.identifier) for model, animations in zip(data.models, data.animations) for animation in animations]
+    assert [animation["name"] for animation in document["animations"]] == animationNames
+    assert len(animationNames) > 0
+
+    #an inverse bind matrix accessor per skin, the attributes and indices of each primitive, and the times and one channel per bone in animations
+    primitives = [primitive for mesh in document["meshes"] for primitive in mesh["primitives"]]
+    assert all(("material" in primitive) == ("TEXCOORD_0" in primitive["attributes"]) for primitive in primitives)
+    expected = len(data.models) + sum(4 + ("material" in primitive) for primitive in primitives)
+    expected += sum((2 + 1 + model.boneCount) * len(animations) for model, animations in zip(data.models, data.animations))
+    assert len(document["accessors"]) == expected
+    decodedAnimations = [(model, animation) for model, animations in zip(data.models, data.animations) for animation in animations]
+    for gltfAnimation, (model, animation) in zip(document["animations"], decodedAnimations):
+        assert len(gltfAnimation["channels"]) == 1 + model.boneCount
+        frameCount = max(document["accessors"][sampler["input"]]["count"] for sampler in gltfAnimation["samplers"])
+        assert frameCount == animation.frameCount
+
+    #every view lies in the binary chunk and every accessor in its view
+    assert document["buffers"] == [{"byteLength": document["buffers"][0]["byteLength"]}]
+    assert document["buffers"][0]["byteLength"] <= len(binary)
+    for view in document["bufferViews"]:
+        assert view["byteOffset"] + view["byteLength"] <= document["buffers"][0]["byteLength"]
+    for accessor in document["accessors"]:
+        assert 0 <= accessor["bufferView"] < len(document["bufferViews"])
+        assert accessor["count"] > 0
+
+    summary = capsys.readouterr().out
+    assert summary.startswith(f'Wrote {path}')
+    assert f'{len(data.models)} models, {len(meshes)} meshes, {len(document.get("images", []))} embedded images, {len(animationNames)} animations' in summary
+    assert "textures created" not in summary